@@ -0,0 +1,144 @@
+# Raw-pixel cache of the card atlas, so a launch doesn't decode and scale
+# every PNG again.
+#
+# The file holds one atlas per card size as plain RGBA rows. The game maps
+# it with mmap and builds the surface straight from that buffer. The header
+# records a SHA-256 of the source images (names and bytes); if any of them
+# changes, is added or removed, the cache no longer matches and is ignored,
+# and the game rewrites it after decoding the PNGs once. It can also be built
+# ahead of time for several sizes:
+#
+#   python asset_cache.py --size 88x128 --size 120x175
+#
+# Layout (little endian):
+#   header   magic b"F7AC", version, atlas columns, entry count, 32-byte digest
+#   entries  width, height, bitmask of the card slots present, data offset
+#   data     cols*w x rows*h RGBA pixels per entry
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+CACHE_PATH = os.path.join("assets", "card_cache.bin")
+MAGIC = b"F7AC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBH32s")
+ENTRY = struct.Struct("<HHIQ")
+
+_maps = []          # open maps; surfaces made with frombuffer point into them
+
+def sources_digest(sources):
+    """ Takes in [(card key, image path or None)], returns the SHA-256 of the keys, file names and file bytes"""
+    h = hashlib.sha256()
+    for key, path in sources:
+        h.update(f"{key}:{os.path.basename(path) if path else '-'}\0".encode())
+        if path:
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.digest()
+
+def read_entries(data, digest, cols):
+    """ Takes in the cache bytes, expected digest and atlas columns, returns {(w, h): (present mask, offset)} or None if stale / invalid"""
+    if len(data) < HEADER.size:
+        return None
+    magic, version, file_cols, count, file_digest = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or file_cols != cols or file_digest != digest:
+        return None
+    if len(data) < HEADER.size + count * ENTRY.size:
+        return None
+    entries = {}
+    for i in range(count):
+        w, h, mask, offset = ENTRY.unpack_from(data, HEADER.size + i * ENTRY.size)
+        entries[(w, h)] = (mask, offset)
+    return entries
+
+def atlas_shape(size, slots, cols):
+    """ Takes in a card size, slot count and columns, returns the atlas pixel size"""
+    w, h = size
+    return cols * w, -(-slots // cols) * h
+
+def load(size, slots, cols, digest, path=CACHE_PATH):
+    """
+    Takes in a card size (w, h), slot count, atlas columns and the sources digest.
+    Maps the cache and returns (atlas surface backed by the map, present mask),
+    or None if the file is missing, stale or has no atlas of that size.
+    """
+    import pygame
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    entries = read_entries(data, digest, cols)
+    if entries is None or tuple(size) not in entries:
+        data.close()
+        return None
+    mask, offset = entries[tuple(size)]
+    shape = atlas_shape(size, slots, cols)
+    nbytes = shape[0] * shape[1] * 4
+    if offset + nbytes > len(data):
+        data.close()
+        return None
+    _maps.append(data)
+    return pygame.image.frombuffer(memoryview(data)[offset:offset + nbytes], shape, "RGBA"), mask
+
+def save(atlases, slots, cols, digest, path=CACHE_PATH):
+    """
+    Takes in {(w, h): (atlas surface, present mask)}, the slot count, atlas columns and
+    sources digest. Writes them, plus any other sizes already cached for the same
+    sources, to path (atomically).
+    """
+    import pygame
+    blobs = {}
+    try:
+        with open(path, "rb") as f:
+            old = f.read()
+        for size, (mask, offset) in (read_entries(old, digest, cols) or {}).items():
+            shape = atlas_shape(size, slots, cols)
+            blobs[size] = (mask, old[offset:offset + shape[0] * shape[1] * 4])
+    except OSError:
+        pass
+    for size, (atlas, mask) in atlases.items():
+        blobs[tuple(size)] = (mask, pygame.image.tobytes(atlas, "RGBA"))
+
+    offset = HEADER.size + len(blobs) * ENTRY.size
+    table = []
+    for (w, h), (mask, blob) in blobs.items():
+        table.append(ENTRY.pack(w, h, mask, offset))
+        offset += len(blob)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, cols, len(blobs), digest))
+        f.write(b"".join(table))
+        for mask, blob in blobs.values():
+            f.write(blob)
+    os.replace(tmp, path)
+
+# ---------- CLI ----------
+def parse_size(text):
+    """ Takes in 'WxH', returns (w, h)"""
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+def main(argv=None):
+    """ Command line entry point: builds the cache for the given card sizes"""
+    import fun_game as fg
+    ap = argparse.ArgumentParser(description="Build the Flip 7 card image cache")
+    ap.add_argument("--size", action="append", type=parse_size,
+                    help=f"card size WxH, repeatable (default {fg.CARD_W}x{fg.CARD_H})")
+    ap.add_argument("--out", default=CACHE_PATH)
+    args = ap.parse_args(argv)
+
+    sizes = args.size or [(fg.CARD_W, fg.CARD_H)]
+    digest = sources_digest(fg.card_sources())
+    start = time.perf_counter()
+    atlases = {size: fg.pack_atlas(size) for size in sizes}
+    save(atlases, len(fg.CARD_KEYS), fg.ATLAS_COLS, digest, args.out)
+    print(f"{len(sizes)} size(s), {os.path.getsize(args.out) / 1e6:.1f} MB written to {args.out} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
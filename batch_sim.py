@@ -0,0 +1,228 @@
+# NumPy batched round simulator.
+#
+# Advances many independent solo Flip 7 rounds in lockstep: deck counts,
+# number-card bitmasks and scores live in arrays, so one draw step is a few
+# array operations for every round at once. Used to score threshold policies
+# like bot_should_hit over millions of rounds; needs numpy (the game doesn't).
+#
+# Solo model, card for card the engine's rules with the drawing player as the
+# only possible target: FREEZE banks the hand, SECOND protects against one
+# duplicate and FLIP3 forces three draws. A FREEZE or FLIP3 among those three
+# waits in the hand until they are done; then each such FLIP3 ahead of the
+# first such FREEZE forces three more draws in turn, and the FREEZE banks.
+# FREEZE and FLIP3 drawn by those cascades stay in the hand until the next
+# FLIP3 is resolved, and a SECOND drawn by any forced draw is a dead card.
+# (The engine goes on resolving held cards behind a FREEZE onto the banked
+# player's emptied hand; that takes a FREEZE and a FLIP3 in one FLIP3's
+# first three, and is left out.)
+# Seven unique numbers end the round with the Flip 7 bonus as soon as the
+# seventh lands on a hit, but only after all forced draws are done on a FLIP3
+# (so a later duplicate still busts).
+#
+#   python batch_sim.py --rounds 10000000 --aggr 10-24
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from engine import BOT_HIT_THRESHOLD, FLIP7_BONUS, MODIFIER_MAP, N_CARD_VALUES, Deck, make_deck
+
+NUMBER_VALUES = np.arange(13, dtype=np.int32)
+MOD_VALUES = np.zeros(N_CARD_VALUES, dtype=np.int32)
+for _c, _amt in MODIFIER_MAP.items():
+    MOD_VALUES[_c] = _amt
+BATCH_ROUNDS = 1_000_000    # rounds held in memory at once
+
+def deck_counts(cards=None):
+    """ Takes in a list of card values or a live engine Deck (default: a full make_deck), returns its per-value count vector"""
+    if isinstance(cards, Deck):
+        return np.asarray(cards.counts, dtype=np.int32)
+    if cards is None:
+        cards = make_deck(random.Random(0))
+    return np.bincount(np.asarray(cards, dtype=np.int64), minlength=N_CARD_VALUES).astype(np.int32)
+
+def threshold_policy(aggr):
+    """ Takes in a bot_aggr (scalar or per-round array), returns a vectorized bot_should_hit"""
+    def policy(num_sum, unique, idx):
+        a = aggr[idx] if np.ndim(aggr) else aggr
+        return (unique < 6) & (num_sum < a)
+    return policy
+
+class RoundBatch:
+    def __init__(self, n, counts):
+        """ Takes in the number of rounds and a starting deck count vector, creates the per-round state arrays"""
+        self.counts = np.tile(np.asarray(counts, dtype=np.int32), (n, 1))
+        self.left = self.counts.sum(axis=1)
+        self.mask = np.zeros(n, dtype=np.int32)        # 13-bit number-card mask
+        self.num_sum = np.zeros(n, dtype=np.int32)
+        self.unique = np.zeros(n, dtype=np.int32)
+        self.mod_sum = np.zeros(n, dtype=np.int32)
+        self.x2 = np.zeros(n, dtype=bool)
+        self.second = np.zeros(n, dtype=bool)
+        self.forced = np.zeros(n, dtype=np.int32)      # FLIP3 draws still owed
+        self.cascade = np.zeros(n, dtype=bool)         # they are a cascade, not a FLIP3's first three
+        self.held_flip3 = np.zeros(n, dtype=np.int32)  # FLIP3s in the hand ahead of any FREEZE
+        self.held_freeze = np.zeros(n, dtype=bool)     # a FREEZE in the hand
+        self.cascades = np.zeros(n, dtype=np.int32)    # held FLIP3s still to cascade this FLIP3
+        self.freeze_after = np.zeros(n, dtype=bool)    # a held FREEZE banks the hand after them
+        self.done = np.zeros(n, dtype=bool)
+        self.busted = np.zeros(n, dtype=bool)
+        self.flip7 = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.draws = np.zeros(n, dtype=np.int32)
+
+    def bank(self, idx, bonus=0):
+        """ Takes in round indices, ends them with their current score (plus bonus)"""
+        self.score[idx] = self.num_sum[idx] * np.where(self.x2[idx], 2, 1) + self.mod_sum[idx] + bonus
+        self.done[idx] = True
+
+    def draw(self, idx, rng):
+        """ Takes in round indices and a numpy Generator, draws one card without replacement for each, returns the card values"""
+        cum = np.cumsum(self.counts[idx], axis=1)
+        u = (rng.random(len(idx)) * self.left[idx]).astype(np.int32)
+        cards = (cum <= u[:, None]).sum(axis=1).astype(np.int32)
+        self.counts[idx, cards] -= 1
+        self.left[idx] -= 1
+        self.draws[idx] += 1
+        return cards
+
+    def step(self, policy, rng):
+        """ Advances every unfinished round by one decision/draw, returns the number still running"""
+        live = np.flatnonzero(~self.done)
+        if live.size == 0:
+            return 0
+        # empty deck -> nothing left to draw, bank
+        empty = live[self.left[live] == 0]
+        if empty.size:
+            self.bank(empty)
+            live = live[self.left[live] > 0]
+        forced = self.forced[live] > 0
+        hit = forced | policy(self.num_sum[live], self.unique[live], live)
+        self.bank(live[~hit])
+        idx = live[hit]
+        forced = forced[hit]
+        if idx.size == 0:
+            return int((~self.done).sum())
+        cards = self.draw(idx, rng)
+
+        # number cards: duplicate -> second chance or bust, else add to the mask
+        is_num = cards < 13
+        bit = np.where(is_num, np.left_shift(1, np.minimum(cards, 12)), 0).astype(np.int32)
+        dup = is_num & ((self.mask[idx] & bit) != 0)
+        saved = dup & self.second[idx]
+        self.second[idx[saved]] = False
+        bust = idx[dup & ~saved]
+        self.busted[bust] = True
+        self.score[bust] = 0
+        self.done[bust] = True
+        fresh = is_num & ~dup
+        fi = idx[fresh]
+        self.mask[fi] |= bit[fresh]
+        self.num_sum[fi] += cards[fresh]
+        self.unique[fi] += 1
+
+        # modifiers, X2, actions on a hit
+        self.mod_sum[idx] += MOD_VALUES[cards]
+        self.x2[idx[cards == 18]] = True
+        self.second[idx[(cards == 21) & ~forced]] = True
+        self.forced[idx[(cards == 20) & ~forced]] = 3
+        flip7 = idx[fresh & ~forced & (self.unique[idx] >= 7)]
+        self.flip7[flip7] = True
+        self.bank(flip7, FLIP7_BONUS)
+        frozen = idx[(cards == 19) & ~forced]
+        self.bank(frozen[~self.done[frozen]])
+
+        # FREEZE and FLIP3 from forced draws wait in the hand
+        fi = idx[forced]
+        fc = cards[forced]
+        self.held_freeze[fi[fc == 19]] = True
+        flip3 = fi[fc == 20]
+        self.held_flip3[flip3[~self.held_freeze[flip3]]] += 1
+        self.forced[fi] -= 1
+
+        # three forced draws done: after a FLIP3's first three, the held cards are resolved
+        ends = fi[(self.forced[fi] == 0) & ~self.done[fi]]
+        first = ends[~self.cascade[ends]]
+        self.cascades[first] = self.held_flip3[first]
+        self.freeze_after[first] = self.held_freeze[first]
+        self.held_flip3[first] = 0
+        self.held_freeze[first] = False
+        more = self.cascades[ends] > 0
+        cascading = ends[more]
+        self.cascades[cascading] -= 1
+        self.forced[cascading] = 3
+        self.cascade[cascading] = True
+        resolved = ends[~more]
+        self.cascade[resolved] = False
+        self.bank(resolved[self.freeze_after[resolved]])
+        resolved = resolved[~self.freeze_after[resolved]]
+        flip7 = resolved[self.unique[resolved] >= 7]
+        self.flip7[flip7] = True
+        self.bank(flip7, FLIP7_BONUS)
+        return int((~self.done).sum())
+
+def simulate_rounds(n, policy=None, counts=None, seed=None):
+    """
+    Takes in the number of rounds, a vectorized policy(num_sum, unique, idx) -> hit mask
+    (default: bot_should_hit at BOT_HIT_THRESHOLD), a starting deck count vector
+    (default: a fresh make_deck) and a seed. Returns the finished RoundBatch.
+    """
+    if policy is None:
+        policy = threshold_policy(BOT_HIT_THRESHOLD)
+    if counts is None:
+        counts = deck_counts()
+    rng = np.random.default_rng(seed)
+    batch = RoundBatch(n, counts)
+    while batch.step(policy, rng):
+        pass
+    return batch
+
+def evaluate_thresholds(aggrs, rounds, seed=0, counts=None, batch_rounds=BATCH_ROUNDS):
+    """ Takes in a list of bot_aggr values and rounds per value, returns {aggr: (mean score, bust rate, flip7 rate, mean draws)}"""
+    aggrs = list(aggrs)
+    per_round = np.asarray(aggrs, dtype=np.int32)
+    total = rounds * len(aggrs)
+    sums = {a: np.zeros(4) for a in aggrs}
+    seeds = np.random.SeedSequence(seed).spawn((total + batch_rounds - 1) // batch_rounds)
+    for b, ss in enumerate(seeds):
+        lo = b * batch_rounds
+        n = min(batch_rounds, total - lo)
+        # round i evaluates aggrs[i % len(aggrs)] so every batch covers every threshold
+        aggr_arr = per_round[(np.arange(lo, lo + n) % len(aggrs))]
+        batch = simulate_rounds(n, threshold_policy(aggr_arr), counts, seed=ss)
+        for a in aggrs:
+            sel = aggr_arr == a
+            sums[a] += (batch.score[sel].sum(), batch.busted[sel].sum(), batch.flip7[sel].sum(), batch.draws[sel].sum())
+    return {a: tuple(sums[a] / rounds) for a in aggrs}
+
+def parse_aggrs(text):
+    """ Takes in '12,16,20' or '10-24', returns the list of ints"""
+    if "-" in text:
+        lo, hi = text.split("-")
+        return list(range(int(lo), int(hi) + 1))
+    return [int(a) for a in text.split(",")]
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Vectorized Flip 7 round simulator")
+    ap.add_argument("--rounds", type=int, default=1_000_000, help="rounds per threshold")
+    ap.add_argument("--aggr", default="10-24", help="thresholds to evaluate: 12,16,20 or 10-24")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--batch", type=int, default=BATCH_ROUNDS, help="rounds held in memory at once")
+    args = ap.parse_args(argv)
+
+    aggrs = parse_aggrs(args.aggr)
+    start = time.perf_counter()
+    res = evaluate_thresholds(aggrs, args.rounds, seed=args.seed, batch_rounds=args.batch)
+    elapsed = time.perf_counter() - start
+    print(" aggr  avg score   bust%  flip7%  draws")
+    for a in aggrs:
+        score, bust, flip7, draws = res[a]
+        print(f"  {a:>3}  {score:9.2f}  {100*bust:6.2f}  {100*flip7:6.3f}  {draws:5.2f}")
+    n = args.rounds * len(aggrs)
+    print(f"{n:,} rounds in {elapsed:.2f}s ({n / elapsed:,.0f} rounds/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# External bot benchmark: what playing a seat through extbot.py's protocol
+# costs the table, with sample_bot.py as the external program.
+#
+# Three runs of headless games of --players seats, one of them the external
+# bot and the rest the in-process threshold bot:
+#   in-process   --games games, every seat the threshold bot, as the baseline
+#   pooled       --games games, the external seat on one bot process kept for all of them
+#   slow         a twentieth as many, with a bot that thinks --think ms against a
+#                --movetime ms deadline, so every decision times out
+# and spawn, which starts a new bot process for each of --spawn decisions (what
+# not pooling would cost). Reported per run: games/s and the external seat's
+# decision times (p50 / p99 / max), timeouts and crashes.
+#
+#   python benchmarks/bench_extbot.py --games 200 --players 4
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from engine import GameState, Player, default_target, play_headless, threshold_policy  # noqa: E402
+from extbot import ExternalBot, LatencyStats, Worker, position_line  # noqa: E402
+
+BOT = [sys.executable, os.path.join(ROOT, "sample_bot.py")]
+
+def play(policy, games, n):
+    """ Plays games games of n seats with policy in seat 0 and threshold bots after, returns games/s"""
+    start = time.perf_counter()
+    for g in range(games):
+        players = [Player(f"P{i+1}", is_bot=True) for i in range(n)]
+        state = GameState(players, rng=random.Random(f"extbot:{g}"))
+        play_headless(state, [policy] + [threshold_policy] * (n - 1))
+    return games / (time.perf_counter() - start)
+
+def spawned(args):
+    """ Answers args.spawn decisions with a fresh bot process each, returns their LatencyStats"""
+    stats = LatencyStats()
+    state = GameState([Player(f"P{i+1}", is_bot=True) for i in range(args.players)], rng=random.Random("spawn"))
+    state.start()
+    for _ in range(args.spawn):
+        start = time.perf_counter()
+        w = Worker(BOT)
+        answer = w.ask(position_line(state, state.pending.seat), "go act movetime 1000", start + 1.0)
+        w.close()
+        stats.add(time.perf_counter() - start)
+        if state.pending is None:
+            break
+        if state.pending.kind == "target":
+            state.apply(("target", default_target(state)))
+        else:
+            state.apply(answer)
+    return stats
+
+def report(stats):
+    return {"decisions": stats.decisions, "p50_ms": 1000 * stats.quantile(0.5), "p99_ms": 1000 * stats.quantile(0.99),
+            "max_ms": 1000 * stats.max, "timeouts": stats.timeouts, "crashes": stats.crashes}
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 external bot benchmark")
+    ap.add_argument("--games", type=int, default=200)
+    ap.add_argument("--players", type=int, default=4)
+    ap.add_argument("--movetime", type=int, default=50, help="ms per decision for the slow run")
+    ap.add_argument("--think", type=int, default=100, help="ms the slow bot takes per decision")
+    ap.add_argument("--spawn", type=int, default=50, help="decisions for the process-per-decision run")
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = ap.parse_args(argv)
+
+    results = {"in-process": {"games_per_s": play(threshold_policy, args.games, args.players)}}
+    bot = ExternalBot(BOT)
+    results["pooled"] = dict(games_per_s=play(bot, args.games, args.players), **report(bot.take_stats()))
+    bot.close()
+    bot = ExternalBot(BOT + ["--think", str(args.think)], movetime_ms=args.movetime)
+    results["slow"] = dict(games_per_s=play(bot, max(1, args.games // 20), args.players), **report(bot.take_stats()))
+    bot.close()
+    results["spawn"] = dict(games_per_s=None, **report(spawned(args)))
+
+    if args.json:
+        print(json.dumps({"games": args.games, "players": args.players, "runs": results}))
+        return
+    print(f"{'run':>10} {'games/s':>9} {'decisions':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'timeouts':>9} {'crashes':>8}")
+    for name, r in results.items():
+        games = f"{r['games_per_s']:9.1f}" if r["games_per_s"] else f"{'-':>9}"
+        if "decisions" not in r:
+            print(f"{name:>10} {games}")
+            continue
+        print(f"{name:>10} {games} {r['decisions']:>10} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['max_ms']:8.2f} "
+              f"{r['timeouts']:>9} {r['crashes']:>8}")
+
+if __name__ == "__main__":
+    main()
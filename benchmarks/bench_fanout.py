@@ -0,0 +1,181 @@
+# Spectator fan-out benchmark: one table, two fast simulated players and
+# N spectators watching it through server.py's delta stream, for each N in
+# --spectators. Every spectator connects and watches before the game starts,
+# so all of them get the same bytes.
+#
+# Reported per N: table speed (actions/s), server CPU per action and per
+# action per spectator (startup taken off, as timed by a server that quits
+# straight away), bytes a spectator received per action against what
+# resending the whole table after every event would have taken, and the
+# spread: how long after the first spectator the last one got each line.
+# Spectator 0 rebuilds the table from the stream (delta.TableView) and checks
+# it against the final scores. The spectators share the machine with the
+# server, so on few cores reading the sockets takes some of its CPU.
+#
+#   python benchmarks/bench_fanout.py --spectators 0,100,1000,2000 --games 3
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from bench_server import HIT_BELOW, start_server  # noqa: E402
+from delta import TableView, encode  # noqa: E402
+
+TABLE = "fan"
+CONNECT_BATCH = 100      # connections opened at once (the listen backlog is 100)
+
+def line(msg):
+    return (json.dumps(msg) + "\n").encode()
+
+async def play(reader, writer, seat_box):
+    """ Answers this player's decisions until the game is over, returns the number of decisions"""
+    actions = 0
+    while True:
+        msg = json.loads(await reader.readline())
+        op = msg["op"]
+        if op == "seated":
+            seat_box[0] = msg["seat"]
+        elif op == "over":
+            return actions
+        elif op == "decide" and msg["seat"] == seat_box[0]:
+            if msg["kind"] == "act":
+                writer.write(line({"op": "hit" if msg["score"] < HIT_BELOW else "stay"}))
+            else:
+                others = [s for s in msg["allowed"] if s != seat_box[0]]
+                writer.write(line({"op": "target", "seat": others[0] if others else seat_box[0]}))
+            actions += 1
+
+async def watch(reader, arrivals):
+    """ Reads a spectator's stream until the game is over, recording when each line arrived; returns the bytes read"""
+    got = 0
+    tail = b""
+    while True:
+        chunk = await reader.read(1 << 16)
+        if not chunk:
+            return got
+        now = time.perf_counter()
+        got += len(chunk)
+        arrivals.extend([now] * chunk.count(b"\n"))
+        tail = (tail + chunk)[-256:]
+        if b'{"op":"over"' in tail or b'{"op":"closed"' in tail:
+            return got
+
+async def verify(reader):
+    """ Rebuilds the table from a spectator's stream, returns (view, bytes read, whole-table bytes per event, over message)"""
+    view = TableView()
+    got = full = 0
+    while True:
+        raw = await reader.readline()
+        got += len(raw)
+        msg = json.loads(raw)
+        view.apply(msg)
+        if msg["op"] == "delta":
+            events = sum(not isinstance(f[0], list) for f in msg["frames"])
+            full += events * len(encode({"op": "keyframe", "seq": view.seq, "players": view.players,
+                                         "seats": view.seats, "table": view.table}))
+        if msg["op"] in ("over", "closed"):
+            return view, got, full, msg
+
+async def run(host, port, n_spectators, args):
+    """ Plays args.games games with n_spectators watching, returns the measurements"""
+    conns = []
+    for i in range(0, n_spectators, CONNECT_BATCH):
+        conns += await asyncio.gather(*[asyncio.open_connection(host, port)
+                                        for _ in range(i, min(n_spectators, i + CONNECT_BATCH))])
+    a, b = await asyncio.open_connection(host, port), await asyncio.open_connection(host, port)
+    totals = {"actions": 0, "wall": 0.0, "bytes": 0, "full": 0, "spreads": [], "checked": True}
+    for _ in range(args.games):
+        seats = ([None], [None])
+        a[1].write(line({"op": "join", "name": "A", "table": TABLE, "seats": args.seats, "bots": args.seats - 2}))
+        while json.loads(await a[0].readline())["op"] != "seated":
+            pass
+        for r, w in conns:
+            w.write(line({"op": "watch", "table": TABLE}))
+        for r, w in conns:
+            await r.readline()                  # watching
+        seats[0][0] = 0
+        start = time.perf_counter()
+        b[1].write(line({"op": "join", "name": "B", "table": TABLE}))
+        arrivals = [[] for _ in conns]
+        jobs = [play(*a, seats[0]), play(*b, seats[1])]
+        if conns:
+            jobs.append(verify(conns[0][0]))
+            jobs += [watch(r, arrivals[i]) for i, (r, w) in enumerate(conns[1:], 1)]
+        done = await asyncio.gather(*jobs)
+        totals["wall"] += time.perf_counter() - start
+        totals["actions"] += done[0] + done[1]
+        if conns:
+            view, got, full, over = done[2]
+            totals["bytes"] += got
+            totals["full"] += full
+            scores = [s[2] for s in view.seats]
+            totals["checked"] &= over["op"] == "over" and scores == over["scores"]
+            lines = min(len(t) for t in arrivals[1:]) if len(conns) > 1 else 0
+            totals["spreads"] += [max(t[k] for t in arrivals[1:]) - min(t[k] for t in arrivals[1:])
+                                  for k in range(lines)]
+    for r, w in conns + [a, b]:
+        w.close()
+    return totals
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def server_run(counts_args, n_spectators):
+    """ Starts a server, runs the games against it, returns (totals, server cpu s)"""
+    before = children_cpu()
+    proc, host, port = start_server(counts_args)
+    try:
+        totals = asyncio.run(run(host, port, n_spectators, counts_args)) if n_spectators is not None else None
+    finally:
+        proc.terminate()
+        proc.wait()
+    return totals, children_cpu() - before
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 spectator fan-out benchmark")
+    ap.add_argument("--spectators", default="0,100,1000,2000", help="spectator counts to run")
+    ap.add_argument("--games", type=int, default=3, help="games per spectator count")
+    ap.add_argument("--seats", type=int, default=4, help="seats at the table (2 players, the rest bots)")
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = ap.parse_args(argv)
+    args.timeout = 30.0
+
+    _, startup_cpu = server_run(args, None)
+    results = {}
+    for n in [int(x) for x in args.spectators.split(",")]:
+        totals, cpu = server_run(args, n)
+        cpu = max(0.0, cpu - startup_cpu)
+        actions = max(1, totals["actions"])
+        spreads = sorted(totals["spreads"]) or [0.0]
+        results[n] = {
+            "actions": totals["actions"], "actions_per_s": totals["actions"] / totals["wall"],
+            "server_us_per_action": 1e6 * cpu / actions,
+            "server_us_per_spectator_action": 1e6 * cpu / actions / n if n else None,
+            "bytes_per_action": totals["bytes"] / actions if n else None,
+            "full_bytes_per_action": totals["full"] / actions if n else None,
+            "spread_p50_ms": 1000 * statistics.median(spreads),
+            "spread_p99_ms": 1000 * spreads[min(len(spreads) - 1, int(0.99 * len(spreads)))],
+            "checked": totals["checked"],
+        }
+    if args.json:
+        print(json.dumps({"games": args.games, "seats": args.seats, "runs": results}))
+        return
+    print(f"{'spectators':>10} {'actions/s':>10} {'server us/act':>14} {'us/act/spec':>12} "
+          f"{'B/act':>7} {'full B/act':>11} {'spread p50/p99 ms':>18}  view")
+    for n, r in results.items():
+        per_spec = f"{r['server_us_per_spectator_action']:.2f}" if n else "-"
+        sizes = f"{r['bytes_per_action']:7.0f} {r['full_bytes_per_action']:11.0f}" if n else f"{'-':>7} {'-':>11}"
+        print(f"{n:>10} {r['actions_per_s']:10.0f} {r['server_us_per_action']:14.0f} {per_spec:>12} {sizes} "
+              f"{r['spread_p50_ms']:8.2f} / {r['spread_p99_ms']:<8.2f}  {'ok' if r['checked'] else 'MISMATCH'}")
+
+if __name__ == "__main__":
+    main()
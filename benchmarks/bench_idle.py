@@ -0,0 +1,93 @@
+# Idle CPU benchmark: CPU time the game burns while a screen just sits there
+# waiting for input. Each screen runs in its own process on SDL's dummy video
+# driver for --seconds, then gets a QUIT; CPU % is the child's user + system
+# time over that wall time (100% = one core pinned), and presents/s counts
+# the frames it put on screen meanwhile. The dummy driver makes a present
+# nearly free, so on a real window the CPU gap is larger than shown here.
+#
+#   python benchmarks/bench_idle.py --seconds 5
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 1
+
+SETUP = """
+import atexit, warnings; warnings.simplefilter("ignore")
+import pygame, fun_game as fg
+from engine import Player
+fg.init_display()
+fg.REPLAY_DIR = None
+fg.SNAPSHOT_PATH = None
+presents = [0]
+def counted(present):
+    def inner(*args):
+        presents[0] += 1
+        return present(*args)
+    return inner
+pygame.display.update = counted(pygame.display.update)
+pygame.display.flip = counted(pygame.display.flip)
+atexit.register(lambda: print("presents", presents[0]))
+pygame.time.set_timer(pygame.QUIT, {ms}, 1)
+"""
+
+# name -> code that opens the screen and waits for input until the QUIT arrives
+SCREENS = {
+    "target picker": "players = [Player(f'P{i+1}') for i in range(4)]\n"
+                     "fg.choose_target_ui(players, 'Choose a target', [0, 1, 2, 3])",
+    "setup screen": "fg.setup_players_gui()",
+    "rules screen": "fg.show_rules()",
+    # turbo gets the deal out of the way (the human's turn waits the same in every
+    # preset); a fixed seed deals the human a plain hit / stay decision
+    "human turn": "import functools, random\n"
+                  "fg.GameState = functools.partial(fg.GameState, rng=random.Random({seed}))\n"
+                  "fg.set_delay_preset('T')\n"
+                  "fg.players_global[:] = [Player('You'), Player('Bot_1', is_bot=True)]\n"
+                  "fg.play_game_gui()",
+}
+
+def sample(code, seconds):
+    """ Takes in a screen's code and the idle time, runs it in a fresh process, returns (cpu s, wall s, presents)"""
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    script = SETUP.format(ms=int(seconds * 1000)) + code.replace("{seed}", str(SEED))
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True).stdout
+    wall = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    presents = [int(line.split()[1]) for line in out.splitlines() if line.startswith("presents ")]
+    return cpu, wall, presents[-1] if presents else 0
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 idle CPU benchmark")
+    ap.add_argument("--seconds", type=float, default=5.0, help="how long each screen sits idle")
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for name, code in SCREENS.items():
+        # startup (imports, display, assets, GUI theme) is timed by a run that quits
+        # straight away and taken off, leaving just the idle time
+        base_cpu, base_wall, base_presents = sample(code, 0.001)
+        cpu, wall, presents = sample(code, args.seconds)
+        idle_cpu = max(0.0, cpu - base_cpu)
+        idle_wall = max(1e-9, wall - base_wall)
+        results[name] = {"cpu_s": idle_cpu, "wall_s": idle_wall, "cpu_pct": 100 * idle_cpu / idle_wall,
+                         "presents_per_s": max(0, presents - base_presents) / idle_wall}
+    if args.json:
+        print(json.dumps({"seconds": args.seconds, "screens": results}))
+        return
+    print(f"{'screen':<16} {'cpu s':>7} {'wall s':>7} {'cpu %':>7} {'presents/s':>11}   (idle {args.seconds:g}s each)")
+    for name, r in results.items():
+        print(f"{name:<16} {r['cpu_s']:7.2f} {r['wall_s']:7.2f} {r['cpu_pct']:6.1f}% {r['presents_per_s']:11.1f}")
+
+if __name__ == "__main__":
+    main()
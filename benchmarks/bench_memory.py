@@ -0,0 +1,104 @@
+# Memory benchmark: bytes per live table and cost of copying one.
+#
+#   python benchmarks/bench_memory.py --tables 10000
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine import GameState, Player  # noqa: E402
+
+def is_shared(obj):
+    """ Takes in an object, returns True for interpreter-wide singletons that no table pays for (None, bools, small ints, interned strings)"""
+    if obj is None or obj is True or obj is False:
+        return True
+    if type(obj) is int:
+        return -5 <= obj <= 256
+    if type(obj) is str:
+        return sys.intern(obj) is obj
+    return False
+
+def deep_size(obj, seen=None):
+    """ Takes in an object, returns its size in bytes including everything it references (slots, lists, arrays)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or is_shared(obj):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(deep_size(x, seen) for x in obj)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(obj, name):
+                size += deep_size(getattr(obj, name), seen)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+def mid_game_table(n_players, seed):
+    """ Takes in a player count and seed, returns a table stopped a few turns into a game"""
+    rng = random.Random(seed)
+    players = [Player(f"Bot_{i+1}", is_bot=True) for i in range(n_players)]
+    state = GameState(players, rng=rng)
+    state.start()
+    for _ in range(rng.randrange(1, 8)):
+        if state.pending is None or state.pending.kind != "act":
+            break
+        state.apply("hit")
+    while state.pending is not None and state.pending.kind != "act":
+        state.apply(("target", state.pending.allowed[0]))
+    return state
+
+def table_bytes(state):
+    """ Takes in a table, returns its deep size without the RNG (shared or re-seeded in rollouts)"""
+    rng = state.rng
+    state.rng = None
+    try:
+        return deep_size(state)
+    finally:
+        state.rng = rng
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 table memory benchmark")
+    ap.add_argument("--tables", type=int, default=10000)
+    ap.add_argument("--players", default="2,4,8")
+    args = ap.parse_args(argv)
+
+    print("players  deep bytes/table  traced bytes/table  copy us  rng bytes")
+    for n in [int(x) for x in args.players.split(",")]:
+        sample = mid_game_table(n, 0)
+        deep = table_bytes(sample)
+        rng_bytes = deep_size(sample.rng.getstate())
+
+        # live tables sharing one RNG, as a tournament harness would hold them
+        shared = random.Random(0)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tables = []
+        for i in range(args.tables):
+            t = mid_game_table(n, i)
+            t.rng = shared
+            tables.append(t)
+        traced = (tracemalloc.get_traced_memory()[0] - before) / args.tables
+        tracemalloc.stop()
+        del tables
+
+        reps = 20000
+        start = time.perf_counter()
+        for _ in range(reps):
+            sample.copy(rng=shared)
+        copy_us = (time.perf_counter() - start) / reps * 1e6
+        print(f"{n:>7}  {deep:>16,}  {traced:>18,.0f}  {copy_us:>7.2f}  {rng_bytes:>9,}")
+
+if __name__ == "__main__":
+    main()
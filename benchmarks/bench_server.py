@@ -0,0 +1,140 @@
+# Server load test: starts server.py on a free localhost port and plays
+# --clients simulated players against it for --seconds, every one of them
+# rejoining as soon as its game ends. Tables are --seats seats with --bots
+# of them server-side bots, so --clients / (seats - bots) tables run at once.
+#
+# Turn latency is the time from a player sending its decision to the server's
+# answer arriving (the events it caused and the bots' moves after it, up to
+# the next decision). --afk makes that share of players never answer, so the
+# server's --timeout has to stay for them. The clients share the machine
+# with the server, so on few cores they take some of its CPU.
+#
+#   python benchmarks/bench_server.py --clients 400 --seats 4 --bots 2 --seconds 10
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HIT_BELOW = 16
+
+class Stats:
+    def __init__(self):
+        self.latencies = []      # seconds, one per decision answered
+        self.games = 0
+        self.timeouts = 0
+        self.errors = 0
+
+async def player(host, port, i, args, stats, stop):
+    """ Plays games for one simulated client until stop is set"""
+    rng = random.Random(i)
+    afk = rng.random() < args.afk
+    reader, writer = await asyncio.open_connection(host, port)
+    join = (json.dumps({"op": "join", "name": f"load{i}", "seats": args.seats, "bots": args.bots}) + "\n").encode()
+    writer.write(join)
+    seat = None
+    sent = None                  # when our last decision went out
+    try:
+        while not stop.is_set():
+            line = await reader.readline()
+            if not line:
+                break
+            msg = json.loads(line)
+            op = msg["op"]
+            if op == "seated":
+                seat = msg["seat"]
+            elif op == "timeout" and msg["seat"] == seat:
+                stats.timeouts += 1
+            elif op == "error":
+                stats.errors += 1
+            elif op in ("decide", "over"):
+                if sent is not None:
+                    stats.latencies.append(time.perf_counter() - sent)
+                    sent = None
+                if op == "over":
+                    stats.games += 1
+                    writer.write(join)
+                elif msg["seat"] == seat and not afk:
+                    if msg["kind"] == "act":
+                        reply = {"op": "hit" if msg["score"] < HIT_BELOW else "stay"}
+                    else:
+                        others = [s for s in msg["allowed"] if s != seat]
+                        reply = {"op": "target", "seat": rng.choice(others) if others else seat}
+                    sent = time.perf_counter()
+                    writer.write((json.dumps(reply) + "\n").encode())
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+def start_server(args):
+    """ Takes in the arguments, starts server.py on a free port, returns (process, host, port)"""
+    cmd = [sys.executable, os.path.join(ROOT, "server.py"), "--port", "0", "--timeout", str(args.timeout)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()       # "listening on HOST:PORT"
+    if not line.startswith("listening on "):
+        proc.kill()
+        raise SystemExit(f"server did not start: {line!r}")
+    host, port = line.split()[-1].rsplit(":", 1)
+    return proc, host, int(port)
+
+async def load(host, port, args):
+    """ Runs the clients for args.seconds, returns (Stats, wall seconds)"""
+    stats = Stats()
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(player(host, port, i, args, stats, stop)) for i in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats, time.perf_counter() - start
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 server load test")
+    ap.add_argument("--clients", type=int, default=400)
+    ap.add_argument("--seats", type=int, default=4)
+    ap.add_argument("--bots", type=int, default=2, help="server-side bot seats per table")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--afk", type=float, default=0.0, help="share of clients that never answer")
+    ap.add_argument("--timeout", type=float, default=1.0, help="server decision timeout in seconds")
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a report")
+    args = ap.parse_args(argv)
+
+    proc, host, port = start_server(args)
+    try:
+        stats, wall = asyncio.run(load(host, port, args))
+    finally:
+        proc.terminate()
+        proc.wait()
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    server_cpu = usage.ru_utime + usage.ru_stime
+    lat = sorted(stats.latencies) or [0.0]
+    result = {
+        "clients": args.clients, "tables": args.clients // (args.seats - args.bots), "seconds": wall,
+        "actions": len(stats.latencies), "actions_per_s": len(stats.latencies) / wall,
+        "games": stats.games, "games_per_s": stats.games / wall, "timeouts": stats.timeouts, "errors": stats.errors,
+        "p50_ms": 1000 * statistics.median(lat), "p99_ms": 1000 * lat[min(len(lat) - 1, int(0.99 * len(lat)))],
+        "max_ms": 1000 * lat[-1], "server_cpu_pct": 100 * server_cpu / wall,
+    }
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(f"{result['clients']} clients at {result['tables']} tables of {args.seats} ({args.bots} bots), "
+          f"{wall:.1f}s")
+    print(f"actions   {result['actions']:>8}  {result['actions_per_s']:9.0f}/s")
+    print(f"games     {result['games']:>8}  {result['games_per_s']:9.1f}/s")
+    print(f"turn latency  p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  max {result['max_ms']:.2f} ms")
+    print(f"timeouts {result['timeouts']}  errors {result['errors']}  server cpu {result['server_cpu_pct']:.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Snapshot benchmark: size of a saved game and how long saving and loading
+# take, for tables of 2, 4 and 8 seats stopped at a turn boundary mid-game.
+# "save" / "load" include the file (temp file + rename / read); pickle is
+# there for comparison. Times are the median and p99 of --repeat runs.
+#
+#   python benchmarks/bench_snapshot.py --repeat 2000
+
+import argparse
+import json
+import os
+import pickle
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import snapshot  # noqa: E402
+from engine import GameState, Player, default_target, threshold_policy  # noqa: E402
+
+SEED = 12345
+TURN = 40       # the table is snapshotted at the first turn boundary from here on
+
+def mid_game(n_players):
+    """ Takes in a seat count, returns a seeded bot game stopped at a turn boundary around TURN"""
+    players = [Player(f"Bot_{i+1}", is_bot=True) for i in range(n_players)]
+    state = GameState(players, rng=random.Random(SEED))
+    state.start()
+    while state.pending is not None and not (state.pending.kind == "act" and state.turns >= TURN):
+        if state.pending.kind == "target":
+            state.apply(("target", default_target(state)))
+        else:
+            state.apply("hit" if threshold_policy(state, state.pending.seat) else "stay")
+    return state
+
+def timed(fn, repeat):
+    """ Takes in a callable and a run count, returns (median us, p99 us)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return statistics.median(times), times[min(len(times) - 1, int(0.99 * len(times)))]
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 snapshot benchmark")
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = ap.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.f7s")
+    log = ("replays/20260101-000000-12345.f7r", 4096)
+    results = {}
+    for n in (2, 4, 8):
+        state = mid_game(n)
+        data = snapshot.dumps(state, log)
+        snapshot.save(state, path, log)
+        pickled = pickle.dumps(state)
+        results[f"{n}p"] = {
+            "bytes": len(data), "pickle_bytes": len(pickled),
+            "dumps": timed(lambda: snapshot.dumps(state, log), args.repeat),
+            "loads": timed(lambda: snapshot.loads(data), args.repeat),
+            "save": timed(lambda: snapshot.save(state, path, log), args.repeat),
+            "load": timed(lambda: snapshot.load(path), args.repeat),
+            "pickle dumps": timed(lambda: pickle.dumps(state), args.repeat),
+            "pickle loads": timed(lambda: pickle.loads(pickled), args.repeat),
+        }
+    if args.json:
+        print(json.dumps({"turn": TURN, "repeat": args.repeat, "tables": results}))
+        return
+    ops = ("dumps", "loads", "save", "load", "pickle dumps", "pickle loads")
+    print(f"{'table':<6} {'bytes':>6} {'pickle':>7}  " + "  ".join(f"{op + ' us':>17}" for op in ops))
+    print(f"{'':<6} {'':>6} {'':>7}  " + "  ".join(f"{'p50 / p99':>17}" for _ in ops))
+    for name, r in results.items():
+        cells = "  ".join(f"{r[op][0]:>8.1f} /{r[op][1]:>7.1f}" for op in ops)
+        print(f"{name:<6} {r['bytes']:>6} {r['pickle_bytes']:>7}  {cells}")
+
+if __name__ == "__main__":
+    main()
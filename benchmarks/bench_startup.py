@@ -0,0 +1,62 @@
+# Cold-start benchmark: milliseconds from a fresh interpreter to a usable
+# engine (simulations, workers) and to a shown screen (GUI), each measured
+# in its own subprocess so nothing is cached between samples (the card
+# cache file is the exception: "cards from cache" writes it if missing).
+#
+#   python benchmarks/bench_startup.py --runs 10
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> code run in a fresh interpreter; it prints the import / setup time in ms
+PATHS = {
+    "engine": "import engine",
+    "bots": "import bots",
+    "fun_game import": "import fun_game",
+    "fun_game display": "import fun_game; fun_game.HEADLESS = True; fun_game.init_display()",
+    "fun_game setup screen": "import fun_game; fun_game.HEADLESS = True; fun_game.init_gui_manager()",
+    # display plus every card image ready to blit, decoded from the PNGs vs mapped from assets/card_cache.bin
+    "cards from PNGs": "import fun_game; fun_game.HEADLESS = True; fun_game.ASSET_CACHE = None; "
+                       "fun_game.init_display(); fun_game.finish_atlas()",
+    "cards from cache": "import fun_game; fun_game.HEADLESS = True; fun_game.init_display(); fun_game.finish_atlas()",
+}
+
+def sample(code):
+    """ Takes in the code for one path, runs it in a fresh interpreter, returns (in-process ms, whole-process ms)"""
+    script = ("import time; _t = time.perf_counter()\n" + code +
+              "\nprint((time.perf_counter() - _t) * 1000)")
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", script], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    wall = (time.perf_counter() - start) * 1000
+    return float(out.strip().splitlines()[-1]), wall
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 cold-start benchmark")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--json", action="store_true", help="print one JSON object instead of a table")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for name, code in PATHS.items():
+        samples = [sample(code) for _ in range(args.runs)]
+        results[name] = {"import_ms": statistics.median(s[0] for s in samples),
+                         "process_ms": statistics.median(s[1] for s in samples)}
+    if args.json:
+        print(json.dumps({"runs": args.runs, "paths": results}))
+        return
+    print(f"{'path':<22}  import ms  process ms   (median of {args.runs})")
+    for name, r in results.items():
+        print(f"{name:<22}  {r['import_ms']:9.1f}  {r['process_ms']:10.1f}")
+
+if __name__ == "__main__":
+    main()
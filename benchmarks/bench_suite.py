@@ -0,0 +1,283 @@
+# Benchmark suite for the engine and rendering hot paths.
+#
+# Every case builds its fixtures from fixed seeds, so two runs (or two
+# commits) time exactly the same work. Results are per-operation times
+# (median and best of --repeat runs) and can be saved as JSON and compared:
+#
+#   python benchmarks/bench_suite.py --json before.json
+#   python benchmarks/bench_suite.py --compare before.json
+#   python benchmarks/bench_suite.py --filter render
+#
+# Rendering cases run on SDL's dummy video driver.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from engine import (Decision, Deck, GameState, Player, bot_should_hit, make_deck,  # noqa: E402
+                    play_headless)
+import replay  # noqa: E402
+
+SEED = 12345
+CASES = {}     # name -> setup(number), which builds fixtures for number ops and returns the op callable
+
+def case(name):
+    """ Decorator registering a benchmark case under name"""
+    def register(fn):
+        CASES[name] = fn
+        return fn
+    return register
+
+# ---------- Engine fixtures ----------
+def staged_table(hands, draws, n_players=3):
+    """
+    Takes in the hands for the first seats and the cards to draw next (in order),
+    returns a table where seat 0 is about to act with those cards on top of a fresh deck.
+    """
+    rng = random.Random(SEED)
+    players = [Player(f"P{i+1}", is_bot=True) for i in range(n_players)]
+    for p, hand in zip(players, hands):
+        p.hand = hand
+        p.hand_face = array('b', [1] * len(hand))
+        p.has_second = 21 in hand
+    state = GameState(players, rng=rng, deck=make_deck(rng) + list(reversed(draws)))
+    state.phase = "play"
+    state.current_idx = 0
+    state.pending = Decision("act", 0)
+    return state
+
+def resolve_case(hands, draws, targets=()):
+    """ Returns a setup for a case that hits on a staged table and answers its target decisions"""
+    def setup(number):
+        base = staged_table(hands, draws)
+        tables = [base.copy(rng=random.Random(SEED)) for _ in range(number)]
+        it = iter(tables)
+
+        def op():
+            state = next(it)
+            state.apply("hit")
+            for tgt in targets:
+                state.apply(("target", tgt))
+        return op
+    return setup
+
+CASES["resolve_draw normal"] = resolve_case([[3, 5]], [7])
+CASES["resolve_draw bust with second chance"] = resolve_case([[3, 5, 21]], [5])
+CASES["resolve_draw freeze"] = resolve_case([[3, 5]], [19], targets=(1,))
+# FLIP3 onto ourselves, whose second draw is another FLIP3 that cascades three more
+CASES["resolve_draw flip3 cascade"] = resolve_case([[3]], [20, 2, 20, 4, 6, 8, 9], targets=(0,))
+
+@case("make_deck")
+def _make_deck(number):
+    rng = random.Random(SEED)
+    return lambda: make_deck(rng)
+
+@case("Deck build")
+def _deck_build(number):
+    cards = make_deck(random.Random(SEED))
+    return lambda: Deck(cards)
+
+def _hand_player():
+    p = Player("P1", is_bot=True)
+    p.hand = [3, 7, 11, 14, 18, 1]
+    return p
+
+@case("compute_current_score")
+def _score(number):
+    return _hand_player().compute_current_score
+
+@case("bot_should_hit")
+def _bot(number):
+    p = _hand_player()
+    return lambda: bot_should_hit(p)
+
+def headless_game(n_players):
+    def setup(number):
+        seeds = iter(range(number))
+
+        def op():
+            players = [Player(f"Bot_{i+1}", is_bot=True) for i in range(n_players)]
+            play_headless(GameState(players, rng=random.Random(f"bench:{next(seeds)}")))
+        return op
+    return setup
+
+for _n in (2, 3, 6):
+    CASES[f"headless game {_n}p"] = headless_game(_n)
+
+def record_game(path, seed, n_players):
+    """ Takes in a log path, seed and player count, plays a bot-only game recording it to path"""
+    players = [Player(f"Bot_{i+1}", is_bot=True) for i in range(n_players)]
+    state = GameState(players, rng=random.Random(seed))
+    state.recorder = replay.ReplayLog(path, seed, players)
+    play_headless(state)
+
+@case("headless game 3p recorded")
+def _recorded(number):
+    path = os.path.join(tempfile.mkdtemp(), "bench.f7r")
+    seeds = iter(range(number))
+    return lambda: record_game(path, next(seeds), 3)
+
+@case("replay 3p game")
+def _replay(number):
+    folder = tempfile.mkdtemp()
+    paths = []
+    for seed in range(number):
+        paths.append(os.path.join(folder, f"{seed}.f7r"))
+        record_game(paths[-1], seed, 3)
+    it = iter(paths)
+    return lambda: replay.replay(next(it))
+
+# ---------- Rendering fixtures ----------
+_fg = None
+
+def fun_game():
+    """ Imports fun_game and opens its (dummy) display once"""
+    global _fg
+    if _fg is None:
+        import warnings
+        warnings.simplefilter("ignore")
+        import fun_game as fg
+        fg.HEADLESS = True
+        fg.init_display()
+        _fg = fg
+    return _fg
+
+def render_players(n_players, hand_size):
+    """ Takes in a player count and hand size, returns players holding that many face-up cards"""
+    rng = random.Random(SEED)
+    players = []
+    for i in range(n_players):
+        p = Player(f"Player {i+1}", is_bot=i > 0)
+        p.hand = [rng.randrange(22) for _ in range(hand_size)]
+        p.hand_face = array('b', [1] * hand_size)
+        p.score_total = rng.randrange(200)
+        players.append(p)
+    return players
+
+def draw_players_case(n_players, hand_size):
+    def setup(number):
+        fg = fun_game()
+        players = render_players(n_players, hand_size)
+        return lambda: fg.draw_players(players, 0)
+    return setup
+
+for _n in (2, 4, 8):
+    for _h in (2, 6, 10):
+        CASES[f"render draw_players {_n}p x {_h} cards"] = draw_players_case(_n, _h)
+
+@case("render draw_deck_info")
+def _deck_info(number):
+    fg = fun_game()
+    deck = Deck(make_deck(random.Random(SEED)))
+    player = render_players(1, 4)[0]
+    return lambda: fg.draw_deck_info(deck, player)
+
+@case("render show_message")
+def _message(number):
+    fg = fun_game()
+    return lambda: fg.show_message("Player 1 BUSTED!")
+
+def animate_case(n_players, hand_size):
+    def setup(number):
+        fg = fun_game()
+        players = render_players(n_players, hand_size)
+        fg.current_global_players[:] = [players, 0, None]
+        fg.current_global_deck[0] = Deck(make_deck(random.Random(SEED)))
+        # one whole hit animation per call (HIT_ANIM_MS worth of frames, uncapped)
+        return lambda: fg.animate_card_move(7, n_players - 1, hand_size, fg.HIT_ANIM_MS)
+    return setup
+
+for _n in (2, 4, 8):
+    CASES[f"render animate_card_move hit {_n}p x 6 cards"] = animate_case(_n, 6)
+
+# ---------- Runner ----------
+def calibrate(setup, min_time=0.05):
+    """ Takes in a case setup, returns how many ops take about min_time seconds"""
+    number = 1
+    while True:
+        op = setup(number)
+        start = time.perf_counter()
+        for _ in range(number):
+            op()
+        if time.perf_counter() - start >= min_time or number >= 1 << 20:
+            return number
+        number *= 4
+
+def run_case(setup, repeat, number=None):
+    """ Takes in a case setup, returns {'median_us', 'best_us', 'number'} per op over repeat runs"""
+    number = number or calibrate(setup)
+    times = []
+    for _ in range(repeat):
+        op = setup(number)           # fresh fixtures, outside the timed loop
+        gc.collect()
+        gc.disable()                 # as timeit does: a collection mid-loop is noise
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                op()
+            times.append((time.perf_counter() - start) / number * 1e6)
+        finally:
+            gc.enable()
+    return {"median_us": statistics.median(times), "best_us": min(times), "number": number}
+
+def machine_info():
+    """ Returns what a result was measured on (commit, interpreter, platform)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "seed": SEED, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 benchmark suite")
+    ap.add_argument("--filter", default="", help="only run cases whose name contains this")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", help="write the results to this file")
+    ap.add_argument("--compare", help="earlier --json file to compare against")
+    ap.add_argument("--list", action="store_true", help="list the case names and exit")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return
+    before = {}
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)["results"]
+
+    results = {}
+    print(f"{'case':<48} {'median us':>11} {'best us':>11}" + (f" {'vs before':>10}" if before else ""))
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        # compared runs reuse the earlier op counts so both time the same work
+        r = run_case(setup, args.repeat, before.get(name, {}).get("number"))
+        results[name] = r
+        line = f"{name:<48} {r['median_us']:>11.2f} {r['best_us']:>11.2f}"
+        if name in before:
+            line += f" {r['median_us'] / before[name]['median_us']:>9.2f}x"
+        print(line, flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=1)
+
+if __name__ == "__main__":
+    main()
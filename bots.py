@@ -0,0 +1,192 @@
+# Bot policies beyond the simple bot_should_hit threshold.
+#
+# A policy is a callable policy(state, seat) -> True to hit, False to stay,
+# the same shape engine.play_headless and simulate.py use.
+
+import os
+import subprocess
+import sys
+from functools import lru_cache
+
+import dp_solver
+from dp_solver import TABLE_PATH, StopTable
+from engine import FLIP7_BONUS, MODIFIER_MAP, active_player_indices, threshold_policy
+from mcts import MCTSBot
+
+# ---------- Expected-value policy ----------
+def _score(num_sum, mod_sum, x2):
+    """ Takes in the hand totals, returns the round score"""
+    return num_sum * (2 if x2 else 1) + mod_sum
+
+def _unique(num_mask):
+    return num_mask.bit_count()
+
+@lru_cache(maxsize=1 << 14)
+def _forced(num_mask, num_sum, x2, has_second, counts, k):
+    """ forced_value with mod_sum 0, returns (expected score, probability of not busting)"""
+    total = sum(counts)
+    mods = counts[13] + counts[14] + counts[15] + counts[16] + counts[17]
+    mean_mod = sum(counts[v] * MODIFIER_MAP[v] for v in range(13, 18)) / mods if mods else 0
+    dead = counts[19] + counts[20] + counts[21]
+    memo = {}
+
+    def go(mask, ns, x2, sec, k):
+        key = (mask, x2, sec, k)
+        if key in memo:
+            return memo[key]
+        if k == 0 or total == 0:
+            res = (_score(ns, 0, x2) + (FLIP7_BONUS if _unique(mask) >= 7 else 0), 1.0)
+        elif k == 1:
+            # last draw in closed form: this level is where nearly all the states are
+            mul = 2 if x2 else 1
+            uniq = _unique(mask)
+            here = ns * mul + (FLIP7_BONUS if uniq >= 7 else 0)
+            bonus = FLIP7_BONUS if uniq + 1 >= 7 else 0
+            ev = ps = 0.0
+            dup = 0
+            for v in range(13):
+                n = counts[v]
+                if not n:
+                    continue
+                if mask >> v & 1:
+                    dup += n
+                    continue
+                ev += n * ((ns + v) * mul + bonus); ps += n
+            if dup and sec:
+                ev += dup * here; ps += dup
+            ev += mods * (here + mean_mod) + dead * here; ps += mods + dead
+            if counts[18]:
+                ev += counts[18] * (ns * 2 + (FLIP7_BONUS if uniq >= 7 else 0)); ps += counts[18]
+            res = (ev / total, ps / total)
+        else:
+            ev = ps = 0.0
+            dup = 0
+            for v in range(13):
+                n = counts[v]
+                if not n:
+                    continue
+                if mask >> v & 1:
+                    dup += n
+                    continue
+                e, p = go(mask | 1 << v, ns + v, x2, sec, k - 1)
+                ev += n * e; ps += n * p
+            if dup and sec:
+                e, p = go(mask, ns, x2, False, k - 1)
+                ev += dup * e; ps += dup * p
+            if mods:
+                e, p = go(mask, ns, x2, sec, k - 1)
+                ev += mods * (e + p * mean_mod); ps += mods * p
+            if counts[18]:
+                e, p = go(mask, ns, True, sec, k - 1)
+                ev += counts[18] * e; ps += counts[18] * p
+            if dead:
+                e, p = go(mask, ns, x2, sec, k - 1)
+                ev += dead * e; ps += dead * p
+            res = (ev / total, ps / total)
+        memo[key] = res
+        return res
+
+    return go(num_mask, num_sum, x2, has_second, k)
+
+def forced_value(num_mask, num_sum, mod_sum, x2, has_second, counts, k):
+    """
+    Expected score after k forced FLIP3 draws onto our own hand, drawn from counts.
+    A bust scores 0, a Second Chance save keeps going, and action cards drawn
+    meanwhile are dead (as the engine leaves them in the hand).
+
+    The k draws are treated as with replacement so states reached in any order
+    merge. The value is affine in mod_sum (kept only if we don't bust), so
+    mod_sum stays out of the memo key and all modifiers collapse into one branch
+    at their mean amount.
+    """
+    ev, survive = _forced(num_mask, num_sum, x2, has_second, counts, k)
+    return ev + survive * mod_sum
+
+@lru_cache(maxsize=1 << 16)
+def hit_value(num_mask, num_sum, mod_sum, x2, has_second, alone, counts):
+    """
+    Exact expected score of drawing one more card and then banking, given the hand
+    (13-bit number mask, sums, X2, Second Chance) and the counts of the pile the card
+    comes from. alone means no opponent is active, so FLIP3 and FREEZE land on us.
+    """
+    total = sum(counts)
+    current = _score(num_sum, mod_sum, x2)
+    if total == 0:
+        return current
+    uniq = _unique(num_mask)
+    ev = 0.0
+    for v, n in enumerate(counts):
+        if not n:
+            continue
+        if v < 13:
+            if num_mask >> v & 1:
+                # duplicate: bust unless Second Chance eats it
+                val = current if has_second else 0
+            else:
+                val = _score(num_sum + v, mod_sum, x2)
+                if uniq + 1 >= 7:
+                    val += FLIP7_BONUS
+        elif v < 18:
+            val = current + MODIFIER_MAP[v]
+        elif v == 18:
+            val = _score(num_sum, mod_sum, True)
+        elif v == 20 and alone:
+            val = forced_value(num_mask, num_sum, mod_sum, x2, has_second, counts, 3)
+        else:
+            # FREEZE banks what we have (or goes to an opponent), FLIP3 goes to an
+            # opponent, SECOND only protects: none of them change this round's score
+            val = current
+        ev += n * val
+    return ev / total
+
+def ev_policy(state, seat):
+    """ Takes in a game state and seat, returns True if hitting has a higher exact expected score than staying"""
+    p = state.players[seat]
+    counts, _ = state.deck.next_counts()
+    alone = active_player_indices(state.players) == [seat]
+    ev_hit = hit_value(p.num_mask, p.num_sum, p.mod_sum, p.x2, p.has_second, alone, tuple(counts))
+    return ev_hit > p.compute_current_score()
+
+# ---------- Lookup-table policy ----------
+# The table is not shipped: it is solved on first use (build_stop_table) and
+# kept in assets/ after that.
+_stop_table = None     # StopTable once loaded, False if there is no table file
+
+def build_stop_table(path=TABLE_PATH, background=False):
+    """
+    Solves the dp_solver.py lookup table and saves it to path, unless it is already there.
+    In the background it runs as a child process (on one core) and that process is
+    returned for the caller to poll; otherwise it returns None once the table is saved.
+    """
+    if os.path.exists(path):
+        return None
+    if background:
+        cmd = [sys.executable, dp_solver.__file__, "--workers", "1", "--out", path]
+        return subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sys.stderr.write(f"solving the hit/stay lookup table into {path} (first run only)...\n")
+    dp_solver.solve().save(path)
+    return None
+
+def load_stop_table(path=TABLE_PATH, reload=False):
+    """ Loads the dp_solver.py lookup table dp_policy answers from (once, or again if reload), returns it or None if the file is missing"""
+    global _stop_table
+    if _stop_table is None or reload:
+        _stop_table = StopTable.load(path) if os.path.exists(path) else False
+    return _stop_table or None
+
+def dp_policy(state, seat):
+    """ Takes in a game state and seat, returns the solved hit/stay answer for it (threshold bot if there is no table)"""
+    table = load_stop_table()
+    if table is None:
+        return threshold_policy(state, seat)
+    counts, _ = state.deck.next_counts()
+    return table.should_hit(state.players[seat], counts)
+
+# ---------- Registry ----------
+POLICIES = {
+    "threshold": threshold_policy,
+    "ev": ev_policy,
+    "dp": dp_policy,
+    "mcts": MCTSBot(prior=dp_policy),      # 50 ms per decision, searched in-process
+}
+TABLE_POLICIES = ("dp", "mcts")         # the ones that read the lookup table
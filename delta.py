@@ -0,0 +1,189 @@
+# Delta-encoded table state for spectators and thin clients.
+#
+# A thin client (a spectator, a remote renderer) does not run the rules: it
+# keeps the public picture of a table and is sent only what changes in it.
+# DeltaEncoder listens to a game's events and at each one compares the table
+# with the picture it last sent, so a frame carries the event (to animate)
+# and just the fields that changed since the frame before: cards added to a
+# seat, a hand replaced, stayed / busted, the scores, the deck and discard
+# counts, the pending decision. Comparing instead of reading meaning into each
+# event kind keeps the picture exact through everything the rules do quietly
+# (action cards leaving a FLIP3 hand, a card landing after its event, ...).
+#
+# The frames of one action go out as one delta message, and the picture is
+# exact at the end of each (the deck and discard counts and the pending
+# decision are only compared there, as they churn mid-action). Every KEYFRAME_EVERY
+# deltas the encoder also takes a keyframe, the whole picture; a client that
+# joins mid-game (or fell behind) is sent the latest keyframe and the deltas
+# since, so catching up never costs more than KEYFRAME_EVERY deltas.
+#
+# Messages are protocol lines (see server.py):
+#   {"op": "keyframe", "seq": 12, "players": [["Ann", false], ...],
+#    "seats": [[hand, flags, score_total, score_current], ...], "table": [deck, discard, round_no,
+#    dealer, pending, triggerer, winner]}          (pending: [seat, kind] or null)
+#   {"op": "delta", "seq": 12, "frames": [frame, ...]}
+# seq numbers the deltas; a keyframe's is that of the delta after it. A frame is the
+# event's kind, seat, target, card (trailing nulls left off), then its changes; a frame
+# of changes alone follows no event. Changes are lists, event fields never are:
+#   ["+", seat, card, ...]           cards added to the end of seat's hand
+#   ["h", seat, card, ...]           seat's hand is now exactly these cards
+#   ["f", seat, flags]               1 stayed, 2 busted
+#   ["s", seat, total, current]      score_total and score_current
+#   ["t", i, value]                  table field i (in keyframe order) is now value
+
+import json
+
+KEYFRAME_EVERY = 32
+BETWEEN_ACTIONS = (0, 1, 4)  # table fields compared only when a delta closes: deck, discard, pending
+
+def encode(msg):
+    """ Takes in a message dict, returns it as one protocol line"""
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+def seat_fields(p):
+    """ Takes in a Player, returns its [flags, score_total, score_current]"""
+    return [p.stayed | p.busted << 1, p.score_total, p.score_current]
+
+def table_fields(state):
+    """ Takes in a game, returns its table fields in keyframe order"""
+    req = state.pending
+    return [len(state.deck.cards), len(state.deck.discard), state.round_no, state.dealer_idx,
+            None if req is None else [req.seat, req.kind], state.triggerer_idx, state.winner]
+
+def picture(state):
+    """ Takes in a game, returns its public picture as (seats, table), the shape TableView keeps"""
+    return [[list(p.hand)] + seat_fields(p) for p in state.players], table_fields(state)
+
+class DeltaEncoder:
+    """ Turns a game's events into delta messages, set as (or called from) GameState.listener"""
+
+    def __init__(self, state, keyframe_every=KEYFRAME_EVERY):
+        """ Takes in a game (started or not), starts the stream with a keyframe of it"""
+        self.state = state
+        self.keyframe_every = keyframe_every
+        self.seq = 0
+        self.frames = []            # frames of the delta being built
+        self.keyframe = b""         # latest keyframe line
+        self.since = []             # delta lines after it
+        self._catchup = None
+        self._hands = [p.hand.tobytes() for p in state.players]
+        self._seats = [seat_fields(p) for p in state.players]
+        self._table = table_fields(state)
+        self._take_keyframe()
+
+    def _changes(self, closing):
+        """ Compares the table with the picture last sent (all of it if closing, else not BETWEEN_ACTIONS), returns the changes (and takes them as sent)"""
+        out = []
+        hands, seats = self._hands, self._seats
+        for i, p in enumerate(self.state.players):
+            hand = p.hand.tobytes()
+            old = hands[i]
+            if hand != old:
+                if hand.startswith(old):
+                    out.append(["+", i, *hand[len(old):]])
+                else:
+                    out.append(["h", i, *hand])
+                hands[i] = hand
+            fields = seat_fields(p)
+            old = seats[i]
+            if fields != old:
+                if fields[0] != old[0]:
+                    out.append(["f", i, fields[0]])
+                if fields[1:] != old[1:]:
+                    out.append(["s", i, fields[1], fields[2]])
+                seats[i] = fields
+        table = table_fields(self.state)
+        if not closing:
+            for j in BETWEEN_ACTIONS:
+                table[j] = self._table[j]
+        if table != self._table:
+            out += [["t", j, value] for j, (value, old) in enumerate(zip(table, self._table)) if value != old]
+            self._table = table
+        return out
+
+    def __call__(self, ev):
+        """ Takes in an engine event, adds its frame"""
+        frame = [ev.kind, ev.seat, ev.target, ev.card]
+        while frame[-1] is None:
+            frame.pop()
+        frame += self._changes(False)
+        self.frames.append(frame)
+
+    def flush(self):
+        """ Closes the delta being built (with whatever changed after its last event), returns its line (b"" if nothing changed)"""
+        changes = self._changes(True)
+        if changes:
+            self.frames.append(changes)
+        if not self.frames:
+            return b""
+        line = encode({"op": "delta", "seq": self.seq, "frames": self.frames})
+        self.seq += 1
+        self.frames = []
+        self.since.append(line)
+        self._catchup = None
+        if len(self.since) >= self.keyframe_every:
+            self._take_keyframe()
+        return line
+
+    def _take_keyframe(self):
+        players = self.state.players
+        self.keyframe = encode({"op": "keyframe", "seq": self.seq,
+                                "players": [[p.name, p.is_bot] for p in players],
+                                "seats": [[list(h)] + s for h, s in zip(self._hands, self._seats)],
+                                "table": self._table})
+        self.since = []
+        self._catchup = None
+
+    def catchup(self):
+        """ Returns what a client joining now needs: the latest keyframe and the deltas since"""
+        if self._catchup is None:
+            self._catchup = b"".join([self.keyframe] + self.since)
+        return self._catchup
+
+# ---------- Client side ----------
+class TableView:
+    """ The picture a thin client keeps, built from keyframe and delta messages"""
+
+    def __init__(self):
+        self.seq = None             # seq of the next delta expected (None until a keyframe)
+        self.players = []
+        self.seats = []             # [hand, flags, score_total, score_current] per seat
+        self.table = []
+        self.events = 0
+
+    def apply(self, msg):
+        """ Takes in a decoded keyframe or delta message, brings the picture up to date; raises ValueError on a gap"""
+        op = msg["op"]
+        if op == "keyframe":
+            self.seq = msg["seq"]
+            self.players = msg["players"]
+            self.seats = msg["seats"]
+            self.table = msg["table"]
+            return
+        if op != "delta":
+            return
+        if self.seq is None:
+            return                  # deltas before our first keyframe
+        if msg["seq"] < self.seq:
+            return                  # already in the keyframe we caught up from
+        if msg["seq"] != self.seq:
+            raise ValueError(f"expected delta {self.seq}, got {msg['seq']}")
+        self.seq += 1
+        seats, table = self.seats, self.table
+        for frame in msg["frames"]:
+            if not isinstance(frame[0], list):
+                self.events += 1
+            for change in frame:
+                if not isinstance(change, list):
+                    continue
+                tag = change[0]
+                if tag == "+":
+                    seats[change[1]][0] += change[2:]
+                elif tag == "h":
+                    seats[change[1]][0] = change[2:]
+                elif tag == "f":
+                    seats[change[1]][1] = change[2]
+                elif tag == "s":
+                    seats[change[1]][2:] = change[2:]
+                else:
+                    table[change[1]] = change[2]
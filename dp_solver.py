@@ -0,0 +1,261 @@
+# Offline optimal-stopping solver for the hit/stay decision.
+#
+# For every (number mask, held modifiers, X2, Second Chance, deck bucket)
+# state it works out whether hitting beats staying when we may keep drawing
+# as long as we like, and saves the answers as a packed bit table. Bots load
+# the table once and then decide with a single index lookup. The table is not
+# kept in git: bots.build_stop_table solves it on first use (the game in the
+# background, simulate.py and tournament.py before they start).
+#
+# Model (one player's round, opponents still active):
+#   * the next card comes from the deck bucket's representative mix, drawn
+#     with replacement
+#   * FREEZE and FLIP3 go to an opponent, as does a SECOND, modifier or X2
+#     we already hold, so those draws leave our state unchanged and only
+#     condition the next draw on something else
+#   * a duplicate number busts (0) unless Second Chance absorbs it; a 7th
+#     unique number ends the round with the Flip 7 bonus
+#
+# Deck bucket: the draw pile is summarized by the share of number cards left
+# and the mean value of those number cards, each cut into `levels` bins.
+# More levels means a more faithful deck model and a bigger table.
+#
+#   python dp_solver.py --levels 6
+
+import argparse
+import math
+import os
+import random
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from engine import FLIP7_BONUS, MODIFIER_MAP, N_CARD_VALUES, Deck
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "dp_table.bin")
+MAGIC = b"F7DP"
+VERSION = 1
+HEADER = struct.Struct("<4sBB")    # magic, version, levels
+DEFAULT_LEVELS = 6
+CACHE_SIZE = 1 << 18       # LRU bound on solver states held in memory at once
+
+# deck bucket ranges (a fresh deck has 78/175 = 0.45 numbers, mean value 8.3)
+SHARE_RANGE = (0.2, 0.7)
+MEAN_RANGE = (6.0, 10.5)
+
+# masks with at most 6 number cards are the only non-terminal ones; rank them densely
+LIVE_MASKS = [m for m in range(1 << 13) if m.bit_count() <= 6]
+MASK_RANK = [-1] * (1 << 13)
+for _i, _m in enumerate(LIVE_MASKS):
+    MASK_RANK[_m] = _i
+MASK_SUM = [0] * (1 << 13)
+for _m in range(1, 1 << 13):
+    # mask minus its lowest card, plus that card (cheap enough to build at import)
+    MASK_SUM[_m] = MASK_SUM[_m & (_m - 1)] + (_m & -_m).bit_length() - 1
+MOD_SUM = [sum(MODIFIER_MAP[13 + b] for b in range(5) if m >> b & 1) for m in range(32)]
+STATES_PER_BUCKET = len(LIVE_MASKS) * 2 * 2 * 32
+
+def state_index(bucket, num_mask, x2, has_second, mod_mask):
+    """ Takes in a deck bucket and hand state, returns its bit position in the table"""
+    return (((bucket * len(LIVE_MASKS) + MASK_RANK[num_mask]) * 2 + x2) * 2 + has_second) * 32 + mod_mask
+
+# ---------- Deck buckets ----------
+def _bin(x, lo, hi, levels):
+    """ Takes in a value and a range, returns its bin index clamped to [0, levels)"""
+    return min(levels - 1, max(0, int((x - lo) / (hi - lo) * levels)))
+
+def _center(i, lo, hi, levels):
+    return lo + (i + 0.5) * (hi - lo) / levels
+
+def deck_bucket(counts, levels):
+    """ Takes in a per-value count vector and the table's levels, returns the deck bucket index"""
+    nums = sum(counts[:13])
+    if not nums:
+        return 0
+    share = nums / sum(counts)
+    mean = sum(v * counts[v] for v in range(13)) / nums
+    return _bin(share, *SHARE_RANGE, levels) * levels + _bin(mean, *MEAN_RANGE, levels)
+
+def bucket_probs(bucket, levels):
+    """ Takes in a deck bucket, returns its representative per-value draw probabilities"""
+    share = _center(bucket // levels, *SHARE_RANGE, levels)
+    mean = _center(bucket % levels, *MEAN_RANGE, levels)
+    fresh = Deck(rng=random.Random(0)).counts
+
+    # tilt the fresh number mix by exp(theta * v) until its mean matches the bucket's
+    def tilted(theta):
+        return [fresh[v] * math.exp(theta * v) for v in range(13)]
+    lo, hi = -3.0, 3.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        w = tilted(mid)
+        if sum(v * w[v] for v in range(13)) / sum(w) < mean:
+            lo = mid
+        else:
+            hi = mid
+    w = tilted((lo + hi) / 2)
+    wsum = sum(w)
+    rest = sum(fresh[13:])
+    return [share * x / wsum for x in w] + [(1 - share) * fresh[c] / rest for c in range(13, N_CARD_VALUES)]
+
+# ---------- Solver ----------
+def solve_bucket(probs, cache_size=CACHE_SIZE):
+    """
+    Takes in per-value draw probabilities, returns (bits, cache_info) where bits is
+    a bytearray with one hit(1)/stay(0) bit per state of this bucket, in state_index order.
+    """
+    nums = [(v, probs[v]) for v in range(13) if probs[v] > 0]
+    mods = [(c - 13, probs[c]) for c in range(13, 18) if probs[c] > 0]
+    p_x2 = probs[18]
+    p_second = probs[21]
+
+    @lru_cache(maxsize=cache_size)
+    def value(mask, x2, mod_mask):
+        """ Optimal expected round score from this state, returns (without, with) Second Chance"""
+        stay = MASK_SUM[mask] * (2 if x2 else 1) + MOD_SUM[mod_mask]
+        ev0 = ev1 = 0.0       # draws that move us to a bigger hand
+        moved = 0.0
+        dup = 0.0
+        unique = mask.bit_count()
+        for v, p in nums:
+            if mask >> v & 1:
+                dup += p
+                continue
+            moved += p
+            if unique == 6:
+                flip7 = (MASK_SUM[mask] + v) * (2 if x2 else 1) + MOD_SUM[mod_mask] + FLIP7_BONUS
+                ev0 += p * flip7
+                ev1 += p * flip7
+            else:
+                v0, v1 = value(mask | 1 << v, x2, mod_mask)
+                ev0 += p * v0
+                ev1 += p * v1
+        for b, p in mods:
+            if not mod_mask >> b & 1:
+                moved += p
+                v0, v1 = value(mask, x2, mod_mask | 1 << b)
+                ev0 += p * v0
+                ev1 += p * v1
+        if p_x2 and not x2:
+            moved += p_x2
+            v0, v1 = value(mask, True, mod_mask)
+            ev0 += p_x2 * v0
+            ev1 += p_x2 * v1
+
+        # Without Second Chance a SECOND moves us to the "with" state, and with it a
+        # duplicate moves us back, so the pair is solved together by value iteration
+        # (each pass shrinks the error by at least p_second / (moved + p_second)).
+        with0, with1 = moved + dup + p_second, moved + dup
+        s0 = s1 = stay
+        for _ in range(100):
+            n1 = max(stay, (ev1 + dup * s0) / with1) if with1 else stay
+            n0 = max(stay, (ev0 + p_second * n1) / with0) if with0 else stay
+            if abs(n0 - s0) < 1e-12 and abs(n1 - s1) < 1e-12:
+                break
+            s0, s1 = n0, n1
+        return n0, n1
+
+    bits = bytearray(STATES_PER_BUCKET // 8)
+    # most cards first, so each state's successors are already solved
+    for mask in sorted(LIVE_MASKS, key=int.bit_count, reverse=True):
+        for x2 in (1, 0):
+            for mod_mask in range(31, -1, -1):
+                stay = MASK_SUM[mask] * (2 if x2 else 1) + MOD_SUM[mod_mask]
+                for sec, v in enumerate(value(mask, bool(x2), mod_mask)):
+                    if v > stay:
+                        i = state_index(0, mask, x2, sec, mod_mask)
+                        bits[i >> 3] |= 1 << (i & 7)
+    info = tuple(value.cache_info())    # (hits, misses, maxsize, currsize); CacheInfo itself won't pickle
+    value.cache_clear()
+    return bits, info
+
+def _solve_one(bucket, levels, cache_size):
+    bits, info = solve_bucket(bucket_probs(bucket, levels), cache_size)
+    return bucket, bits, info
+
+def solve(levels=DEFAULT_LEVELS, cache_size=CACHE_SIZE, workers=None, progress=None):
+    """
+    Takes in the number of bins per deck statistic, solves every deck bucket (across
+    a process pool unless workers == 1) and returns the StopTable.
+    progress (optional) is called as progress(done_buckets, total_buckets, cache_info).
+    """
+    n = levels * levels
+    chunks = [None] * n
+    if workers == 1:
+        for b in range(n):
+            _, chunks[b], info = _solve_one(b, levels, cache_size)
+            if progress: progress(b + 1, n, info)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_solve_one, b, levels, cache_size) for b in range(n)]
+            for done, fut in enumerate(as_completed(futures), 1):
+                b, chunks[b], info = fut.result()
+                if progress: progress(done, n, info)
+    return StopTable(levels, b"".join(chunks))
+
+# ---------- Lookup table ----------
+class StopTable:
+    def __init__(self, levels, bits):
+        """ Takes in the number of bins per deck statistic and the packed hit bits"""
+        self.levels = levels
+        self.bits = bits
+
+    def should_hit(self, player, counts):
+        """ Takes in a player and the per-value counts of the pile the next card comes from, returns True to hit"""
+        if player.num_mask.bit_count() > 6:
+            return False
+        mod_mask = 0
+        for c in player.hand:
+            if 13 <= c <= 17:
+                mod_mask |= 1 << (c - 13)
+        i = state_index(deck_bucket(counts, self.levels), player.num_mask, player.x2, player.has_second, mod_mask)
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+    def save(self, path=TABLE_PATH):
+        """ Writes the table to path (header + zlib-compressed bits), returns the file size in bytes"""
+        data = HEADER.pack(MAGIC, VERSION, self.levels) + zlib.compress(self.bits, 9)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    @classmethod
+    def load(cls, path=TABLE_PATH):
+        """ Takes in a table file path, returns the StopTable saved there"""
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, levels = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} stop table")
+        bits = zlib.decompress(data[HEADER.size:])
+        if len(bits) != levels * levels * STATES_PER_BUCKET // 8:
+            raise ValueError(f"{path} is truncated")
+        return cls(levels, bits)
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Solve Flip 7 hit/stay by dynamic programming and save the lookup table")
+    ap.add_argument("--levels", type=int, default=DEFAULT_LEVELS, help="bins per deck statistic (buckets = levels^2)")
+    ap.add_argument("--cache", type=int, default=CACHE_SIZE, help="LRU bound on memoized states")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--out", default=TABLE_PATH)
+    args = ap.parse_args(argv)
+
+    def progress(done, total, info):
+        hits, misses, _, currsize = info
+        print(f"  bucket {done}/{total}: {currsize:,} entries cached, {hits:,} hits / {misses:,} misses")
+
+    start = time.perf_counter()
+    table = solve(args.levels, args.cache, args.workers, progress)
+    elapsed = time.perf_counter() - start
+    size = table.save(args.out)
+    states = args.levels ** 2 * STATES_PER_BUCKET
+    print(f"{states:,} states in {elapsed:.1f}s ({states / elapsed:,.0f} states/s)")
+    print(f"table: {len(table.bits):,} bytes packed, {size:,} bytes on disk -> {args.out}")
+
+if __name__ == "__main__":
+    main()
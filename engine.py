@@ -0,0 +1,834 @@
+# Flip 7 rules engine.
+#
+# Everything in here is plain Python: no pygame, no display, no sleeps.
+# fun_game.py renders on top of GameState by listening to the events it
+# emits, and simulations drive it directly at full CPU speed.
+
+import random
+from array import array
+from collections import namedtuple
+
+# ---------- CONFIG ----------
+BOT_HIT_THRESHOLD = 16   # lower -> more conservative bots; higher -> more aggressive
+WIN_SCORE = 200
+FLIP7_BONUS = 15
+
+# Card constants
+MODIFIER_MAP = {13: 2, 14: 4, 15: 6, 16: 8, 17: 10}
+LABEL_MAP = {18: "X2", 19: "FREEZE", 20: "FLIP3", 21: "SECOND"}
+
+# ---------- Deck builder ----------
+def make_deck(rng):
+    """ Create a deck of cards shuffled with rng (the game's random.Random), returns it as a list"""
+    deck = []
+    deck.extend([0]*1)
+    for v in range(1, 13):
+        deck.extend([v]*v)
+    for v in range(13, 18):
+        deck.append(v)
+    if 18 not in deck:
+        deck.append(18)
+    for a in (19,20,21):
+        deck.extend([a]*30)
+    rng.shuffle(deck)
+    return deck
+
+# ---------- Deck ----------
+N_CARD_VALUES = 22        # 0-12 numbers, 13-17 modifiers, 18 X2, 19 FREEZE, 20 FLIP3, 21 SECOND
+
+class Deck:
+    # Draw pile (top card at the end) and discard pile, each with a per-value
+    # count vector kept in step, so "what's left" questions never scan cards.
+    __slots__ = ("cards", "counts", "discard", "discard_counts")
+
+    def __init__(self, cards=None, rng=None):
+        """ Takes in a list of card values, or the random.Random to shuffle a fresh make_deck with"""
+        self.cards = array('b', cards if cards is not None else make_deck(rng))
+        self.counts = array('h', [0] * N_CARD_VALUES)
+        for c in self.cards:
+            self.counts[c] += 1
+        self.discard = array('b')
+        self.discard_counts = array('h', [0] * N_CARD_VALUES)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def pop(self):
+        """ Draws and returns the top card"""
+        c = self.cards.pop()
+        self.counts[c] -= 1
+        return c
+
+    def discard_card(self, c):
+        """ Takes in a card value and puts it on the discard pile"""
+        self.discard.append(c)
+        self.discard_counts[c] += 1
+
+    def discard_cards(self, cards):
+        """ Takes in card values and puts them on the discard pile"""
+        self.discard.extend(cards)
+        for c in cards:
+            self.discard_counts[c] += 1
+
+    def recycle(self, rng):
+        """ If the draw pile is empty, the discard pile becomes the draw pile (swapped, not copied) and is shuffled"""
+        if not self.cards and self.discard:
+            self.cards, self.discard = self.discard, self.cards
+            self.counts, self.discard_counts = self.discard_counts, self.counts
+            rng.shuffle(self.cards)
+
+    def copy(self):
+        """ Returns an independent copy of the deck"""
+        new = Deck.__new__(Deck)
+        new.cards = self.cards[:]
+        new.counts = self.counts[:]
+        new.discard = self.discard[:]
+        new.discard_counts = self.discard_counts[:]
+        return new
+
+    # ----- odds for the next card -----
+    def next_counts(self):
+        """ Returns (counts, total) for the pile the next card comes from (the discard once the draw pile is empty)"""
+        if self.cards:
+            return self.counts, len(self.cards)
+        return self.discard_counts, len(self.discard)
+
+    def remaining(self, value):
+        """ Takes in a card value, returns how many copies are left in the draw pile"""
+        return self.counts[value]
+
+    def p_value(self, value):
+        """ Takes in a card value, returns the probability that the next card is that value"""
+        counts, total = self.next_counts()
+        return counts[value] / total if total else 0.0
+
+    def p_duplicate(self, num_mask):
+        """ Takes in a 13-bit number-card mask, returns the probability that the next card is a number already in it"""
+        counts, total = self.next_counts()
+        if not total:
+            return 0.0
+        hits = 0
+        v = 0
+        while num_mask:
+            if num_mask & 1:
+                hits += counts[v]
+            num_mask >>= 1
+            v += 1
+        return hits / total
+
+    def p_bust(self, player):
+        """ Takes in a player, returns the probability that their next draw busts them (0 while they hold Second Chance)"""
+        if player.has_second:
+            return 0.0
+        return self.p_duplicate(player.num_mask)
+
+    def p_modifier(self):
+        """ Returns the probability that the next card is a +N modifier or X2"""
+        counts, total = self.next_counts()
+        if not total:
+            return 0.0
+        return (counts[13] + counts[14] + counts[15] + counts[16] + counts[17] + counts[18]) / total
+
+# ---------- Player ----------
+class Player:
+    # slots + byte arrays keep a player to a couple hundred bytes, so tables
+    # with thousands of live players stay small and copy() is cheap
+    __slots__ = ("name", "is_bot", "bot_aggr", "_hand", "hand_face", "has_second", "stayed", "busted",
+                 "score_current", "score_total", "num_mask", "dup_mask", "num_sum", "mod_sum", "x2")
+
+    def __init__(self, name, is_bot=False, bot_aggr=BOT_HIT_THRESHOLD):
+        """Create the constructor fo the Player class. Takes in a name,  is bot (default False), and bot agression (default is a constant)"""
+        self.name = name
+        self.is_bot = is_bot
+        self.bot_aggr = bot_aggr
+        self.hand_face = array('b')   # 1/0 for face-up
+        self.hand = []                # ints 0..21, stored as array('b') (setter also resets the counters below)
+        self.has_second = False
+        self.stayed = False
+        self.busted = False
+        self.score_current = 0
+        self.score_total = 0
+
+    # The hand list is kept for rendering; scoring and bust checks use these
+    # counters, which add_card / pop_last / remove_card_value keep in sync:
+    #   num_mask  bit v set when number card v is in the hand
+    #   dup_mask  bit v set when number card v is in the hand twice (only until
+    #             the bust / second chance check removes one)
+    #   num_sum   sum of the number cards, mod_sum sum of the +N modifiers
+    #   x2        the X2 card is in the hand
+    @property
+    def hand(self):
+        return self._hand
+
+    @hand.setter
+    def hand(self, cards):
+        self._hand = array('b', cards)
+        self.num_mask = 0
+        self.dup_mask = 0
+        self.num_sum = 0
+        self.mod_sum = 0
+        self.x2 = False
+        for c in self._hand:
+            self._count_card(c, 1)
+
+    def _count_card(self, c, sign):
+        """ Takes in a card value and +1 (added) or -1 (removed), updates the hand counters"""
+        if c < 13:
+            bit = 1 << c
+            if sign > 0:
+                if self.num_mask & bit:
+                    self.dup_mask |= bit
+                else:
+                    self.num_mask |= bit
+            elif self.dup_mask & bit:
+                self.dup_mask &= ~bit
+            else:
+                self.num_mask &= ~bit
+            self.num_sum += sign * c
+        elif c < 18:
+            self.mod_sum += sign * MODIFIER_MAP[c]
+        elif c == 18:
+            self.x2 = sign > 0
+
+    def reset_for_round(self):
+        """ Resets the round of the player by settings all attributes to its initialized state except the total score"""
+        self.hand = []
+        self.hand_face = array('b')
+        self.has_second = False
+        self.stayed = False
+        self.busted = False
+        self.score_current = 0
+
+    def compute_current_score(self):
+        """ Calculate the player's current score"""
+        self.score_current = self.num_sum * (2 if self.x2 else 1) + self.mod_sum
+        return self.score_current
+
+    def unique_number_count(self):
+        """ Returns the number of unique number cards in the hand"""
+        return self.num_mask.bit_count()
+
+    def has_duplicate_number(self):
+        """ Returns True if a number card is in the hand twice"""
+        return self.dup_mask != 0
+
+    # helpers
+    def add_card(self, card_val, face_up=True):
+        """ Takes in a card value and add it to the player's hand"""
+        self._hand.append(card_val)
+        self.hand_face.append(bool(face_up))
+        self._count_card(card_val, 1)
+
+    def pop_last(self):
+        """" Remove the player's latest card"""
+        if not self._hand: return None
+        self.hand_face.pop()
+        c = self._hand.pop()
+        self._count_card(c, -1)
+        return c
+
+    def remove_card_value(self, value):
+        """Takes a card and remove it from the player's hand"""
+        # remove first occurrence synchronously for hand and hand_face
+        for i, v in enumerate(self._hand):
+            if v == value:
+                self._hand.pop(i)
+                self.hand_face.pop(i)
+                self._count_card(value, -1)
+                return True
+        return False
+
+    def clear_hand(self):
+        """ Empties the player's hand and returns the cards that were in it"""
+        cards = self._hand
+        self.hand = []
+        self.hand_face = array('b')
+        return cards
+
+    def copy(self):
+        """ Returns an independent copy of the player"""
+        new = Player.__new__(Player)
+        for name in Player.__slots__:
+            setattr(new, name, getattr(self, name))
+        new._hand = self._hand[:]
+        new.hand_face = self.hand_face[:]
+        return new
+
+# ---------- Helpers ----------
+def next_active_index(players, start_idx):
+    """ Takes in the list of players and a starting index, returns the index of the player of the next active player. If no more active players, return None"""
+    n = len(players)
+    for i in range(1, n+1):
+        idx = (start_idx + i) % n
+        if not players[idx].busted and not players[idx].stayed:
+            return idx
+    return None
+
+def active_player_indices(players):
+    """ Takes in a list of players and returns list of active players indexes"""
+    return [i for i,p in enumerate(players) if not p.busted and not p.stayed]
+
+# ---------- Bot simple heuristic ----------
+def bot_should_hit(p: Player):
+    """ Takes in a player and returns True if the bot should hit or False if bot should not heat"""
+    if p.unique_number_count() >= 6:
+        return False
+    return p.num_sum < p.bot_aggr
+
+def threshold_policy(state, seat):
+    """ Hit/stay policy wrapper around bot_should_hit, takes in a game state and seat index"""
+    return bot_should_hit(state.players[seat])
+
+# ---------- Engine state ----------
+# Something the engine needs answered before it can continue.
+#   kind "act":    seat must send "hit" or "stay"
+#   kind "target": seat must send ("target", idx) with idx in allowed (or None to cancel);
+#                  card is the action card being played (19 FREEZE, 20 FLIP3, 21 SECOND)
+Decision = namedtuple("Decision", "kind seat prompt allowed card", defaults=(None, None, None))
+
+# Something that happened. Card moves ("deal", "hit", "flip3_draw") are emitted
+# before the card lands in the hand so a renderer can animate it; everything
+# else is emitted after the state has changed.
+Event = namedtuple("Event", "kind seat target card", defaults=(None, None, None))
+CARD_MOVES = ("deal", "hit", "flip3_draw")
+
+# A game can be recorded (replay.py) by setting GameState.recorder to an object
+# with event(ev), called for every event, action(req, action), called for every
+# decision before it is applied, and random_pick(), called by default_target
+# when it draws a target from the game's RNG (so a replay can draw it again).
+
+class GameState:
+    __slots__ = ("players", "rng", "deck", "dealer_idx", "final_trigger", "triggerer_idx",
+                 "final_players_list", "phase", "step", "current_idx", "round_should_end", "winner",
+                 "round_no", "turns", "pending", "listener", "recorder", "searchable", "_resolving", "_draw_base",
+                 "_answers", "_events")
+
+    def __init__(self, players, rng=None, deck=None):
+        """ Takes in a list of Player objects, an optional random.Random and an optional starting deck (list of card values)"""
+        self.players = players
+        self.rng = rng if rng is not None else random.Random()
+        self.deck = Deck(deck, self.rng)
+        self.dealer_idx = 0
+        self.final_trigger = False
+        self.triggerer_idx = None
+        self.final_players_list = []
+        self.phase = "deal"          # deal / play / final / over
+        self.step = 0                # position in the deal order or final_players_list
+        self.current_idx = -1
+        self.round_should_end = False
+        self.winner = None
+        self.round_no = 0            # rounds started so far (including tie continuations)
+        self.turns = 0               # hit/stay decisions taken so far
+        self.pending = None          # Decision the engine is waiting on
+        self.listener = None         # optional callable(event), called as events happen
+        self.recorder = None         # optional replay recorder (see above)
+        self.searchable = False      # keep what copy() needs to clone the game mid-card (for search bots)
+        self._resolving = None       # generator resolving a drawn card
+        self._draw_base = None       # (table just before resolving, seat, card) when searchable
+        self._answers = []           # (target, RNG state) sent to _resolving so far, when searchable
+        self._events = []
+
+    @property
+    def discard(self):
+        """ The discard pile (owned by the Deck)"""
+        return self.deck.discard
+
+    # ----- public API -----
+    def start(self):
+        """ Deals the first round and runs until the first decision, returns the list of events"""
+        self._events = []
+        self._new_round()
+        self._run()
+        return self._take_events()
+
+    def apply(self, action):
+        """ Takes in an action for the pending decision ("hit", "stay" or ("target", idx)), returns the list of events it caused"""
+        req = self.pending
+        if req is None:
+            raise ValueError("no decision is pending")
+        if req.kind == "target":
+            if not (isinstance(action, tuple) and len(action) == 2 and action[0] == "target"):
+                raise ValueError(f"expected ('target', idx), got {action!r}")
+            if action[1] is not None and action[1] not in req.allowed:
+                raise ValueError(f"target {action[1]!r} is not one of {req.allowed}")
+        elif action not in ("hit", "stay"):
+            raise ValueError(f"expected 'hit' or 'stay', got {action!r}")
+
+        if self.recorder is not None:
+            self.recorder.action(req, action)
+        self._events = []
+        self.pending = None
+        if req.kind == "target":
+            if self._draw_base is not None:
+                # the RNG may have been used in between (e.g. a bot picking this target)
+                self._answers.append((action[1], self.rng.getstate()))
+            self._run(action[1])
+        else:
+            if action == "hit":
+                self._hit(req.seat)
+            else:
+                self._stay(req.seat)
+            self.turns += 1
+            self._run()
+        return self._take_events()
+
+    def _take_events(self):
+        """ Returns the events collected so far and lets go of them, so idle tables don't hold event lists"""
+        events = self._events
+        self._events = []
+        return events
+
+    def copy(self, rng=None):
+        """
+        Returns an independent copy of the table for search and rollouts. The copy gets
+        rng if given, otherwise a clone of this game's RNG (so it plays out identically).
+        The copy has no listener or recorder. While a card is being resolved (a target decision is
+        pending) this only works if the table is searchable.
+        """
+        if self._resolving is not None:
+            new = self._replay_draw()
+            if rng is not None:
+                new.rng = rng
+            return new
+        new = GameState.__new__(GameState)
+        for name in GameState.__slots__:
+            setattr(new, name, getattr(self, name))
+        new.players = [p.copy() for p in self.players]
+        new.deck = self.deck.copy()
+        new.final_players_list = list(self.final_players_list)
+        if rng is None:
+            rng = random.Random()
+            rng.setstate(self.rng.getstate())
+        new.rng = rng
+        new.listener = None
+        new.recorder = None
+        new._answers = []
+        new._events = []
+        return new
+
+    def can_copy(self):
+        """ Returns True if copy() works right now (no card in progress, or the table was searchable when it was drawn)"""
+        return self._resolving is None or self._draw_base is not None
+
+    def _replay_draw(self):
+        """ Rebuilds this table mid-card by replaying the card's targets onto the snapshot taken when it was drawn"""
+        if self._draw_base is None:
+            raise ValueError("cannot copy a game while a card is being resolved (set searchable before the draw)")
+        base, seat, card = self._draw_base
+        new = base.copy()
+        new._draw_base = self._draw_base
+        new._resolving = new._resolve_draw(seat, card)
+        new.turns = self.turns      # apply() counts the hit after the draw
+        new._run()
+        for tgt, rng_state in self._answers:
+            new._answers.append((tgt, rng_state))
+            new.rng.setstate(rng_state)
+            new.pending = None
+            new._run(tgt)
+        new.rng.setstate(self.rng.getstate())
+        new._events = []
+        return new
+
+    # pickling (worker pools): the listener and recorder are dropped and a card in progress is
+    # stored as its draw snapshot plus the targets picked so far
+    def __getstate__(self):
+        if self._resolving is not None and self._draw_base is None:
+            raise ValueError("cannot pickle a game while a card is being resolved (set searchable before the draw)")
+        state = {name: getattr(self, name) for name in GameState.__slots__ if name not in ("listener", "recorder", "_resolving", "_events")}
+        state["_resolving"] = self._resolving is not None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.listener = None
+        self.recorder = None
+        self._resolving = None
+        self._events = []
+        if state["_resolving"]:
+            new = self._replay_draw()
+            for name in GameState.__slots__:
+                setattr(self, name, getattr(new, name))
+
+    # ----- flow -----
+    def _emit(self, kind, seat=None, target=None, card=None):
+        """ Records an event and forwards it to the listener"""
+        ev = Event(kind, seat, target, card)
+        self._events.append(ev)
+        if self.recorder is not None:
+            self.recorder.event(ev)
+        if self.listener is not None:
+            self.listener(ev)
+
+    def _run(self, value=None):
+        """ Advances the game until a decision is needed or the game is over"""
+        while True:
+            if self._resolving is not None:
+                try:
+                    req = self._resolving.send(value)
+                except StopIteration:
+                    self._resolving = None
+                    self._draw_base = None
+                    if self.phase == "play":
+                        self._end_turn()
+                else:
+                    self.pending = req
+                    return
+                value = None
+                continue
+            if not self._advance():
+                return
+
+    def _advance(self):
+        """ Does one step of the round flow, returns False once a decision is pending or the game is over"""
+        players = self.players
+        n = len(players)
+        if self.phase == "over":
+            return False
+
+        if self.phase == "deal":
+            if self.step < n:
+                idx = (self.dealer_idx + self.step) % n
+                self.step += 1
+                self._ensure_deck()
+                if not self.deck:
+                    self.step = n
+                    return True
+                self._draw(idx, "deal")
+                return True
+            self.phase = "play"
+            self.current_idx = (self.dealer_idx + 1) % n
+            self.round_should_end = False
+            return True
+
+        if self.phase == "play":
+            self._ensure_deck()
+            if self.round_should_end or all(p.busted or p.stayed for p in players):
+                self._end_round()
+                return True
+            cur = players[self.current_idx]
+            if cur.busted or cur.stayed:
+                self.current_idx = next_active_index(players, self.current_idx)
+                return True
+            self.pending = Decision("act", self.current_idx)
+            return False
+
+        # final round: each player other than the triggerer gets one extra turn
+        if self.step >= len(self.final_players_list):
+            self._finish_final()
+            return True
+        idx = self.final_players_list[self.step]
+        if idx == self.triggerer_idx:
+            self.step += 1
+            return True
+        p = players[idx]
+        if self.current_idx != idx:
+            self.current_idx = idx
+            p.reset_for_round()
+            self._emit("final_turn", idx)
+            self._ensure_deck()
+            if self.deck:
+                self._draw(idx, "deal")
+            return True
+        if p.busted or p.stayed:
+            self.step += 1
+            return True
+        self.pending = Decision("act", idx)
+        return False
+
+    def _new_round(self):
+        """ Resets every player and starts dealing"""
+        for p in self.players:
+            p.reset_for_round()
+        self.phase = "deal"
+        self.step = 0
+        self.current_idx = -1
+        self.round_no += 1
+        self._emit("round_start", self.dealer_idx)
+
+    def _end_round(self):
+        """ End of round handling (final trigger / rotate dealer)"""
+        if not self.final_trigger:
+            self.dealer_idx = (self.dealer_idx + 1) % len(self.players)
+            self._ensure_deck()
+            self._new_round()
+        elif not self.final_players_list:
+            self._game_over(self.triggerer_idx)
+        else:
+            self.phase = "final"
+            self.step = 0
+            self.current_idx = -1
+
+    def _finish_final(self):
+        """ Determine winner (or continue on tie)"""
+        top = max(p.score_total for p in self.players)
+        winners = [i for i, p in enumerate(self.players) if p.score_total == top]
+        if len(winners) == 1:
+            self._game_over(winners[0])
+            return
+        self.final_trigger = False
+        self.triggerer_idx = None
+        self.final_players_list = []
+        self.dealer_idx = (self.dealer_idx + 1) % len(self.players)
+        self._ensure_deck()
+        self._emit("tie")
+        self._new_round()
+
+    def _game_over(self, winner_idx):
+        """ Ends the game with the player at winner_idx as the winner"""
+        self.phase = "over"
+        self.winner = winner_idx
+        self._emit("game_over", winner_idx)
+
+    def _end_turn(self):
+        """ Checks the final-round trigger for the current player and moves to the next active player"""
+        cur = self.current_idx
+        if self.players[cur].score_total >= WIN_SCORE and not self.final_trigger:
+            self.final_trigger = True
+            self.triggerer_idx = cur
+            self.final_players_list = [i for i in range(len(self.players)) if i != cur]
+            self.round_should_end = True
+            self._emit("final_trigger", cur)
+        nxt = next_active_index(self.players, cur)
+        if nxt is not None:
+            self.current_idx = nxt
+
+    def _hit(self, seat):
+        """ Draws a card for seat (hit action)"""
+        self._ensure_deck()
+        if self.deck:
+            self._draw(seat, "hit")
+        elif self.phase == "play":
+            self._end_turn()
+
+    def _stay(self, seat):
+        """ Banks seat's current points (stay action)"""
+        p = self.players[seat]
+        p.compute_current_score()
+        p.score_total += p.score_current
+        self.deck.discard_cards(p.clear_hand())
+        p.stayed = True
+        self._emit("stay", seat)
+        if self.phase == "play":
+            self._end_turn()
+
+    def _ensure_deck(self):
+        self.deck.recycle(self.rng)
+
+    def _draw(self, seat, kind):
+        """ Pops the top card for seat and starts resolving it"""
+        card = self.deck.pop()
+        if self.searchable and card >= 19:
+            # only action cards can ask for a target
+            self._draw_base = (self.copy(), seat, card)
+            self._answers = []
+        self._emit(kind, seat, card=card)
+        self._resolving = self._resolve_draw(seat, card)
+
+    # ----- card resolution -----
+    def _bust(self, idx):
+        p = self.players[idx]
+        self.deck.discard_cards(p.clear_hand())
+        p.busted = True
+        p.score_current = 0
+        self._emit("bust", idx)
+
+    def _freeze(self, src, tgt):
+        targ = self.players[tgt]
+        targ.compute_current_score()
+        targ.score_total += targ.score_current
+        self.deck.discard_cards(targ.clear_hand())
+        targ.stayed = True
+        self._emit("freeze", src, tgt)
+
+    def _flip7(self, idx):
+        p = self.players[idx]
+        p.score_total += FLIP7_BONUS + p.score_current
+        self.deck.discard_cards(p.clear_hand())
+        p.stayed = True
+        self._emit("flip7", idx)
+
+    def _give_second(self, src, tgt):
+        targ = self.players[tgt]
+        targ.has_second = True
+        targ.add_card(21, face_up=True)
+        targ.compute_current_score()
+        self._emit("second", src, tgt)
+
+    def _discard_card(self, seat, card):
+        self.deck.discard_card(card)
+        self._emit("discard", seat, card=card)
+
+    def _check_duplicate(self, idx):
+        """ Handles a number card that may have duplicated one in idx's hand, returns 'ok', 'second_consumed' or 'bust'"""
+        p = self.players[idx]
+        if not p.has_duplicate_number():
+            return "ok"
+        if p.has_second:
+            # consume second chance and drop duplicate drawn
+            p.pop_last()
+            p.has_second = False
+            p.remove_card_value(21)
+            p.compute_current_score()
+            self._emit("second_consumed", idx)
+            return "second_consumed"
+        self._bust(idx)
+        return "bust"
+
+    def _flip_onto(self, target_idx):
+        """ One automatic FLIP3 draw onto target_idx, returns None if the deck is empty, otherwise like _check_duplicate"""
+        self._ensure_deck()
+        if not self.deck:
+            return None
+        drawn = self.deck.pop()
+        self._emit("flip3_draw", target_idx, card=drawn)
+        self.players[target_idx].add_card(drawn, face_up=True)
+        # only number cards can bust
+        if drawn < 13:
+            return self._check_duplicate(target_idx)
+        return "ok"
+
+    def _resolve_draw(self, player_idx, card_val):
+        """
+        Generator resolving card_val drawn by player_idx. Yields a Decision whenever a
+        target has to be picked and receives the chosen index (or None) back.
+        Returns: 'ok','bust','flip7','second_consumed'
+        """
+        players = self.players
+        p = players[player_idx]
+
+        # SECOND CHANCE (21)
+        if card_val == 21:
+            if not p.has_second:
+                self._give_second(player_idx, player_idx)
+                return "ok"
+            # Already has one -> must give to other eligible or discard
+            eligible = [i for i,pp in enumerate(players) if i != player_idx and (not pp.busted) and (not pp.stayed) and (not pp.has_second)]
+            if not eligible:
+                self._discard_card(player_idx, 21)
+                return "ok"
+            tgt = yield Decision("target", player_idx, f"{p.name} drew SECOND", eligible, 21)
+            if tgt is not None:
+                self._give_second(player_idx, tgt)
+            else:
+                self._discard_card(player_idx, 21)
+            return "ok"
+
+        # FLIP THREE (20)
+        if card_val == 20:
+            active = active_player_indices(players)
+            if player_idx not in active:
+                active.append(player_idx)
+                active = sorted(set(active))
+            if len(active) == 1:
+                target_idx = active[0]
+            else:
+                target_idx = yield Decision("target", player_idx, f"{p.name} drew FLIP3", active, 20)
+                if target_idx is None:
+                    self._discard_card(player_idx, 20)
+                    return "ok"
+            tp = players[target_idx]
+
+            # AUTOMATIC delivery: perform 3 flips onto target
+            self._emit("flip3", player_idx, target_idx)
+            for _ in range(3):
+                res = self._flip_onto(target_idx)
+                if res is None:
+                    break
+                if res == "bust":
+                    return "bust"
+
+            # After playing flips, resolve action cards in target hand (remove BEFORE processing)
+            action_cards = [c for c in tp.hand if c in (19,20)]
+            for a in action_cards:
+                # remove one instance (important to avoid re-triggering)
+                tp.remove_card_value(a)
+                if tp.busted:
+                    break
+                if a == 19:
+                    targ_candidates = active_player_indices(players)
+                    if target_idx not in targ_candidates: targ_candidates.append(target_idx)
+                    if len(targ_candidates) == 1:
+                        tgt = targ_candidates[0]
+                    else:
+                        tgt = yield Decision("target", target_idx, f"{tp.name} resolved FREEZE", targ_candidates, 19)
+                        if tgt is None:
+                            continue
+                    self._freeze(target_idx, tgt)
+                elif a == 20:
+                    # cascade 3 draws onto same target (automatic)
+                    for _ in range(3):
+                        res = self._flip_onto(target_idx)
+                        if res is None:
+                            break
+                        if res == "bust":
+                            return "bust"
+                    self._emit("flip3_resolved", target_idx)
+
+            # Check Flip7 for the target after all cascades
+            tp.compute_current_score()
+            if tp.unique_number_count() >= 7:
+                self._flip7(target_idx)
+                return "flip7"
+            return "ok"
+
+        # NORMAL: add the card face-up
+        p.add_card(card_val, face_up=True)
+
+        # Numerical duplicates only cause busts — modifiers and action cards are safe
+        if card_val < 13:
+            res = self._check_duplicate(player_idx)
+            if res != "ok":
+                return res
+
+        # Freeze (19) resolved immediately if drawn outside flip3 context
+        if card_val == 19:
+            tgt_candidates = active_player_indices(players)
+            if player_idx not in tgt_candidates:
+                tgt_candidates.append(player_idx)
+            if len(tgt_candidates) == 1:
+                tgt = tgt_candidates[0]
+            else:
+                tgt = yield Decision("target", player_idx, f"{p.name} played FREEZE", tgt_candidates, 19)
+                if tgt is None:
+                    # canceled -> discard freeze and remove its visual presence
+                    p.remove_card_value(19)
+                    self._discard_card(player_idx, 19)
+                    return "ok"
+            self._freeze(player_idx, tgt)
+
+        # final compute and Flip7 check
+        p.compute_current_score()
+        if p.unique_number_count() >= 7:
+            self._flip7(player_idx)
+            return "flip7"
+        return "ok"
+
+# ---------- Headless driver ----------
+def default_target(state):
+    """ Takes in a game state waiting on a target and returns a random pick other than the chooser (the bot behavior)"""
+    req = state.pending
+    others = [i for i in req.allowed if i != req.seat]
+    if not others:
+        return req.seat
+    if state.recorder is not None:
+        state.recorder.random_pick()
+    return state.rng.choice(others)
+
+def play_headless(state, policy=threshold_policy):
+    """ Takes in a game state and a hit/stay policy(state, seat) (or a list with one per seat), plays until the game is over and returns the winner's index"""
+    policies = policy if isinstance(policy, (list, tuple)) else [policy] * len(state.players)
+    # a policy with a choose_target(state) method picks its own targets (search bots,
+    # which also need the table searchable to copy it mid-card)
+    if any(hasattr(p, "choose_target") for p in policies):
+        state.searchable = True
+    if state.pending is None and state.phase != "over":
+        state.start()
+    while state.pending is not None:
+        req = state.pending
+        if req.kind == "target":
+            choose = getattr(policies[req.seat], "choose_target", default_target)
+            state.apply(("target", choose(state)))
+        else:
+            state.apply("hit" if policies[req.seat](state, req.seat) else "stay")
+    return state.winner
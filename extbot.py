@@ -0,0 +1,330 @@
+# External bots: seats played by another program over a UCI-style line protocol.
+#
+# Any program that reads lines on stdin and writes lines on stdout can play.
+# It is started once and reused for every decision of every game: each
+# decision sends it the whole position, so it needn't remember anything in
+# between. Every decision has a deadline (movetime). A bot that misses it is
+# told to stop and the seat plays it safe for that decision (stay, or a random
+# target the way the built-in bots pick one); its late answer is thrown away,
+# and if it hasn't answered GRACE_MS after being told to stop it is killed
+# and a fresh one started. A bot that crashes is restarted the same way.
+#
+#   engine -> bot                              bot -> engine
+#   f7                                         id name <name> (optional), then f7ok
+#   isready                                    readyok
+#   position <json>
+#   go act movetime <ms>                       bestmove hit | bestmove stay
+#   go target <card> <seat> ... movetime <ms>  bestmove <seat> | bestmove none
+#   stop                                       bestmove (right away, if still thinking)
+#   quit
+#
+# Lines from the bot starting with "info" are ignored. <card> is second, flip3
+# or freeze; the seats are the ones it may pick (none cancels the card). The
+# position is one JSON object:
+#   {"seat": 1, "round": 3, "dealer": 0, "final": null,
+#    "players": [{"name": "Ann", "hand": [7, 13, 21], "stayed": false, "busted": false,
+#                 "second": true, "round_score": 9, "total": 120}, ...],
+#    "deck": [count of each card value left in the pile the next card comes from], "discard": 30}
+# seat is the one deciding, final the seat that triggered the final round (or null).
+# Cards are 0-12 numbers, 13-17 modifiers +2 +4 +6 +8 +10, 18 X2, 19 FREEZE, 20 FLIP3, 21 SECOND.
+#
+# sample_bot.py is a complete bot to start from. In a tournament:
+#
+#   python tournament.py --bot sample="python sample_bot.py" --entrants threshold:16,ev,sample
+
+import atexit
+import json
+import math
+import queue
+import shlex
+import subprocess
+import threading
+import time
+
+from engine import LABEL_MAP, default_target
+
+DEFAULT_MOVETIME_MS = 100
+START_MS = 10000            # time a bot gets to start up and answer f7
+GRACE_MS = 1000             # time a bot gets to answer stop before it is killed
+MAX_PROCS = 4               # bot processes per command, counting ones still owing a late answer
+POLL_S = 0.001              # how often a decision checks for a free process when none is
+
+class BotError(Exception):
+    pass
+
+def position_line(state, seat):
+    """ Takes in a game and the deciding seat, returns the position command for it"""
+    counts, _ = state.deck.next_counts()
+    players = [{"name": p.name, "hand": list(p.hand), "stayed": p.stayed, "busted": p.busted,
+                "second": p.has_second, "round_score": p.score_current, "total": p.score_total}
+               for p in state.players]
+    pos = {"seat": seat, "round": state.round_no, "dealer": state.dealer_idx, "final": state.triggerer_idx,
+           "players": players, "deck": list(counts), "discard": len(state.deck.discard)}
+    return "position " + json.dumps(pos, separators=(",", ":"))
+
+# ---------- Latency stats ----------
+class LatencyStats:
+    """ Decision times of one bot as a log-scale histogram, so stats from many processes can be merged"""
+    STEPS = 8                   # buckets per doubling (about 9% wide)
+
+    def __init__(self):
+        self.decisions = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.hist = {}          # bucket -> decisions
+
+    def add(self, seconds, timed_out=False, crashed=False):
+        """ Takes in one decision's time and how it went, counts it"""
+        self.decisions += 1
+        self.timeouts += timed_out
+        self.crashes += crashed
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = math.ceil(math.log2(max(seconds, 1e-6) * 1e6) * self.STEPS)
+        self.hist[bucket] = self.hist.get(bucket, 0) + 1
+
+    def merge(self, other):
+        """ Takes in another LatencyStats, adds its decisions to these"""
+        self.decisions += other.decisions
+        self.timeouts += other.timeouts
+        self.crashes += other.crashes
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for bucket, n in other.hist.items():
+            self.hist[bucket] = self.hist.get(bucket, 0) + n
+
+    def quantile(self, q):
+        """ Takes in a fraction, returns the decision time (s) that fraction of decisions stayed under"""
+        if not self.decisions:
+            return 0.0
+        need = q * self.decisions
+        seen = 0
+        for bucket in sorted(self.hist):
+            seen += self.hist[bucket]
+            if seen >= need:
+                return min(self.max, 2 ** (bucket / self.STEPS) / 1e6)
+        return self.max
+
+    def summary(self):
+        """ Returns the stats as one line of text"""
+        mean = self.total / self.decisions if self.decisions else 0.0
+        return (f"{self.decisions} decisions, mean {mean * 1000:.2f} ms, p50 {self.quantile(0.5) * 1000:.2f} ms, "
+                f"p99 {self.quantile(0.99) * 1000:.2f} ms, max {self.max * 1000:.2f} ms, "
+                f"{self.timeouts} timeouts, {self.crashes} crashes")
+
+# ---------- Processes ----------
+class Worker:
+    """ One bot process, spoken to over its stdin / stdout"""
+
+    def __init__(self, command):
+        """ Takes in the bot's command line (a string or an argument list), starts it and waits for f7ok"""
+        args = shlex.split(command) if isinstance(command, str) else command
+        try:
+            self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+        except OSError as e:
+            raise BotError(f"cannot start {command!r}: {e}") from None
+        self.lines = queue.Queue()
+        self.owed = None            # when it was told to stop, while a late bestmove is still to come
+        self.name = command
+        threading.Thread(target=self._read, daemon=True).start()
+        self.send("f7")
+        while True:
+            line = self._next(time.perf_counter() + START_MS / 1000)
+            if line is None:
+                self.kill()
+                raise BotError(f"{command!r} did not answer f7 in time")
+            if line.startswith("id name "):
+                self.name = line[8:]
+            elif line == "f7ok":
+                break
+
+    def _read(self):
+        """ Reader thread: queues the bot's lines, then None once it exits"""
+        try:
+            for line in self.proc.stdout:
+                self.lines.put(line.strip())
+        finally:
+            self.lines.put(None)
+
+    def _next(self, deadline):
+        """ Takes in a perf_counter deadline, returns the bot's next line or None if none came by then"""
+        try:
+            line = self.lines.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            return None
+        if line is None:
+            self.lines.put(None)
+            raise BotError(f"{self.name} exited")
+        return line
+
+    def send(self, text):
+        try:
+            self.proc.stdin.write(text + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            raise BotError(f"{self.name} exited") from None
+
+    def ask(self, position, go, deadline):
+        """ Takes in the position and go commands and a perf_counter deadline, returns the bestmove answer (None if it ran out of time)"""
+        self.send(position + "\n" + go)
+        while True:
+            line = self._next(deadline)
+            if line is None:
+                self.send("stop")
+                self.owed = time.perf_counter()
+                return None
+            if line.startswith("bestmove"):
+                return line[9:].strip()
+
+    def settled(self):
+        """ Reads any late bestmove that has come in, returns True once none is owed"""
+        while self.owed is not None:
+            line = self._next(0)
+            if line is None:
+                return False
+            if line.startswith("bestmove"):
+                self.owed = None
+        return True
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+    def close(self):
+        """ Asks the bot to quit, killing it if it doesn't"""
+        try:
+            self.send("quit")
+            self.proc.stdin.close()
+            self.proc.wait(timeout=1)
+        except (BotError, OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+class BotPool:
+    """
+    Processes for one bot command, reused for every decision (one at a time). One is
+    started up front; while all of them owe a late answer or have died, more are
+    started in the background (up to max_procs), never inside a decision.
+    """
+
+    def __init__(self, command, max_procs=MAX_PROCS, grace_ms=GRACE_MS):
+        """ Takes in the bot's command line, starts its first process (raises BotError if it can't)"""
+        self.command = command
+        self.max_procs = max_procs
+        self.grace_s = grace_ms / 1000
+        self.workers = []
+        self.starting = 0           # processes being started in the background
+        self.started = 1
+        self.killed = 0
+        self.lock = threading.Lock()
+        self.workers.append(Worker(command))
+
+    def _start(self):
+        """ Starts one more process on a background thread"""
+        self.starting += 1
+        self.started += 1
+        threading.Thread(target=self._starter, daemon=True).start()
+
+    def _starter(self):
+        try:
+            w = Worker(self.command)
+        except BotError:
+            w = None
+        with self.lock:
+            self.starting -= 1
+            if w is not None:
+                self.workers.append(w)
+
+    def acquire(self, deadline):
+        """ Takes in a perf_counter deadline, returns a process with no late answer owed (None if none was free by then)"""
+        while True:
+            with self.lock:
+                now = time.perf_counter()
+                for w in list(self.workers):
+                    try:
+                        if w.settled():
+                            return w
+                        if now - w.owed > self.grace_s:
+                            self.drop(w)
+                    except BotError:
+                        self.drop(w)
+                if len(self.workers) + self.starting < self.max_procs:
+                    self._start()
+            if now >= deadline:
+                return None
+            time.sleep(min(POLL_S, deadline - now))
+
+    def drop(self, w):
+        """ Takes in a process that crashed or stopped answering, kills it"""
+        self.workers.remove(w)
+        w.kill()
+        self.killed += 1
+
+    def close(self):
+        with self.lock:
+            for w in self.workers:
+                w.close()
+            self.workers = []
+
+# ---------- Policy ----------
+class ExternalBot:
+    """ Hit/stay policy with choose_target, played by an external program (for play_headless, tournament.py)"""
+
+    def __init__(self, command, movetime_ms=DEFAULT_MOVETIME_MS):
+        """ Takes in the bot's command line and the per-decision deadline in ms"""
+        self.pool = BotPool(command)
+        self.movetime_ms = movetime_ms
+        self.stats = LatencyStats()
+
+    def __call__(self, state, seat):
+        """ Hit/stay policy: takes in a game state and seat, returns True to hit (stay if the bot has no valid answer in time)"""
+        return self._ask(state, seat, "go act") == "hit"
+
+    def choose_target(self, state):
+        """ Takes in a game state waiting on one of our targets, returns the chosen index (a random one if the bot has no valid answer in time)"""
+        req = state.pending
+        card = LABEL_MAP[req.card].lower()
+        answer = self._ask(state, req.seat, f"go target {card} " + " ".join(map(str, req.allowed)))
+        if answer == "none":
+            return None
+        if answer is not None and answer.isdigit() and int(answer) in req.allowed:
+            return int(answer)
+        return default_target(state)
+
+    def _ask(self, state, seat, go):
+        """ Takes in a game, the deciding seat and the go command, returns the bot's answer or None"""
+        start = time.perf_counter()
+        deadline = start + self.movetime_ms / 1000
+        answer = None
+        crashed = False
+        w = None
+        try:
+            w = self.pool.acquire(deadline)
+            if w is not None:
+                answer = w.ask(position_line(state, seat), f"{go} movetime {self.movetime_ms}", deadline)
+        except BotError:
+            crashed = True
+            if w is not None:
+                with self.pool.lock:
+                    self.pool.drop(w)
+        self.stats.add(time.perf_counter() - start, timed_out=answer is None and not crashed, crashed=crashed)
+        return answer
+
+    def take_stats(self):
+        """ Returns the stats gathered so far and starts new ones"""
+        stats, self.stats = self.stats, LatencyStats()
+        return stats
+
+    def close(self):
+        self.pool.close()
+
+_bots = {}
+
+def external_policy(command, movetime_ms=DEFAULT_MOVETIME_MS):
+    """ Takes in a bot command and deadline, returns this process's ExternalBot for it (its processes are kept for every later game)"""
+    key = (command, movetime_ms)
+    if key not in _bots:
+        _bots[key] = ExternalBot(command, movetime_ms)
+        atexit.register(_bots[key].close)
+    return _bots[key]
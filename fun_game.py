@@ -10,12 +10,24 @@
 # Assignment:   Lab 13 (TEAM)
 # Date:         4 December 2025
 
+import argparse
+import atexit
 import os
-import pygame, sys, random, pygame_menu
-import pygame_gui
+import random
+import pygame, sys
 from pygame.locals import *
 from math import floor
+import threading
 import time
+from functools import lru_cache
+
+import asset_cache
+import replay
+import snapshot
+from engine import MODIFIER_MAP, LABEL_MAP, Player, GameState, bot_should_hit, default_target
+from bots import build_stop_table, dp_policy, load_stop_table
+from perf import FrameProfiler, profiled
+from timeline import Timeline
 
 # ---------- COLORS -----------
 BG_DARK = (20,20,40)
@@ -36,67 +48,289 @@ ROWS_TOP = 210
 ASSET_FOLDER = "assets"
 BUTTON_W = 140
 BUTTON_H = 60
-BOT_HIT_THRESHOLD = 16   # lower -> more conservative bots; higher -> more aggressive
 # Delay / animation presets (kept from your code)
+# 'T' is turbo: no animations, messages or pauses, frames drawn uncapped but at
+# most one per 1/FPS. The game itself is identical in every preset.
 DELAY_PRESET = 'B'
 DELAY_PRESETS = {
     'A': dict(bot_action=300, flip3_interval=150, anim_mult=1.0, msg_ms=700),
     'B': dict(bot_action=700, flip3_interval=300, anim_mult=1.35, msg_ms=1000),
     'C': dict(bot_action=1200, flip3_interval=500, anim_mult=1.6, msg_ms=1400),
+    'T': dict(bot_action=0, flip3_interval=0, anim_mult=0.0, msg_ms=0),
 }
-_pres = DELAY_PRESETS.get(DELAY_PRESET, DELAY_PRESETS['B'])
-BOT_ACTION_DELAY_MS = _pres['bot_action']
-FLIP3_INTERVAL_MS = _pres['flip3_interval']
-ANIM_MULTIPLIER = _pres['anim_mult']
-MESSAGE_MS = _pres['msg_ms']
-
-DEAL_ANIM_MS = int(300 * ANIM_MULTIPLIER)
-HIT_ANIM_MS = int(280 * ANIM_MULTIPLIER)
-POST_ACTION_PAUSE_MS = int(350 * ANIM_MULTIPLIER)
+TURBO = False
+CARD_MOVE_MS = {}
+_normal_preset = DELAY_PRESET   # what the T key switches back to
+
+def set_delay_preset(name):
+    """ Takes in a preset name from DELAY_PRESETS, switches every delay / animation time to it (works mid-game)"""
+    global DELAY_PRESET, TURBO, BOT_ACTION_DELAY_MS, FLIP3_INTERVAL_MS, ANIM_MULTIPLIER, MESSAGE_MS
+    global DEAL_ANIM_MS, HIT_ANIM_MS, POST_ACTION_PAUSE_MS, _normal_preset
+    pres = DELAY_PRESETS.get(name, DELAY_PRESETS['B'])
+    DELAY_PRESET = name if name in DELAY_PRESETS else 'B'
+    TURBO = DELAY_PRESET == 'T'
+    if not TURBO:
+        _normal_preset = DELAY_PRESET
+    BOT_ACTION_DELAY_MS = pres['bot_action']
+    FLIP3_INTERVAL_MS = pres['flip3_interval']
+    ANIM_MULTIPLIER = pres['anim_mult']
+    MESSAGE_MS = pres['msg_ms']
+
+    DEAL_ANIM_MS = int(300 * ANIM_MULTIPLIER)
+    HIT_ANIM_MS = int(280 * ANIM_MULTIPLIER)
+    POST_ACTION_PAUSE_MS = int(350 * ANIM_MULTIPLIER)
+    CARD_MOVE_MS.update({"deal": DEAL_ANIM_MS, "hit": HIT_ANIM_MS, "flip3_draw": DEAL_ANIM_MS//2})
+
+def toggle_turbo():
+    """ Switches between turbo and the last normal preset"""
+    set_delay_preset(_normal_preset if TURBO else 'T')
+
+set_delay_preset(DELAY_PRESET)
 # ----------------------------
 
-pygame.init()
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Flip 7")
-clock = pygame.time.Clock()
-
-# Use Comic Sans font per request (fallback if missing)
-try:
-    FONT = pygame.font.SysFont("Comic Sans MS", 28)
-    BIG = pygame.font.SysFont("Comic Sans MS", 56)
-    SMALL = pygame.font.SysFont("Comic Sans MS", 20)
-except Exception:
-    FONT = pygame.font.SysFont(None, 28)
-    BIG = pygame.font.SysFont(None, 56)
-    SMALL = pygame.font.SysFont(None, 20)
-
-# GUI manager for setup/rules (from second code)
-GUI_MANAGER = pygame_gui.UIManager((WINDOW_WIDTH, WINDOW_HEIGHT), theme_path="gui.json")
-
-# Card constants
-MODIFIER_MAP = {13: 2, 14: 4, 15: 6, 16: 8, 17: 10}
-LABEL_MAP = {18: "X2", 19: "FREEZE", 20: "FLIP3", 21: "SECOND"}
+# ---------- Display setup (lazy) ----------
+# Nothing below opens a window or loads pygame_gui / pygame_menu until a
+# screen is actually shown, so importing this module stays cheap for tools
+# and worker processes. --headless runs on SDL's dummy driver without waits.
+HEADLESS = False
+screen = None
+clock = None
+FONT = BIG = SMALL = None
+GUI_MANAGER = None
+
+# ---------- Frame profiler ----------
+# F3 (or --profile) toggles per-phase frame timing and the HUD; --trace FILE
+# also records every phase span and writes them as a Chrome/Perfetto trace
+# after each game. Off, the hooks below cost a flag check per call.
+PROFILER = FrameProfiler(FPS)
+TRACE_PATH = None
+
+# ---------- Replays ----------
+# Every game starts from a seed (--seed N, otherwise a fresh one) and is written
+# to REPLAY_DIR as it is played (see replay.py); --replay FILE plays a log back
+# instead, checking the engine against it, at --speed times the normal pace.
+GAME_SEED = None
+REPLAY_DIR = "replays"      # None: don't record
+PLAYBACK_SPEED = 1.0        # timeline time runs this many times faster
+
+# ---------- Save / resume ----------
+# A game in the window is saved to SNAPSHOT_PATH at every turn boundary (see
+# snapshot.py) and Resume in the menu carries on from there, recording into
+# the same replay log. Headless runs and replays aren't saved.
+SNAPSHOT_PATH = "savegame.f7s"      # None: don't save
+
+def save_snapshot(state):
+    """ Takes in the game at a turn boundary, saves it to SNAPSHOT_PATH along with how far its replay log got"""
+    with PROFILER.phase("snapshot"):
+        log = (state.recorder.path, state.recorder.flush()) if state.recorder is not None else None
+        snapshot.save(state, SNAPSHOT_PATH, log)
+
+def resume_game():
+    """ Plays on from the game saved at SNAPSHOT_PATH (nothing happens if there is none)"""
+    try:
+        state, log = snapshot.load(SNAPSHOT_PATH)
+    except (OSError, ValueError):
+        return
+    if log is not None and os.path.exists(log[0]):
+        state.recorder = replay.ReplayLog.resume(log[0], state.players, log[1])
+    play_game_gui(resume=state)
+
+def init_display():
+    """ Opens the window, clock and fonts the first time a screen is shown"""
+    global screen, clock, FONT, BIG, SMALL
+    if screen is not None:
+        return
+    if HEADLESS:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    pygame.display.set_caption("Flip 7")
+    clock = pygame.time.Clock()
+
+    # Use Comic Sans font per request (fallback if missing)
+    try:
+        FONT = pygame.font.SysFont("Comic Sans MS", 28)
+        BIG = pygame.font.SysFont("Comic Sans MS", 56)
+        SMALL = pygame.font.SysFont("Comic Sans MS", 20)
+    except Exception:
+        FONT = pygame.font.SysFont(None, 28)
+        BIG = pygame.font.SysFont(None, 56)
+        SMALL = pygame.font.SysFont(None, 20)
+
+    # card images load in the background while the first screen is up
+    start_atlas_loader()
+
+    # bots answer hit/stay from the solved lookup table; the first run solves it
+    # in the background, and until then bots play their bot_aggr threshold
+    global SOLVER
+    if load_stop_table() is None:
+        SOLVER = build_stop_table(background=True)
+
+def init_gui_manager():
+    """ Builds the pygame_gui manager (and loads gui.json) the first time the setup or rules screen is shown"""
+    global GUI_MANAGER
+    init_display()
+    if GUI_MANAGER is None:
+        import pygame_gui
+        # GUI manager for setup/rules (from second code)
+        GUI_MANAGER = pygame_gui.UIManager((WINDOW_WIDTH, WINDOW_HEIGHT), theme_path="gui.json")
+
+# ---------- Timeline ----------
+# Animations, messages and pauses are queued on TIMELINE and played by
+# run_timeline() one frame at a time, so events keep being pumped: the window
+# stays responsive, Quit / Return / Q work mid-animation and Space or Enter
+# skips the rest of the current action's animations. Headless runs skip the
+# pauses and step animations at a fixed 1/FPS without waiting.
+TIMELINE = Timeline()
+SKIP_KEYS = (K_SPACE, K_RETURN)
+RETURN_RECT = (WINDOW_WIDTH-200, 20, BUTTON_W, BUTTON_H)
+RETURN_TO_MENU = False      # set when Return / Q is used while an animation plays
+
+def pump_events():
+    """ Handles input while the timeline plays: quit, F3, skip keys and Return / Q"""
+    global RETURN_TO_MENU
+    for ev in pygame.event.get():
+        if ev.type == QUIT:
+            pygame.quit(); sys.exit()
+        handle_hotkeys(ev)
+        if ev.type == KEYDOWN and ev.key in SKIP_KEYS:
+            TIMELINE.skip()
+        if (ev.type == KEYDOWN and ev.key == K_q) or \
+                (ev.type == MOUSEBUTTONDOWN and ev.button == 1 and pygame.Rect(RETURN_RECT).collidepoint(ev.pos)):
+            RETURN_TO_MENU = True
+            TIMELINE.skip()
+
+def run_timeline():
+    """ Plays the queued steps frame by frame at FPS, handling input in between, until the timeline is empty"""
+    dt = 1000.0 / FPS
+    while TIMELINE.busy:
+        with PROFILER.phase("events"):
+            pump_events()
+        TIMELINE.update(dt * PLAYBACK_SPEED)
+        dt = tick()
+        if HEADLESS:
+            dt = 1000.0 / FPS
+
+def queue_pause(ms):
+    """ Takes in a time in ms, queues a pause of it (none when headless or in turbo)"""
+    if not HEADLESS and not TURBO and ms > 0:
+        TIMELINE.pause(ms)
+
+def wait(ms):
+    """ Takes in a time in ms and pauses for it, still handling input (skipped when headless)"""
+    queue_pause(ms)
+    run_timeline()
+
+def tick():
+    """ Waits for the next frame (uncapped when headless, or in turbo unless timed steps are playing), returns the ms since the last one"""
+    capped = not HEADLESS and (not TURBO or TIMELINE.busy)
+    with PROFILER.phase("tick"):
+        dt = clock.tick(FPS if capped else 0)
+    PROFILER.end_frame()
+    return dt
+
+def frame_due():
+    """ True unless turbo is on and the last frame went out less than 1/FPS ago"""
+    return not TURBO or time.perf_counter() - _last_present >= 1.0 / FPS
+
+# ---------- Idle input ----------
+# Screens waiting on the player (setup, rules, target picker, a human's turn)
+# don't redraw at FPS: they sleep in wait_events() until input arrives, and
+# redraw only when what they show (text, list, hover / pressed buttons)
+# differs from what was last drawn. The timeout wakes them now and then for
+# hover changes the event queue doesn't report, and keeps the perf HUD fresh.
+IDLE_TIMEOUT_MS = 250
+
+def wait_events(timeout_ms=IDLE_TIMEOUT_MS):
+    """ Takes in a timeout in ms, sleeps until there is input or the timeout passes, returns the pending events ([] on timeout)"""
+    with PROFILER.phase("idle"):
+        first = pygame.event.wait(timeout_ms)
+    PROFILER.end_frame()
+    if first.type == NOEVENT:
+        return []
+    return [first] + pygame.event.get()
+
+_hud_rect = None
+_last_present = 0.0
+
+def update_display(rects=None):
+    """ Shows the frame (only the given dirty rects when passed), with the perf HUD on top while profiling"""
+    global _hud_rect, _last_present
+    _last_present = time.perf_counter()
+    if PROFILER.enabled:
+        with PROFILER.phase("hud"):
+            if rects is not None and _hud_rect is not None:
+                restore_table(_hud_rect)    # the HUD changes size; clear the old one
+                rects = rects + [_hud_rect]
+            _hud_rect = PROFILER.draw_hud(screen, SMALL)
+            if rects is not None:
+                rects = rects + [_hud_rect]
+    with PROFILER.phase("display.update"):
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+
+def handle_hotkeys(ev):
+    """ Takes in an event, toggles the profiler on F3 and turbo on T"""
+    if ev.type == KEYDOWN and ev.key == K_F3:
+        PROFILER.toggle()
+        invalidate_table()      # full redraw to show / clear the HUD
+    if ev.type == KEYDOWN and ev.key == K_t:
+        toggle_turbo()
+        if TURBO:
+            TIMELINE.skip()     # drop what is playing now too
+
+def save_trace():
+    """ Writes the recorded trace to TRACE_PATH (when tracing)"""
+    if TRACE_PATH and PROFILER.trace:
+        PROFILER.dump_trace(TRACE_PATH)
 
 # deck draw area for animation -- moved down a bit so it doesn't block player names
 DECK_POS = (820, 120)
-
-# ---------- Image loading (cached) ----------
-IMAGE_CACHE = {}
-def load_card_image(val):
-    """ Takes in a number value and returns the card's image surface """
-    def try_load(pathlist):
-        """ Takes in the file path of the card image and returns a formatted image if possible, otherwise return None"""
-        for p in pathlist:
-            if not p:
-                continue
-            try:
-                img = pygame.image.load(p).convert_alpha()
-                img = pygame.transform.smoothscale(img, (CARD_W, CARD_H))
-                return img
-            except Exception:
-                continue
-        return None
-
+FINAL_BOX = (760, 90, 400, 120)
+
+# ---------- Text surface cache ----------
+# Labels, buttons and messages are mostly the same strings frame after frame,
+# so rendered text is kept in an LRU keyed by (font, text, color, antialias).
+# Callers only blit the returned surfaces, never draw on them.
+TEXT_CACHE_SIZE = 512
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(font, text, color, antialias=True):
+    """ Takes in a font, text and color, returns the rendered text surface (cached)"""
+    return font.render(text, antialias, color)
+
+def text_cache_stats():
+    """ Returns the text cache hit/miss counters as a short line"""
+    info = render_text.cache_info()
+    total = info.hits + info.misses
+    rate = 100 * info.hits / total if total else 0.0
+    return f"{info.hits} hits / {info.misses} misses ({rate:.0f}%), {info.currsize}/{info.maxsize} kept"
+
+PROFILER.counters["text cache"] = text_cache_stats
+
+# ---------- Card images (atlas) ----------
+# All card faces and the back are decoded, scaled and packed into one atlas
+# surface by a loader thread started with the display, so the menu comes up
+# while the PNGs load and no card is decoded mid-animation. The main thread
+# converts the atlas once and hands out CARD_W x CARD_H subsurfaces.
+# The packed pixels are kept in ASSET_CACHE (see asset_cache.py), so later
+# launches map them from disk instead of decoding PNGs; None turns that off.
+CARD_KEYS = list(range(22)) + ['BACK']
+ATLAS_COLS = 8
+ASSET_CACHE = asset_cache.CACHE_PATH
+ATLAS = None            # converted atlas surface once finished
+IMAGE_CACHE = {}        # card value / 'BACK' -> its atlas subsurface (or fallback)
+_atlas_ready = False
+_atlas_thread = None
+_atlas_loaded = None    # (unconverted atlas, bitmask of the slots that have an image) from the loader thread
+
+def card_paths(val):
+    """ Takes in a card value (or 'BACK'), returns the image files to try for it in order"""
+    if val == 'BACK':
+        return [os.path.join(ASSET_FOLDER, n) for n in ("back.png", "back.PNG", "cardback.png")]
     paths = []
     if val in range(0, 13):
         paths.append(os.path.join(ASSET_FOLDER, f"cardnum{val}.png"))
@@ -109,155 +343,106 @@ def load_card_image(val):
         base = name_map.get(val, f"card_{val}")
         paths.append(os.path.join(ASSET_FOLDER, f"{base}.png"))
         paths.append(os.path.join(ASSET_FOLDER, f"{base}.jpg"))
+    return paths
 
-    img = try_load(paths)
-    if img:
-        return img
+def card_sources():
+    """ Returns [(card key, the image file it will load or None)] for every card key"""
+    return [(key, next((p for p in card_paths(key) if os.path.isfile(p)), None)) for key in CARD_KEYS]
 
-    # fallback render
+def load_scaled(paths, size=None):
+    """ Takes in image file paths (and a size, default card size), returns the first that loads scaled (not converted, safe off the main thread), else None"""
+    for p in paths:
+        try:
+            return pygame.transform.smoothscale(pygame.image.load(p), size or (CARD_W, CARD_H))
+        except Exception:
+            continue
+    return None
+
+def fallback_card(val):
+    """ Takes in a card value (or 'BACK'), returns a plain drawn card for when its image is missing"""
     surf = pygame.Surface((CARD_W, CARD_H), pygame.SRCALPHA)
-    surf.fill(BG_DARK)
-    pygame.draw.rect(surf, (20,20,20), surf.get_rect(), 2)
-    label = str(val) if val in range(0,13) else LABEL_MAP.get(val, str(val))
+    if val == 'BACK':
+        surf.fill((60,80,120))
+        pygame.draw.rect(surf, TEXT_LIGHT, surf.get_rect(), 2)
+        label = "BACK"
+    else:
+        surf.fill(BG_DARK)
+        pygame.draw.rect(surf, (20,20,20), surf.get_rect(), 2)
+        label = str(val) if val in range(0,13) else LABEL_MAP.get(val, str(val))
     txt = SMALL.render(label, True, TEXT_LIGHT)
     tw, th = txt.get_size()
     surf.blit(txt, ((CARD_W - tw)//2, (CARD_H - th)//2))
     return surf
 
+def atlas_rect(slot, size=None):
+    """ Takes in a slot number (and a card size, default CARD_W x CARD_H), returns its rect in the atlas"""
+    w, h = size or (CARD_W, CARD_H)
+    return pygame.Rect((slot % ATLAS_COLS) * w, (slot // ATLAS_COLS) * h, w, h)
+
+def pack_atlas(size=None):
+    """ Takes in a card size (default CARD_W x CARD_H), decodes every card image into an unconverted atlas, returns (atlas, present slot bitmask)"""
+    size = size or (CARD_W, CARD_H)
+    atlas = pygame.Surface(asset_cache.atlas_shape(size, len(CARD_KEYS), ATLAS_COLS), pygame.SRCALPHA)
+    present = 0
+    for slot, key in enumerate(CARD_KEYS):
+        img = load_scaled(card_paths(key), size)
+        if img is not None:
+            atlas.blit(img, atlas_rect(slot, size))
+            present |= 1 << slot
+    return atlas, present
+
+def _load_atlas():
+    """ Loader thread: maps the atlas from the asset cache, or packs it from the PNGs and rewrites the cache"""
+    global _atlas_loaded
+    size = (CARD_W, CARD_H)
+    if ASSET_CACHE:
+        digest = asset_cache.sources_digest(card_sources())
+        cached = asset_cache.load(size, len(CARD_KEYS), ATLAS_COLS, digest, ASSET_CACHE)
+        if cached is not None:
+            _atlas_loaded = cached
+            return
+    atlas, present = pack_atlas(size)
+    _atlas_loaded = (atlas, present)
+    if ASSET_CACHE:
+        try:
+            asset_cache.save({size: (atlas, present)}, len(CARD_KEYS), ATLAS_COLS, digest, ASSET_CACHE)
+        except OSError:
+            pass        # read-only install: just decode again next time
+
+def start_atlas_loader():
+    """ Starts loading the card atlas in the background (once)"""
+    global _atlas_thread
+    if _atlas_thread is None:
+        _atlas_thread = threading.Thread(target=_load_atlas, name="card-atlas", daemon=True)
+        _atlas_thread.start()
+
+def finish_atlas():
+    """ Waits for the loader if it is still running, then converts the atlas and fills IMAGE_CACHE from it"""
+    global ATLAS, _atlas_ready
+    if _atlas_ready:
+        return
+    start_atlas_loader()
+    _atlas_thread.join()
+    _atlas_ready = True
+    if _atlas_loaded is None:       # loader thread failed: cards load one by one in get_card_image
+        return
+    atlas, present = _atlas_loaded
+    ATLAS = atlas.convert_alpha()
+    for slot, key in enumerate(CARD_KEYS):
+        IMAGE_CACHE[key] = ATLAS.subsurface(atlas_rect(slot)) if present >> slot & 1 else fallback_card(key)
+
 def get_card_image(v):
     """ Given the card value, returns the associated card image from the image dictionary"""
     if v not in IMAGE_CACHE:
-        IMAGE_CACHE[v] = load_card_image(v)
+        finish_atlas()
+        if v not in IMAGE_CACHE:    # not a known card (or no atlas)
+            img = load_scaled(card_paths(v))
+            IMAGE_CACHE[v] = img.convert_alpha() if img is not None else fallback_card(v)
     return IMAGE_CACHE[v]
 
-# back image loader
-def load_back_image():
-    """ Returns the image surface of the back card"""
-    paths = [
-        os.path.join(ASSET_FOLDER, "back.png"),
-        os.path.join(ASSET_FOLDER, "back.PNG"),
-        os.path.join(ASSET_FOLDER, "cardback.png"),
-    ]
-    for p in paths:
-        try:
-            img = pygame.image.load(p).convert_alpha()
-            img = pygame.transform.smoothscale(img, (CARD_W, CARD_H))
-            return img
-        except Exception:
-            continue
-    surf = pygame.Surface((CARD_W, CARD_H), pygame.SRCALPHA)
-    surf.fill((60,80,120))
-    pygame.draw.rect(surf, TEXT_LIGHT, surf.get_rect(), 2)
-    txt = SMALL.render("BACK", True, TEXT_LIGHT)
-    tw, th = txt.get_size()
-    surf.blit(txt, ((CARD_W - tw)//2, (CARD_H - th)//2))
-    return surf
-
 def get_back_image():
     """ Return the back card image from the image dicitonary"""
-    if 'BACK' not in IMAGE_CACHE:
-        IMAGE_CACHE['BACK'] = load_back_image()
-    return IMAGE_CACHE['BACK']
-
-# ---------- Deck builder ----------
-def make_deck():
-    """ Create a deck of cards, returns it as a list"""
-    deck = []
-    deck.extend([0]*1)
-    for v in range(1, 13):
-        deck.extend([v]*v)
-    for v in range(13, 18):
-        deck.append(v)
-    if 18 not in deck:
-        deck.append(18)
-    for a in (19,20,21):
-        deck.extend([a]*30)
-    random.shuffle(deck)
-    return deck
-
-# ---------- Player ----------
-class Player:
-    def __init__(self, name, is_bot=False, bot_aggr=BOT_HIT_THRESHOLD):
-        """Create the constructor fo the Player class. Takes in a name,  is bot (default False), and bot agression (default is a constant)"""
-        self.name = name
-        self.is_bot = is_bot
-        self.bot_aggr = bot_aggr
-        self.hand = []            # ints 0..21
-        self.hand_face = []       # booleans for face-up
-        self.has_second = False
-        self.stayed = False
-        self.busted = False
-        self.score_current = 0
-        self.score_total = 0
-
-    def reset_for_round(self):
-        """ Resets the round of the player by settings all attributes to its initialized state except the total score"""
-        self.hand = []
-        self.hand_face = []
-        self.has_second = False
-        self.stayed = False
-        self.busted = False
-        self.score_current = 0
-
-    def compute_current_score(self):
-        """ Calculate the player's current score"""
-        num_sum = sum(c for c in self.hand if c in range(0,13))
-        mul = 2 if 18 in self.hand else 1
-        mod_sum = sum(MODIFIER_MAP[c] for c in self.hand if c in MODIFIER_MAP)
-        self.score_current = num_sum * mul + mod_sum
-        return self.score_current
-
-    # helpers
-    def add_card(self, card_val, face_up=True):
-        """ Takes in a card value and add it to the player's hand"""
-        self.hand.append(card_val)
-        self.hand_face.append(bool(face_up))
-
-    def pop_last(self):
-        """" Remove the player's latest card"""
-        if not self.hand: return None
-        self.hand_face.pop()
-        return self.hand.pop()
-
-    def remove_card_value(self, value):
-        """Takes a card and remove it from the player's hand"""
-        # remove first occurrence synchronously for hand and hand_face
-        for i, v in enumerate(self.hand):
-            if v == value:
-                self.hand.pop(i)
-                self.hand_face.pop(i)
-                return True
-        return False
-
-# ---------- Helpers ----------
-def unique_number_count(hand):
-    """ Takes in a hand and return the number of unique number cards"""
-    return len(set([c for c in hand if c in range(0,13)]))
-
-def has_duplicate_number(hand):
-    """ Takes a hand and return True if there is a duplicate card and False is there isn't"""
-    nums = [c for c in hand if c in range(0,13)]
-    return len(nums) != len(set(nums))
-
-def next_active_index(players, start_idx):
-    """ Takes in the list of players and a starting index, returns the index of the player of the next active player. If no more active players, return None"""
-    n = len(players)
-    for i in range(1, n+1):
-        idx = (start_idx + i) % n
-        if not players[idx].busted and not players[idx].stayed:
-            return idx
-    return None
-
-def ensure_deck_has_cards(deck, discard):
-    """ Checks the if the deck has cards, if not, add discard cards back to the deck and shuffle """
-    if not deck and discard:
-        deck.extend(discard)
-        discard.clear()
-        random.shuffle(deck)
-
-def active_player_indices(players):
-    """ Takes in a list of players and returns list of active players indexes"""
-    return [i for i,p in enumerate(players) if not p.busted and not p.stayed]
+    return get_card_image('BACK')
 
 # ---------- UI helpers ----------
 def player_hand_pos(player_index, card_index):
@@ -273,9 +458,10 @@ def draw_header(title):
     screen.fill(BG_DARK)
     hdr_rect = pygame.Rect(12, 8, 760, 80)
     pygame.draw.rect(screen, BG_DARK, hdr_rect)  # same color but keeps consistent layout
-    screen.blit(BIG.render(title, True, TEXT_LIGHT), (18, 10))
+    screen.blit(render_text(BIG, title, TEXT_LIGHT), (18, 10))
     # NOTE: removed the "H = Hit ..." subtext per user's request
 
+@profiled(PROFILER, "draw_players")
 def draw_players(players, current_idx, final_info=None):
     """ Takes in a list of players, current index, and final info (default None) and display each players' information"""
     y = ROWS_TOP
@@ -290,7 +476,7 @@ def draw_players(players, current_idx, final_info=None):
         # draw label on a small background rect to avoid bleed
         lbl_rect = pygame.Rect(12, y-60, 700, 35 + 2 * padding)
         pygame.draw.rect(screen, BG_GREEN, lbl_rect)
-        screen.blit(FONT.render(label, True, TEXT_DARK), (18, y-60))
+        screen.blit(render_text(FONT, label, TEXT_DARK), (18, y-60))
         x = 18
         # draw cards slightly lower to avoid overlapping the name
         card_y = y-10
@@ -307,12 +493,17 @@ def draw_players(players, current_idx, final_info=None):
 
     # draw deck (so deck is under final-info box)
 
-def draw_deck_info(deck, discard):
-    """ Takes in a deck and discard deck and displays the current decks' info """
+@profiled(PROFILER, "draw_deck_info")
+def draw_deck_info(deck, player=None):
+    """ Takes in the Deck and optionally the player whose turn it is, displays the current decks' info (and that player's odds) """
     # small background area for deck info so text doesn't bleed
-    rect = pygame.Rect(WINDOW_WIDTH-380, 250, 360, 54)
+    rect = pygame.Rect(WINDOW_WIDTH-380, 250, 360, 80)
     pygame.draw.rect(screen, BG_DARK, rect)
-    screen.blit(FONT.render(f"Deck: {len(deck)}   Discard: {len(discard)}", True, TEXT_LIGHT), (820, 250))
+    screen.blit(render_text(FONT, f"Deck: {len(deck)}   Discard: {len(deck.discard)}", TEXT_LIGHT), (820, 250))
+    if player is not None:
+        # odds overlay: chance the next card busts this player / is a modifier
+        odds = f"Bust: {100 * deck.p_bust(player):.0f}%   Modifier: {100 * deck.p_modifier():.0f}%"
+        screen.blit(render_text(SMALL, odds, TEXT_LIGHT), (820, 292))
     top_rect = pygame.Rect(DECK_POS[0], DECK_POS[1], CARD_W, CARD_H)
     pygame.draw.rect(screen, (225,225,225), top_rect)
     pygame.draw.rect(screen, TEXT_LIGHT, top_rect, 2)
@@ -320,15 +511,16 @@ def draw_deck_info(deck, discard):
         # move the back image down slightly (DECK_POS already moved)
         screen.blit(get_back_image(), top_rect.topleft)
 
+@profiled(PROFILER, "overlays")
 def draw_final_info_box(final_info):
     """ Takes in the final info (string) and displays it on the screen"""
     # draw final info on top of everything (call after draw_deck_info/draw_players)
     if not final_info:
         return
-    box = pygame.Rect(760, 90, 400, 120)
+    box = pygame.Rect(FINAL_BOX)
     pygame.draw.rect(screen, BG_GREY, box)
     pygame.draw.rect(screen, TEXT_LIGHT, box, 2)
-    screen.blit(FONT.render("FINAL ROUND INFO", True, TEXT_DARK), (box.x + 12, box.y + 8))
+    screen.blit(render_text(FONT, "FINAL ROUND INFO", TEXT_DARK), (box.x + 12, box.y + 8))
     # wrap text if needed
     wrapped = []
     line = ""
@@ -341,17 +533,72 @@ def draw_final_info_box(final_info):
     if line: wrapped.append(line)
     y = box.y + 38
     for ln in wrapped:
-        screen.blit(SMALL.render(ln.strip(), True, TEXT_DARK), (box.x + 12, y))
+        screen.blit(render_text(SMALL, ln.strip(), TEXT_DARK), (box.x + 12, y))
         y += 22
 
+# ---------- Layered table renderer ----------
+# The table (header, hands, scores, deck info, final round box) only changes
+# when the game does, so it is drawn once and kept in TABLE_LAYER. Moving
+# cards and buttons are blitted over the screen and erased by copying the
+# layer back, and only those rects go to display.update. Anything that draws
+# over the table some other way (messages, the target picker) calls
+# invalidate_table().
+TABLE_LAYER = None
+_table_key = None
+
+def table_key(title, players, current_idx, deck, odds_player, final_info):
+    """ Returns a snapshot of everything the table layer shows"""
+    return (title, current_idx, final_info, len(deck), len(deck.discard), odds_player is not None and id(odds_player),
+            tuple((p.name, p.score_total, p.score_current, p.busted, p.stayed, tuple(p.hand), p.hand_face.tobytes())
+                  for p in players))
+
+def draw_table(title, players, current_idx, deck, odds_player=None, final_info=None):
+    """
+    Takes in the header title, players, current index, deck, the player whose odds are
+    shown and the final round info. Puts the table on the screen, redrawing it only if
+    something on it changed since the last call; returns True if it was redrawn.
+    """
+    global TABLE_LAYER, _table_key
+    key = table_key(title, players, current_idx, deck, odds_player, final_info)
+    if key == _table_key:
+        return False
+    draw_header(title)
+    draw_players(players, current_idx, None)
+    draw_deck_info(deck, odds_player)
+    # final info on top (after deck)
+    draw_final_info_box(final_info)
+    if TABLE_LAYER is None:
+        TABLE_LAYER = screen.copy()
+    else:
+        TABLE_LAYER.blit(screen, (0, 0))
+    _table_key = key
+    return True
+
+def restore_table(rect):
+    """ Takes in a rect, copies the table layer back over it (erasing whatever was drawn there)"""
+    if TABLE_LAYER is not None:
+        screen.blit(TABLE_LAYER, rect, rect)
+
+def invalidate_table():
+    """ Marks the screen as no longer showing the table layer, so the next draw_table redraws it"""
+    global _table_key
+    _table_key = None
+
 # ---------- Message overlay (for busts, flip7, etc.) ----------
-def show_message(text, ms=MESSAGE_MS):
-    """ Takes in a text and how long it should be displayed for (default is MESSAGE_MS), finally overlaying`1 the text on the screen"""
+@lru_cache(maxsize=None)
+def message_overlay():
+    """ Returns the translucent full-screen surface messages are shown over (built once)"""
     overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
     overlay.fill((0,0,0,140))
-    screen.blit(overlay, (0,0))
+    return overlay
+
+@profiled(PROFILER, "overlays")
+def draw_message(text):
+    """ Takes in a text and overlays it in a box in the middle of the screen"""
+    invalidate_table()
+    screen.blit(message_overlay(), (0,0))
     padding = 15
-    text_surface = BIG.render(text, True, BG_DARK)
+    text_surface = render_text(BIG, text, BG_DARK)
     box_w, box_h = text_surface.get_width() + 2 * padding, text_surface.get_height() + 2 * padding
     box_x = (WINDOW_WIDTH - box_w)//2
     box_y = (WINDOW_HEIGHT - box_h)//2
@@ -360,35 +607,66 @@ def show_message(text, ms=MESSAGE_MS):
     lines = text.split('\n')
     y = box_y + 18
     for line in lines:
-        txt = BIG.render(line, True, TEXT_LIGHT)
+        txt = render_text(BIG, line, TEXT_LIGHT)
         txw, txh = txt.get_size()
         screen.blit(txt, (box_x + (box_w - txw)//2, y))
         y += txh + 6
-    pygame.display.update()
-    pygame.time.delay(ms)
+    update_display()
+
+def queue_message(text, ms=None):
+    """ Takes in a text and how long it should be displayed for (default MESSAGE_MS), queues it on the timeline (not in turbo)"""
+    if TURBO:
+        return
+    TIMELINE.add(0 if HEADLESS else MESSAGE_MS if ms is None else ms, start=lambda: draw_message(text))
+
+def show_message(text, ms=None):
+    """ Takes in a text and how long it should be displayed for (default is MESSAGE_MS), finally overlaying`1 the text on the screen"""
+    queue_message(text, ms)
+    run_timeline()
 
 # ---------- animation: animate moving a card from deck to player's hand ----------
-def animate_card_move(card_val, target_idx, target_slot_index, duration_ms):
-    """Takes in the card value, target index, target slot index, and time to animate a card from the deck to the player's hand"""
+def queue_card_move(card_val, target_idx, target_slot_index, duration_ms):
+    """ Takes in the card value, target index, target slot index and duration, queues the card flying from the deck to that slot (not in turbo)"""
+    if TURBO:
+        return
     start_x, start_y = DECK_POS
     end_x, end_y = player_hand_pos(target_idx, target_slot_index)
     img = get_card_image(card_val)   # face image while moving (requested)
-    frames = max(1, int(round(duration_ms / (1000.0 / FPS))))
-    for f in range(frames):
-        t = (f+1)/frames
+    players, current_idx, final_info = current_global_players
+    deck, odds_player, title = current_global_deck
+    final_box = pygame.Rect(FINAL_BOX) if final_info else None
+    drawn = {"prev": None, "full": False}
+
+    def start():
+        # the table is only redrawn if it changed since the last frame shown
+        drawn["full"] = draw_table(title, players, current_idx, deck, odds_player, final_info)
+
+    def update(t):
         cur_x = int(start_x + (end_x - start_x) * t)
         cur_y = int(start_y + (end_y - start_y) * t)
-        # redraw behind
-        draw_header("Flip 7 — Play")
-        draw_players(current_global_players[0], current_global_players[1], None)
-        draw_deck_info(current_global_deck[0], current_global_discard[0])
-        # draw moving card on top
-        screen.blit(img, (cur_x, cur_y))
-        # if final info present draw that after to ensure it's on top
-        if current_global_players[2]:
-            draw_final_info_box(current_global_players[2])
-        pygame.display.update()
-        clock.tick(FPS)
+        # erase the card where it was, draw it where it is now
+        dirty = []
+        prev = drawn["prev"]
+        if prev is not None:
+            restore_table(prev)
+            dirty.append(prev)
+        with PROFILER.phase("sprites"):
+            rect = screen.blit(img, (cur_x, cur_y))
+            # final info box stays on top of the moving card
+            if final_box is not None and rect.colliderect(final_box):
+                restore_table(rect.clip(final_box))
+        dirty.append(rect)
+        drawn["prev"] = rect
+        update_display(None if drawn["full"] else dirty)
+        drawn["full"] = False
+
+    # the card is left on screen until the engine adds it to the hand
+    TIMELINE.add(duration_ms, start, update, done=invalidate_table)
+
+def animate_card_move(card_val, target_idx, target_slot_index, duration_ms):
+    """Takes in the card value, target index, target slot index, and time to animate a card from the deck to the player's hand"""
+    queue_card_move(card_val, target_idx, target_slot_index, duration_ms)
+    run_timeline()
 
 # ---------- Target selection overlay ----------
 def choose_target_ui(players, prompt_text, allowed_indices=None):
@@ -400,269 +678,86 @@ def choose_target_ui(players, prompt_text, allowed_indices=None):
         visible_list = list(range(len(players)))
     else:
         visible_list = list(allowed_indices)
+    invalidate_table()
+    drawn = None        # what the overlay was last drawn with
 
     while selecting:
-        for ev in pygame.event.get():
-            if ev.type == QUIT:
-                pygame.quit(); sys.exit()
-            if ev.type == MOUSEBUTTONDOWN and ev.button == 1:
-                mx,my = ev.pos
+        # the overlay is static: drawn once, again only for the perf HUD
+        if PROFILER.enabled != drawn or PROFILER.enabled:
+            with PROFILER.phase("overlays"):
+                screen.fill(BG_GREY)
+                pygame.draw.rect(screen, BG_DARK, overlay)
+                pygame.draw.rect(screen, BG_DARK, overlay, 3)
+                title = render_text(BIG, prompt_text, TEXT_DARK)
+                screen.blit(title, (overlay.x + 20, overlay.y + 10))
                 base_y = overlay.y + 60
+
                 for row_i, i in enumerate(visible_list):
                     p = players[i]
-                    rect = pygame.Rect(overlay.x + 40, base_y + row_i*44 + 40, overlay.width - 80, 38)
-                    if rect.collidepoint(mx,my):
-                        if p.busted or p.stayed:
+                    status = " (BUSTED)" if p.busted else (" (STAYED)" if p.stayed else "")
+                    lab = f"{i+1}. {p.name}{status}"
+                    rect = pygame.Rect(overlay.x + 40, base_y + row_i*44 + 40, overlay.width - 50, 38)
+                    color = BG_GREY if (p.busted or p.stayed) else BG_DARK
+                    pygame.draw.rect(screen, color, rect)
+                    pygame.draw.rect(screen, BG_DARK, rect, 1)
+                    screen.blit(render_text(FONT, lab, TEXT_LIGHT), (rect.x + 8, rect.y))
+            update_display()
+            drawn = PROFILER.enabled
+
+        events = wait_events()
+        with PROFILER.phase("events"):
+            for ev in events:
+                if ev.type == QUIT:
+                    pygame.quit(); sys.exit()
+                if ev.type == MOUSEBUTTONDOWN and ev.button == 1:
+                    mx,my = ev.pos
+                    base_y = overlay.y + 60
+                    for row_i, i in enumerate(visible_list):
+                        p = players[i]
+                        rect = pygame.Rect(overlay.x + 40, base_y + row_i*44 + 40, overlay.width - 80, 38)
+                        if rect.collidepoint(mx,my):
+                            if p.busted or p.stayed:
+                                break
+                            selected = i
+                            selecting = False
                             break
-                        selected = i
-                        selecting = False
-                        break
-            if ev.type == KEYDOWN and ev.key == K_ESCAPE:
-                selected = None
-                selecting = False
-
-        screen.fill(BG_GREY)
-        pygame.draw.rect(screen, BG_DARK, overlay)
-        pygame.draw.rect(screen, BG_DARK, overlay, 3)
-        title = BIG.render(prompt_text, True, TEXT_DARK)
-        screen.blit(title, (overlay.x + 20, overlay.y + 10))
-        base_y = overlay.y + 60
-
-        for row_i, i in enumerate(visible_list):
-            p = players[i]
-            status = " (BUSTED)" if p.busted else (" (STAYED)" if p.stayed else "")
-            lab = f"{i+1}. {p.name}{status}"
-            rect = pygame.Rect(overlay.x + 40, base_y + row_i*44 + 40, overlay.width - 50, 38)
-            color = BG_GREY if (p.busted or p.stayed) else BG_DARK
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, BG_DARK, rect, 1)
-            screen.blit(FONT.render(lab, True, TEXT_LIGHT), (rect.x + 8, rect.y))
-
-        pygame.display.update()
-        clock.tick(FPS)
+                if ev.type == KEYDOWN and ev.key == K_ESCAPE:
+                    selected = None
+                    selecting = False
+                handle_hotkeys(ev)
     return selected
 
 # Globals for animation redraw
 current_global_players = [None, None, None]  # players, current_idx, final_info
-current_global_deck = [None]
-current_global_discard = [None]
-
-# ---------- Resolve drawn card logic (core mechanics) ----------
-def resolve_draw(player_idx, card_val, players, deck, discard, current_idx):
-    """
-    Takes in the player index, card  value, list of players, deck, discard deck, and the current player index
-    Returns: 'ok','bust','flip7','second_consumed'
-    """
-    p = players[player_idx]
-
-    # SECOND CHANCE (21)
-    if card_val == 21:
-        if not p.has_second:
-            p.has_second = True
-            p.add_card(21, face_up=True)
-            p.compute_current_score()
-            return "ok"
-        # Already has one -> must give to other eligible or discard
-        eligible = [i for i,pp in enumerate(players) if i != player_idx and (not pp.busted) and (not pp.stayed) and (not pp.has_second)]
-        if p.is_bot:
-            if eligible:
-                tgt = random.choice(eligible)
-                players[tgt].has_second = True
-                players[tgt].add_card(21, face_up=True)
-                players[tgt].compute_current_score()
-                return "ok"
-            else:
-                discard.append(21)
-                return "ok"
-        else:
-            if not eligible:
-                discard.append(21)
-                return "ok"
-            tgt = choose_target_ui(players, f"{p.name} drew SECOND", allowed_indices=eligible)
-            if tgt is not None:
-                players[tgt].has_second = True
-                players[tgt].add_card(21, face_up=True)
-                players[tgt].compute_current_score()
-            else:
-                discard.append(21)
-            return "ok"
-
-    # FLIP THREE (20)
-    if card_val == 20:
-        active = active_player_indices(players)
-        if player_idx not in active:
-            active.append(player_idx)
-            active = sorted(set(active))
-        if len(active) == 1:
-            target_idx = active[0]
-        else:
-            if p.is_bot:
-                others = [i for i in active if i != player_idx]
-                target_idx = random.choice(others) if others else player_idx
-            else:
-                target_idx = choose_target_ui(players, f"{p.name} drew FLIP3", allowed_indices=active)
-                if target_idx is None:
-                    discard.append(20)
-                    return "ok"
-
-
-        # AUTOMATIC delivery for both bots and humans: perform 3 slow flips onto target
-        show_message(f"{p.name} used FLIP3 -> {players[target_idx].name}", ms=MESSAGE_MS//2)
-        for _ in range(3):
-            ensure_deck_has_cards(deck, discard)
-            if not deck:
-                break
-            drawn = deck.pop()
-            animate_card_move(drawn, target_idx, len(players[target_idx].hand), DEAL_ANIM_MS//2)
-            players[target_idx].add_card(drawn, face_up=True)
-            pygame.time.delay(FLIP3_INTERVAL_MS)
-            # only number cards can bust
-            if drawn in range(0,13):
-                nums = [c for c in players[target_idx].hand if c in range(0,13)]
-                if len(nums) != len(set(nums)):
-                    if players[target_idx].has_second:
-                        players[target_idx].pop_last()
-                        players[target_idx].has_second = False
-                        players[target_idx].remove_card_value(21)
-                        players[target_idx].compute_current_score()
-                        continue
-                    else:
-                        discard.extend(players[target_idx].hand)
-                        players[target_idx].hand = []
-                        players[target_idx].hand_face = []
-                        players[target_idx].busted = True
-                        players[target_idx].score_current = 0
-                        show_message(f"{players[target_idx].name} BUSTED!", ms=900)
-                        pygame.time.delay(POST_ACTION_PAUSE_MS)
-                        return "bust"
-        # After performing the three flips, continue to action resolution below
-
-        # After playing flips, resolve action cards in target hand (remove BEFORE processing)
-        # Collect a copy then remove+process to avoid leaving markers
-        action_cards = [c for c in list(players[target_idx].hand) if c in (19,20)]
-        for a in action_cards:
-            # remove one instance (important to avoid re-triggering)
-            players[target_idx].remove_card_value(a)
-            if players[target_idx].busted:
-                break
-            if a == 19:
-                targ_candidates = active_player_indices(players)
-                if target_idx not in targ_candidates: targ_candidates.append(target_idx)
-                if len(targ_candidates) == 1:
-                    tgt = targ_candidates[0]
-                else:
-                    if players[target_idx].is_bot:
-                        others2 = [i for i in targ_candidates if i != target_idx]
-                        tgt = random.choice(others2) if others2 else target_idx
-                    else:
-                        tgt = choose_target_ui(players, f"{players[target_idx].name} resolved FREEZE", allowed_indices=targ_candidates)
-                        if tgt is None:
-                            continue
-                targ = players[tgt]
-                show_message(f"{players[target_idx].name} resolved FREEZE -> {targ.name}", ms=MESSAGE_MS//2)
-                targ.compute_current_score()
-                targ.score_total += targ.score_current
-                discard.extend(targ.hand)
-                targ.hand = []
-                targ.hand_face = []
-                targ.stayed = True
-                pygame.time.delay(POST_ACTION_PAUSE_MS)
-            elif a == 20:
-                # cascade 3 draws onto same target (automatic)
-                for _ in range(3):
-                    ensure_deck_has_cards(deck, discard)
-                    if not deck: break
-                    drawn2 = deck.pop()
-                    animate_card_move(drawn2, target_idx, len(players[target_idx].hand), DEAL_ANIM_MS//2)
-                    players[target_idx].add_card(drawn2, face_up=True)
-                    pygame.time.delay(FLIP3_INTERVAL_MS)
-                    if drawn2 in range(0,13):
-                        nums = [c for c in players[target_idx].hand if c in range(0,13)]
-                        if len(nums) != len(set(nums)):
-                            if players[target_idx].has_second:
-                                players[target_idx].pop_last()
-                                players[target_idx].has_second = False
-                                players[target_idx].remove_card_value(21)
-                            else:
-                                discard.extend(players[target_idx].hand)
-                                players[target_idx].hand = []
-                                players[target_idx].hand_face = []
-                                players[target_idx].busted = True
-                                players[target_idx].score_current = 0
-                                show_message(f"{players[target_idx].name} BUSTED!", ms=900)
-                                pygame.time.delay(POST_ACTION_PAUSE_MS)
-                                return "bust"
-                show_message(f"{players[target_idx].name} resolved FLIP3", ms=MESSAGE_MS//2)
-                
-                pygame.time.delay(POST_ACTION_PAUSE_MS)
-
-        # Check Flip7 for the target after all cascades
-        players[target_idx].compute_current_score()
-        if unique_number_count(players[target_idx].hand) >= 7:
-            show_message(f"{players[target_idx].name} got FLIP 7!", ms=MESSAGE_MS)
-            players[target_idx].score_total += 15 + players[target_idx].score_current
-            discard.extend(players[target_idx].hand); players[target_idx].hand = []; players[target_idx].hand_face = []; players[target_idx].stayed = True
-            pygame.time.delay(POST_ACTION_PAUSE_MS)
-            return "flip7"
-        return "ok"
-
-    # NORMAL: add the card face-up
-    p.add_card(card_val, face_up=True)
-
-    # Numerical duplicates only cause busts — modifiers and action cards are safe
-    if card_val in range(0,13):
-        nums = [c for c in p.hand if c in range(0,13)]
-        if len(nums) != len(set(nums)):
-            if p.has_second:
-                # consume second chance and drop duplicate drawn
-                p.pop_last()
-                p.has_second = False
-                p.remove_card_value(21)
-                p.compute_current_score()
-                return "second_consumed"
-            else:
-                discard.extend(p.hand)
-                p.hand = []
-                p.hand_face = []
-                p.busted = True
-                p.score_current = 0
-                show_message(f"{p.name} BUSTED!", ms=900)
-                pygame.time.delay(POST_ACTION_PAUSE_MS)
-                return "bust"
-
-    # Freeze (19) resolved immediately if drawn outside flip3 context
-    if card_val == 19:
-        tgt_candidates = active_player_indices(players)
-        if player_idx not in tgt_candidates:
-            tgt_candidates.append(player_idx)
-        if len(tgt_candidates) == 1:
-            tgt = tgt_candidates[0]
-        else:
-            if p.is_bot:
-                others = [i for i in tgt_candidates if i != player_idx]
-                tgt = random.choice(others) if others else player_idx
-            else:
-                tgt = choose_target_ui(players, f"{p.name} played FREEZE", allowed_indices=tgt_candidates)
-                if tgt is None:
-                    # canceled -> discard freeze and remove its visual presence
-                    discard.append(19)
-                    p.remove_card_value(19)
-                    return "ok"
-        targ = players[tgt]
-        show_message(f"{p.name} used FREEZE -> {targ.name}", ms=MESSAGE_MS//2)
-        targ.compute_current_score(); targ.score_total += targ.score_current
-        discard.extend(targ.hand); targ.hand = []; targ.hand_face = []; targ.stayed = True
-        pygame.time.delay(POST_ACTION_PAUSE_MS)
-
-    # final compute and Flip7 check
-    p.compute_current_score()
-    if unique_number_count(p.hand) >= 7:
-        show_message(f"{p.name} got FLIP 7!", ms=MESSAGE_MS)
-        p.score_total += 15 + p.score_current
-        discard.extend(p.hand); p.hand = []; p.hand_face = []; p.stayed = True
-        pygame.time.delay(POST_ACTION_PAUSE_MS)
-        return "flip7"
-    return "ok"
+current_global_deck = [None, None, "Flip 7 — Play"]  # deck, player whose odds are shown, header title
+
+# ---------- Engine event presentation (animations, messages) ----------
+def present_event(state, ev):
+    """ Takes in the game state and an engine event, plays the animation or message for it"""
+    players = state.players
+    if ev.kind in CARD_MOVE_MS:
+        # card events arrive before the card is added, so it flies to the next free slot
+        queue_card_move(ev.card, ev.seat, len(players[ev.seat].hand), CARD_MOVE_MS[ev.kind])
+        if ev.kind == "flip3_draw":
+            queue_pause(FLIP3_INTERVAL_MS)
+        elif state.phase == "deal":
+            queue_pause(60)
+    elif ev.kind == "flip3":
+        queue_message(f"{players[ev.seat].name} used FLIP3 -> {players[ev.target].name}", ms=MESSAGE_MS//2)
+    elif ev.kind == "freeze":
+        queue_message(f"{players[ev.seat].name} used FREEZE -> {players[ev.target].name}", ms=MESSAGE_MS//2)
+        queue_pause(POST_ACTION_PAUSE_MS)
+    elif ev.kind == "flip3_resolved":
+        queue_message(f"{players[ev.seat].name} resolved FLIP3", ms=MESSAGE_MS//2)
+        queue_pause(POST_ACTION_PAUSE_MS)
+    elif ev.kind == "bust":
+        queue_message(f"{players[ev.seat].name} BUSTED!", ms=900)
+        queue_pause(POST_ACTION_PAUSE_MS)
+    elif ev.kind == "flip7":
+        queue_message(f"{players[ev.seat].name} got FLIP 7!", ms=MESSAGE_MS)
+        queue_pause(POST_ACTION_PAUSE_MS)
+    # the engine waits for the timeline: the next event needs the table as it is now
+    run_timeline()
 
 # ---------- UI Button helper ----------
 class Button:
@@ -677,7 +772,7 @@ class Button:
         col = (180,220,255) if self.hover else (200,200,200)
         pygame.draw.rect(surf, col, self.rect)
         pygame.draw.rect(surf, TEXT_LIGHT, self.rect, 2)
-        txt = FONT.render(self.label, True, TEXT_LIGHT)
+        txt = render_text(FONT, self.label, TEXT_LIGHT)
         tw, th = txt.get_size()
         surf.blit(txt, (self.rect.x + (self.rect.w - tw)//2, self.rect.y + (self.rect.h - th)//2))
     def handle_event(self, ev):
@@ -687,27 +782,23 @@ class Button:
         if ev.type == MOUSEBUTTONDOWN and ev.button == 1 and self.rect.collidepoint(ev.pos):
             self.callback()
 
-# ---------- Bot simple heuristic ----------
-def bot_should_hit(p: Player):
-    """ Takes in a player and returns True if the bot should hit or False if bot should not heat"""
-    num_sum = sum(c for c in p.hand if c in range(0,13))
-    ucount = unique_number_count(p.hand)
-    if ucount >= 6:
-        return False
-    return num_sum < p.bot_aggr
-
 # ---------- Winner announce ----------
 def announce_winner(player):
     """ Takes in a player and displays text to announce them as the winner"""
     screen.fill(BG_GREEN)
-    screen.blit(BIG.render(f"{player.name} wins with {player.score_total} points!", True, TEXT_LIGHT), (80, 320))
-    pygame.display.update()
-    pygame.time.delay(3000)
+    screen.blit(render_text(BIG, f"{player.name} wins with {player.score_total} points!", TEXT_LIGHT), (80, 320))
+    update_display()
+    # shown even in turbo
+    if not HEADLESS:
+        TIMELINE.pause(3000)
+        run_timeline()
 
 # ---------- Setup GUI (combined start/setup) ----------
 players_global = []
 def setup_players_gui():
     """ minimal in-app GUI using pygame_gui; allows add human/bot/clear/start"""
+    import pygame_gui
+    init_gui_manager()
     running = True
     input_text = ""
     input_rect = pygame.Rect((50,200,400,50))
@@ -719,9 +810,30 @@ def setup_players_gui():
     clear_btn = pygame_gui.elements.UIButton(relative_rect=pygame.Rect((x,y+(BUTTON_H+20)*2),(btn_w,BUTTON_H)), text="Clear", manager=GUI_MANAGER)
     start_btn = pygame_gui.elements.UIButton(relative_rect=pygame.Rect((x,y+(BUTTON_H+20)*3),(btn_w,BUTTON_H)), text="Start Game", manager=GUI_MANAGER)
     ui_e = [return_btn, add_human_btn, add_bot_btn, clear_btn, start_btn]
+    drawn = None        # what the screen was last drawn showing
 
     while running:
-        for ev in pygame.event.get():
+        GUI_MANAGER.update(clock.tick())
+        shown = (input_text, tuple((p.name, p.is_bot) for p in players_global),
+                 tuple((e.hovered, e.held) for e in ui_e), PROFILER.enabled)
+        if shown != drawn or PROFILER.enabled:
+            screen.fill(BG_DARK)
+            draw_header("Setup Players")
+            pygame.draw.rect(screen,BG_DARK,input_rect,border_radius=6)
+            pygame.draw.rect(screen,TEXT_LIGHT,input_rect,2,border_radius=6)
+            screen.blit(render_text(FONT, input_text, TEXT_LIGHT), (60,210))
+            draw_sub = render_text(SMALL, "Type player name and press 'Add Human' or Enter", TEXT_LIGHT)
+            screen.blit(draw_sub, (50,170))
+            yy = 300
+            for i, p in enumerate(players_global):
+                lab = f"{i+1}. {p.name} {'(BOT)' if p.is_bot else '(HUMAN)'}"
+                screen.blit(render_text(FONT, lab, TEXT_LIGHT), (50, yy))
+                yy += 32
+            GUI_MANAGER.draw_ui(screen)
+            update_display()
+            drawn = shown
+
+        for ev in wait_events():
             if ev.type == QUIT:
                 pygame.quit(); sys.exit()
             GUI_MANAGER.process_events(ev)
@@ -741,19 +853,20 @@ def setup_players_gui():
                     if players_global:
                         for e in ui_e:
                             e.kill()
-                        GUI_MANAGER.update(clock.tick(FPS))
+                        GUI_MANAGER.update(tick())
                         GUI_MANAGER.draw_ui(screen)
                         screen.fill(BG_DARK)
-                        pygame.display.update()
+                        update_display()
                         play_game_gui()
+                        save_trace()
                         return
                 if ev.ui_element == return_btn:
                     for e in ui_e:
                         e.kill()
-                    GUI_MANAGER.update(clock.tick(FPS))
+                    GUI_MANAGER.update(tick())
                     GUI_MANAGER.draw_ui(screen)
                     screen.fill(BG_DARK)
-                    pygame.display.update()
+                    update_display()
                     running = False
             elif ev.type == KEYDOWN:
                 if ev.key == K_BACKSPACE:
@@ -766,365 +879,339 @@ def setup_players_gui():
                     if len(input_text) < 18:
                         input_text += ev.unicode
 
-        screen.fill(BG_DARK)
-        draw_header("Setup Players")
-        pygame.draw.rect(screen,BG_DARK,input_rect,border_radius=6)
-        pygame.draw.rect(screen,TEXT_LIGHT,input_rect,2,border_radius=6)
-        screen.blit(FONT.render(input_text, True, TEXT_LIGHT), (60,210))
-        draw_sub = SMALL.render("Type player name and press 'Add Human' or Enter", True, TEXT_LIGHT)
-        screen.blit(draw_sub, (50,170))
-        yy = 300
-        for i, p in enumerate(players_global):
-            lab = f"{i+1}. {p.name} {'(BOT)' if p.is_bot else '(HUMAN)'}"
-            screen.blit(FONT.render(lab, True, TEXT_LIGHT), (50, yy))
-            yy += 32
-
-        time_delta = clock.tick(FPS)
-        GUI_MANAGER.update(time_delta)
-        GUI_MANAGER.draw_ui(screen)
-        pygame.display.update()
-
 # small helper for header rendering reused in rules
 def draw_subtitle(text):
     """ Takes in a text and displays a small subtitle"""
-    sub = SMALL.render(text, True, TEXT_LIGHT)
+    sub = render_text(SMALL, text, TEXT_LIGHT)
     screen.blit(sub, (18, 90))
 
-# ---------- Main gameplay (uses combined GUI and fixed behaviors) ----------
-def play_game_gui():
-    """" Displays the playing GUIs"""
-    if not players_global:
+# ---------- Bot decisions ----------
+SOLVER = None           # dp_solver.py process solving the lookup table on the first run
+
+def bot_hits(state, seat):
+    """ Takes in a game state and a bot's seat, returns True to hit (lookup table once it's loaded, the seat's bot_aggr threshold until then)"""
+    global SOLVER
+    if SOLVER is not None and SOLVER.poll() is not None:
+        SOLVER = None
+        load_stop_table(reload=True)
+    if load_stop_table() is not None:
+        return dp_policy(state, seat)
+    return bot_should_hit(state.players[seat])
+
+# ---------- Main gameplay (renders the engine's GameState) ----------
+def play_game_gui(replay_path=None, resume=None):
+    """"
+    Displays the playing GUIs. Plays a recorded game from replay_path instead, if given,
+    with every decision taken from the log, or carries on with the resume game state.
+    """
+    global RETURN_TO_MENU
+    if not players_global and replay_path is None and resume is None:
         return
-    players = [Player(p.name, is_bot=p.is_bot, bot_aggr=p.bot_aggr) for p in players_global]
-    n = len(players)
-    deck = make_deck()
-    discard = []
-    dealer_idx = 0
-    final_trigger = False
-    triggerer_idx = None
-    final_players_list = []
+    RETURN_TO_MENU = False
+    TIMELINE.resume()
+    init_display()
+    script = None
+    if replay_path is not None:
+        script = replay.Replayer(replay.read(replay_path))
+        state = replay.new_game(script.log.header)
+        script.attach(state)
+        players = state.players
+    elif resume is not None:
+        state = resume
+        players = state.players
+    else:
+        players = [Player(p.name, is_bot=p.is_bot, bot_aggr=p.bot_aggr) for p in players_global]
+        seed = GAME_SEED if GAME_SEED is not None else replay.new_seed()
+        state = GameState(players, rng=random.Random(seed))
+        if REPLAY_DIR:
+            path = os.path.join(REPLAY_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{seed}.f7r")
+            # written through, so a game left with Return (or a crash) still has its log
+            state.recorder = replay.ReplayLog(path, seed, players, flush=True)
+    state.listener = lambda ev: present_event(state, ev)
 
     # UI buttons (simple on-screen)
     hit_btn = Button((280, 640, 220, 60), "Hit (H)", lambda: action_press("hit"))
     stay_btn = Button((520, 640, 220, 60), "Stay (S)", lambda: action_press("stay"))
-    return_btn_ui = Button((WINDOW_WIDTH-200, 20, BUTTON_W, BUTTON_H), "Return", lambda: action_press("return"))
+    return_btn_ui = Button(RETURN_RECT, "Return", lambda: action_press("return"))
     tooltip = ""
     action_queue = []
     def action_press(kind):
         """ Takes in a kind of action and adds it to the action queue"""
         action_queue.append(kind)
 
-    running = True
-    while running:
-        for ev in pygame.event.get():
-            if ev.type == QUIT:
-                pygame.quit(); sys.exit()
-            return_btn_ui.handle_event(ev)
-            if ev.type == MOUSEBUTTONDOWN:
-                if return_btn_ui.rect.collidepoint(ev.pos):
-                    return  # go back to main menu
-        # new round reset per player
-        for p in players:
-            p.reset_for_round()
-
-        # initial dealing (one each)
-        order = [(dealer_idx + i) % n for i in range(n)]
-        for idx in order:
-            ensure_deck_has_cards(deck, discard)
-            if not deck: break
-            drawn = deck.pop()
-            current_global_players[0] = players
-            current_global_players[1] = -1
-            current_global_players[2] = None
-            current_global_deck[0] = deck
-            current_global_discard[0] = discard
-            target_slot = len(players[idx].hand)
-            animate_card_move(drawn, idx, target_slot, DEAL_ANIM_MS)
-            # resolve (face-up card appended inside resolve_draw where appropriate)
-            resolve_draw(idx, drawn, players, deck, discard, idx)
-            pygame.time.delay(60)
-
-        current_idx = (dealer_idx + 1) % n
-        round_should_end = False
-
-        while True:
-            ensure_deck_has_cards(deck, discard)
-            if all(p.busted or p.stayed for p in players):
-                break
-            if round_should_end:
-                break
-
-            if players[current_idx].busted or players[current_idx].stayed:
-                nxt = next_active_index(players, current_idx)
-                if nxt is None: break
-                current_idx = nxt
-                continue
-
-            # draw UI
-            draw_header("Flip 7 — Play")
-            final_info = None
-            if final_trigger:
-                remaining_names = ", ".join([players[i].name for i in final_players_list if not players[i].stayed and not players[i].busted])
-                final_info = f"Triggered by {players[triggerer_idx].name}. Remaining: {remaining_names}"
-            draw_players(players, current_idx, None)
-            draw_deck_info(deck, discard)
-            # draw final info on top (after deck)
-            draw_final_info_box(final_info)
-            # draw buttons
-            hit_btn.draw(screen); stay_btn.draw(screen); return_btn_ui.draw(screen)
-            # tooltip (auto-size to text)
-            if hit_btn.hover:
-                tooltip = "Draw a card (keyboard H). If duplicate number -> bust unless you have Second Chance."
-            elif stay_btn.hover:
-                tooltip = "Bank your current points and end your turn (keyboard S)."
+    # set globals for animations (dealing has no current player)
+    current_global_players[0] = players
+    current_global_players[1] = -1
+    current_global_players[2] = None
+    current_global_deck[:] = [state.deck, None, "Flip 7 — Play"]
+    invalidate_table()
+    drawn_controls = None       # hover state the buttons were last drawn with
+    control_rects = []          # where the buttons / tooltip were drawn over the table
+    saving = SNAPSHOT_PATH and script is None and not HEADLESS
+    saved_turn = None           # state.turns when the table was last saved
+    if resume is None:
+        state.start()
+
+    while state.pending is not None:
+        if RETURN_TO_MENU:
+            return  # Return / Q was used during an animation
+        TIMELINE.resume()   # a skip lasts until the next decision
+        req = state.pending
+        # a new turn boundary: save the table for Resume
+        if saving and req.kind == "act" and state.turns != saved_turn:
+            save_snapshot(state)
+            saved_turn = state.turns
+
+        # target picks: bots choose at random, humans get the overlay
+        if req.kind == "target":
+            if script is not None:
+                action = script.next_action(state)
+                if action is None:
+                    return  # the log was cut short here
+                tgt = action[1]
+            elif players[req.seat].is_bot:
+                tgt = default_target(state)
             else:
-                tooltip = ""
-            if tooltip:
-                txt_surf = SMALL.render(tooltip, True, TEXT_LIGHT)
-                tw, th = txt_surf.get_size()
-                padding = 8
-                tbox = pygame.Rect(280, 600, tw + padding*2, th + padding)
-                pygame.draw.rect(screen, BG_DARK, tbox)
-                pygame.draw.rect(screen, TEXT_LIGHT, tbox, 1)
-                screen.blit(txt_surf, (tbox.x + padding, tbox.y + (padding//2)))
-
-            # set globals for animations
-            current_global_players[0] = players
-            current_global_players[1] = current_idx
-            current_global_players[2] = final_info
-            current_global_deck[0] = deck
-            current_global_discard[0] = discard
-
-            pygame.display.update()
+                tgt = choose_target_ui(players, req.prompt, allowed_indices=req.allowed)
+            with PROFILER.phase("engine"):
+                state.apply(("target", tgt))
+            continue
 
-            # BOT behavior: bots auto-act
-            if players[current_idx].is_bot:
+        current_idx = req.seat
+        # draw UI
+        final_info = None
+        if state.phase == "final":
+            title = "Final Round — Extra Turn"
+            final_info = f"Triggerer: {players[state.triggerer_idx].name}"
+        else:
+            title = "Flip 7 — Play"
+            if state.final_trigger:
+                remaining_names = ", ".join([players[i].name for i in state.final_players_list if not players[i].stayed and not players[i].busted])
+                final_info = f"Triggered by {players[state.triggerer_idx].name}. Remaining: {remaining_names}"
+        odds_player = None if players[current_idx].is_bot else players[current_idx]
+        # turbo draws at most one frame per 1/FPS (a human's turn is always shown)
+        if frame_due() or odds_player is not None:
+            full = draw_table(title, players, current_idx, state.deck, odds_player, final_info)
+            # buttons and tooltip are redrawn only when the table was or a hover changed
+            controls = (hit_btn.hover, stay_btn.hover, return_btn_ui.hover)
+            if full or controls != drawn_controls:
+                with PROFILER.phase("overlays"):
+                    dirty = control_rects
+                    for rect in control_rects:
+                        restore_table(rect)
+                    # draw buttons
+                    hit_btn.draw(screen); stay_btn.draw(screen); return_btn_ui.draw(screen)
+                    control_rects = [hit_btn.rect, stay_btn.rect, return_btn_ui.rect]
+                    # tooltip (auto-size to text)
+                    if hit_btn.hover:
+                        tooltip = "Draw a card (keyboard H). If duplicate number -> bust unless you have Second Chance."
+                    elif stay_btn.hover:
+                        tooltip = "Bank your current points and end your turn (keyboard S)."
+                    else:
+                        tooltip = ""
+                    if tooltip:
+                        txt_surf = render_text(SMALL, tooltip, TEXT_LIGHT)
+                        tw, th = txt_surf.get_size()
+                        padding = 8
+                        tbox = pygame.Rect(280, 600, tw + padding*2, th + padding)
+                        pygame.draw.rect(screen, BG_DARK, tbox)
+                        pygame.draw.rect(screen, TEXT_LIGHT, tbox, 1)
+                        screen.blit(txt_surf, (tbox.x + padding, tbox.y + (padding//2)))
+                        control_rects.append(tbox)
+                drawn_controls = controls
+                update_display(None if full else dirty + control_rects)
+
+        # set globals for animations
+        current_global_players[0] = players
+        current_global_players[1] = current_idx
+        current_global_players[2] = final_info
+        current_global_deck[:] = [state.deck, odds_player, title]
+
+        # BOT behavior: bots auto-act (and a replay plays every seat like a bot)
+        if players[current_idx].is_bot or script is not None:
+            with PROFILER.phase("events"):
                 for ev in pygame.event.get():
                     if ev.type == QUIT:
                         pygame.quit(); sys.exit()
+                    handle_hotkeys(ev)
                     return_btn_ui.handle_event(ev)
                     if ev.type == MOUSEBUTTONDOWN:
                         if return_btn_ui.rect.collidepoint(ev.pos):
                             return  # go back to main menu
-                
-                bot = players[current_idx]
-                pygame.time.delay(BOT_ACTION_DELAY_MS)
-            
-                if bot.busted or bot.stayed:
-                    pass
-                else:
-                    if bot_should_hit(bot):
-                        ensure_deck_has_cards(deck, discard)
-                        if deck:
-                            drawn = deck.pop()
-                            animate_card_move(drawn, current_idx, len(bot.hand), HIT_ANIM_MS)
-                            res = resolve_draw(current_idx, drawn, players, deck, discard, current_idx)
-                            # resolve_draw will show messages (bust/flip7) as needed
-                    else:
-                        bot.compute_current_score()
-                        bot.score_total += bot.score_current
-                        discard.extend(bot.hand); bot.hand = []; bot.hand_face = []; bot.stayed = True
-                        if bot.score_total >= 200 and not final_trigger:
-                            final_trigger = True; triggerer_idx = current_idx
-                            final_players_list = [i for i in range(n) if i != triggerer_idx]
-                            round_should_end = True
-                # advance
-                nxt = next_active_index(players, current_idx)
-                if nxt is None: break
-                current_idx = nxt
-                clock.tick(FPS)
-                continue
-            
-            # HUMAN player: wait for keyboard or click
-            ev = pygame.event.wait()
-            if ev.type == QUIT:
-                pygame.quit(); sys.exit()
-            if ev.type == KEYDOWN:
-                if ev.key == K_q:
-                    return
-                if ev.key == K_h:
-                    action_queue.append("hit")
-                if ev.key == K_s:
-                    action_queue.append("stay")
-            # button hover/click
-            hit_btn.handle_event(ev)
-            stay_btn.handle_event(ev)
-            return_btn_ui.handle_event(ev)
-            if ev.type == MOUSEBUTTONDOWN:
-                if return_btn_ui.rect.collidepoint(ev.pos):
-                    return  # go back to main menu
-
-            # Handle queued actions simply: hits and stays. FLIP3 is now automatic inside resolve_draw.
-            if action_queue:
-                act = action_queue.pop(0)
-                if act == "hit":
-                    ensure_deck_has_cards(deck, discard)
-                    if deck:
-                        drawn = deck.pop()
-                        animate_card_move(drawn, current_idx, len(players[current_idx].hand), HIT_ANIM_MS)
-                        res = resolve_draw(current_idx, drawn, players, deck, discard, current_idx)
-                        if res == "pending_flip3":
-                            # old state removed; this should not happen now
-                            pass
-                        else:
-                            if players[current_idx].score_total >= 200 and not final_trigger:
-                                final_trigger = True; triggerer_idx = current_idx
-                                final_players_list = [i for i in range(n) if i != triggerer_idx]
-                                round_should_end = True
-                            if players[current_idx].busted or players[current_idx].stayed:
-                                nxt = next_active_index(players, current_idx)
-                                if nxt is None: break
-                                current_idx = nxt
-                            else:
-                                nxt = next_active_index(players, current_idx)
-                                if nxt is None: break
-                                current_idx = nxt
-
-                elif act == "stay":
-                    pcur = players[current_idx]
-                    pcur.compute_current_score()
-                    pcur.score_total += pcur.score_current
-                    discard.extend(pcur.hand); pcur.hand = []; pcur.hand_face = []; pcur.stayed = True
-                    if pcur.score_total >= 200 and not final_trigger:
-                        final_trigger = True; triggerer_idx = current_idx
-                        final_players_list = [i for i in range(n) if i != triggerer_idx]
-                        round_should_end = True
-                    nxt = next_active_index(players, current_idx)
-                    if nxt is None: break
-                    current_idx = nxt
-
-            clock.tick(FPS)
-
-        # end of round handling (final trigger / rotate dealer)
-        if not final_trigger:
-            dealer_idx = (dealer_idx + 1) % n
-            ensure_deck_has_cards(deck, discard)
-            continue
-        else:
-            if not final_players_list:
-                announce_winner(players[triggerer_idx]); return
-            # final extra turns for each player (other than triggerer)
-            for idx in final_players_list:
-                if idx == triggerer_idx: continue
-                players[idx].reset_for_round()
-                ensure_deck_has_cards(deck, discard)
-                if deck:
-                    drawn = deck.pop()
-                    animate_card_move(drawn, idx, len(players[idx].hand), DEAL_ANIM_MS)
-                    resolve_draw(idx, drawn, players, deck, discard, idx)
-                while not (players[idx].busted or players[idx].stayed):
-                    draw_header("Final Round — Extra Turn")
-                    draw_players(players, idx, None)
-                    draw_deck_info(deck, discard)
-                    draw_final_info_box(f"Triggerer: {players[triggerer_idx].name}")
-                    hit_btn.draw(screen)
-                    stay_btn.draw(screen)
-                    pygame.display.update()
-                    if players[idx].is_bot:
-                        pygame.time.delay(BOT_ACTION_DELAY_MS)
-                        if bot_should_hit(players[idx]):
-                            ensure_deck_has_cards(deck, discard)
-                            if deck:
-                                d = deck.pop()
-                                animate_card_move(d, idx, len(players[idx].hand), HIT_ANIM_MS)
-                                resolve_draw(idx, d, players, deck, discard, idx)
-                        else:
-                            players[idx].compute_current_score()
-                            players[idx].score_total += players[idx].score_current
-                            discard.extend(players[idx].hand); players[idx].hand = []; players[idx].hand_face = []; players[idx].stayed = True
-                    else:
-                        for ev in pygame.event.get():
-                            # HUMAN player: wait for keyboard or click
-                            if ev.type == QUIT:
-                                pygame.quit(); sys.exit()
-                            if ev.type == KEYDOWN:
-                                if ev.key == K_h:
-                                    ensure_deck_has_cards(deck, discard)
-                                    if deck:
-                                        d = deck.pop()
-                                        animate_card_move(d, idx, len(players[idx].hand), HIT_ANIM_MS)
-                                        resolve_draw(idx, d, players, deck, discard, idx)
-                                if ev.key == K_s:
-                                    players[idx].compute_current_score()
-                                    players[idx].score_total += players[idx].score_current
-                                    discard.extend(players[idx].hand); players[idx].hand = []; players[idx].hand_face = []; players[idx].stayed = True
-                                elif ev.key == K_q:
-                                    return
-                            # button hover/click
-                            hit_btn.handle_event(ev)
-                            stay_btn.handle_event(ev)
-                            return_btn_ui.handle_event(ev)
-                            if ev.type == MOUSEBUTTONDOWN:
-                                if return_btn_ui.rect.collidepoint(ev.pos):
-                                    return  # go back to main menu
-                            
-                    clock.tick(FPS)
-
-            # determine winner (or continue on tie)
-            top = max(p.score_total for p in players)
-            winners = [p for p in players if p.score_total == top]
-            if len(winners) == 1:
-                announce_winner(winners[0]); return
+            wait(BOT_ACTION_DELAY_MS)
+            if RETURN_TO_MENU:
+                return
+            if script is not None:
+                action = script.next_action(state)
+                if action is None:
+                    return  # the log was cut short here
             else:
-                final_trigger = False
-                triggerer_idx = None
-                final_players_list = []
-                dealer_idx = (dealer_idx + 1) % n
-                ensure_deck_has_cards(deck, discard)
-                continue
+                action = "hit" if bot_hits(state, current_idx) else "stay"
+            with PROFILER.phase("engine"):
+                state.apply(action)
+            tick()
+            continue
+
+        # HUMAN player: sleep until a key or the mouse does something; the table
+        # and buttons above are only redrawn if that changed them
+        events = wait_events()
+        if not events and PROFILER.enabled:
+            update_display([])      # keeps the perf HUD current
+        with PROFILER.phase("events"):
+            for ev in events:
+                if ev.type == QUIT:
+                    pygame.quit(); sys.exit()
+                handle_hotkeys(ev)
+                if ev.type == KEYDOWN:
+                    if ev.key == K_q:
+                        return
+                    if ev.key == K_h:
+                        action_queue.append("hit")
+                    if ev.key == K_s:
+                        action_queue.append("stay")
+                # button hover/click
+                hit_btn.handle_event(ev)
+                stay_btn.handle_event(ev)
+                return_btn_ui.handle_event(ev)
+                if ev.type == MOUSEBUTTONDOWN:
+                    if return_btn_ui.rect.collidepoint(ev.pos):
+                        return  # go back to main menu
+
+        # Handle queued actions: hits and stays. Card effects are resolved by the engine.
+        if action_queue:
+            act = action_queue.pop(0)
+            if act in ("hit", "stay"):
+                with PROFILER.phase("engine"):
+                    state.apply(act)
+
+    if saving:
+        snapshot.remove(SNAPSHOT_PATH)
+    announce_winner(players[state.winner])
+    return players[state.winner]
 
 # ---------- Rules screen ----------
 def show_rules():
     """Show the rules GUI"""
+    import pygame_gui
+    init_gui_manager()
     showing = True
     return_btn = pygame_gui.elements.UIButton(relative_rect=pygame.Rect((WINDOW_WIDTH-200,20),(BUTTON_W,BUTTON_H)), text="Return", manager=GUI_MANAGER)
+    drawn = None        # hover / pressed state of the button when last drawn
     while showing:
-        for ev in pygame.event.get():
+        GUI_MANAGER.update(clock.tick())
+        shown = (return_btn.hovered, return_btn.held, PROFILER.enabled)
+        if shown != drawn or PROFILER.enabled:
+            screen.fill(BG_DARK)
+            draw_header("Flip 7 Rules")
+            draw_subtitle("H = Hit (keyboard)  S = Stay (keyboard)  Q = Quit to Menu  T = Turbo  Space = Skip animation")
+            lines = [
+                "Deck: 1x0, 1x1, 2x2, 3x3 ... 12x12.",
+                "Modifiers: +2, +4, +6, +8, +10 and X2 (one each).",
+                "Actions: Flip Three, Freeze, Second Chance (3 each).",
+                "",
+                "> On your turn: Hit to draw or Stay to bank your points.",
+                "> If you draw a duplicate number card you bust (score 0)",
+                "  unless you have Second Chance.",
+                "",
+                "> [Flip 7] 7 unique number cards ends the round and gives +15 bonus",
+                "  (you bank points).",
+                "> [Flip3] draw next 3 cards immediately (can cascade).",
+                "> [Freeze] choose a target player to force them to Stay and",
+                "  they bank their current points.",
+                "> [Second Chance] keep until it prevents one bust and is consumed.",
+                "",
+                "Scoring: (sum numbers) * X2(if present) + modifiers.",
+                "> First to reach >=200 triggers final round and",
+                "  each other player gets one final turn."
+            ]
+            x,y = 50, 160
+            for l in lines:
+                screen.blit(render_text(SMALL, l, TEXT_LIGHT), (x, y)); y+=26
+            GUI_MANAGER.draw_ui(screen)
+            update_display()
+            drawn = shown
+
+        for ev in wait_events():
             if ev.type == QUIT:
                 pygame.quit(); sys.exit()
             if ev.type == pygame_gui.UI_BUTTON_PRESSED and ev.ui_element == return_btn:
-                return_btn.kill(); GUI_MANAGER.update(clock.tick(FPS)); GUI_MANAGER.draw_ui(screen); showing = False
+                return_btn.kill(); GUI_MANAGER.update(tick()); GUI_MANAGER.draw_ui(screen); showing = False
             GUI_MANAGER.process_events(ev)
-        screen.fill(BG_DARK)
-        draw_header("Flip 7 Rules")
-        draw_subtitle("H = Hit (keyboard)  S = Stay (keyboard)  Q = Quit to Menu")
-        lines = [
-            "Deck: 1x0, 1x1, 2x2, 3x3 ... 12x12.",
-            "Modifiers: +2, +4, +6, +8, +10 and X2 (one each).",
-            "Actions: Flip Three, Freeze, Second Chance (3 each).",
-            "",
-            "> On your turn: Hit to draw or Stay to bank your points.",
-            "> If you draw a duplicate number card you bust (score 0)",
-            "  unless you have Second Chance.",
-            "",
-            "> [Flip 7] 7 unique number cards ends the round and gives +15 bonus",
-            "  (you bank points).",
-            "> [Flip3] draw next 3 cards immediately (can cascade).",
-            "> [Freeze] choose a target player to force them to Stay and",
-            "  they bank their current points.",
-            "> [Second Chance] keep until it prevents one bust and is consumed.",
-            "",
-            "Scoring: (sum numbers) * X2(if present) + modifiers.",
-            "> First to reach >=200 triggers final round and",
-            "  each other player gets one final turn."
-        ]
-        x,y = 50, 160
-        for l in lines:
-            screen.blit(SMALL.render(l, True, TEXT_LIGHT), (x, y)); y+=26
-        time_delta = clock.tick(FPS)
-        GUI_MANAGER.update(time_delta)
-        GUI_MANAGER.draw_ui(screen)
-        pygame.display.update()
 
 # ---------- Main menu ----------
 def start_menu():
     """ Initialize the start of the game menu"""
+    import pygame_menu
+    init_display()
     menu = pygame_menu.Menu("Flip 7", WINDOW_WIDTH, WINDOW_HEIGHT, theme=pygame_menu.themes.THEME_BLUE)
+
+    def refresh_resume():
+        """ Shows Resume only while a game is saved"""
+        if SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+            resume_btn.show()
+        else:
+            resume_btn.hide()
+
+    def then_refresh(show):
+        """ Takes in a screen function, returns a callback showing it and then refreshing Resume"""
+        def run():
+            show()
+            refresh_resume()
+        return run
+
+    resume_btn = menu.add.button("Resume", then_refresh(resume_game))
     # combined Start / Setup: Setup opens the in-app setup which then starts game
     menu.add.button("Rules", show_rules)
-    menu.add.button("Setup / Start", setup_players_gui)
+    menu.add.button("Setup / Start", then_refresh(setup_players_gui))
     menu.add.button("Quit", pygame_menu.events.EXIT)
+    refresh_resume()
     menu.mainloop(screen)
 
+def main(argv=None):
+    """ Command line entry point: the menu, with --headless a bot-only game on the dummy video driver, or with --replay a recorded game"""
+    global HEADLESS, TRACE_PATH, GAME_SEED, REPLAY_DIR, PLAYBACK_SPEED
+    ap = argparse.ArgumentParser(description="Flip 7")
+    ap.add_argument("--headless", action="store_true", help="no window or waits: play a bot-only game and print the result")
+    ap.add_argument("--bots", type=int, default=3, help="number of bots in a headless game")
+    ap.add_argument("--turbo", action="store_true", help="start in turbo mode: no animations or pauses (T toggles)")
+    ap.add_argument("--profile", action="store_true", help="start with the frame profiler and HUD on (F3 toggles)")
+    ap.add_argument("--trace", metavar="FILE", help="record frame phases and write them to FILE as a Chrome/Perfetto trace")
+    ap.add_argument("--seed", type=int, help="deal games from this seed (each replay log's name ends with its seed)")
+    ap.add_argument("--replay", metavar="FILE", help="play a recorded game back, checking it against the log")
+    ap.add_argument("--speed", type=float, default=1.0, help="animation and pause speed multiplier (0: instant)")
+    ap.add_argument("--replay-dir", default=REPLAY_DIR, help="where games are recorded ('' to not record)")
+    args = ap.parse_args(argv)
+    GAME_SEED = args.seed
+    REPLAY_DIR = args.replay_dir or None
+    if args.turbo or args.speed <= 0:
+        set_delay_preset('T')
+    else:
+        PLAYBACK_SPEED = args.speed
+    if args.profile or args.trace:
+        PROFILER.enable(trace=bool(args.trace))
+    if args.trace:
+        TRACE_PATH = args.trace
+        atexit.register(save_trace)     # quitting from inside a game goes through sys.exit
+    if not args.headless and not args.replay:
+        start_menu()
+        return
+    HEADLESS = args.headless
+    if not args.replay:
+        players_global[:] = [Player(f"Bot_{i+1}", is_bot=True) for i in range(args.bots)]
+    start = time.perf_counter()
+    try:
+        winner = play_game_gui(args.replay)
+    except replay.ReplayMismatch as e:
+        print(f"{args.replay} does not replay: {e}")
+        sys.exit(1)
+    if winner is None:
+        print(f"{args.replay} stops before the end of the game; it matched up to there")
+    else:
+        print(f"{winner.name} won with {winner.score_total} points ({time.perf_counter() - start:.2f}s)"
+              + (f", as recorded in {args.replay}" if args.replay else ""))
+    if PROFILER.enabled:
+        print("\n".join(PROFILER.hud_lines()))
+    save_trace()
+
 if __name__ == "__main__":
-    start_menu()
+    main()
@@ -0,0 +1,242 @@
+# Time-budgeted Monte Carlo Tree Search bot.
+#
+# Each decision searches for a fixed wall-clock budget. Every iteration
+# determinizes the table (reshuffles the unseen draw pile), walks a tree of
+# our own decisions with UCB1 (opponents play the rollout policy), expands
+# one new node and plays the rest of the game out headless. The reward is 1
+# if we end up winning the game, so totals, the 200 point trigger and who is
+# still active all count. Hit/stay and FREEZE / FLIP3 / SECOND targets are
+# searched the same way.
+#
+# A few dozen whole-game rollouts can't tell close hit/stay calls apart, so
+# with a prior policy (e.g. bots.dp_policy) the search only overrides the
+# prior's hit/stay answer when its win rate is clearly better.
+#
+# With workers > 1 every worker grows its own tree from a different seed
+# for the same budget and the root statistics are summed (root parallelism).
+#
+#   python mcts.py --budget 50 --workers 4 --decisions 40
+
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import GameState, Player, default_target, threshold_policy
+
+DEFAULT_BUDGET_MS = 50
+EXPLORATION = 0.7      # UCB1 constant (rewards are win = 1, loss = 0)
+OVERRIDE_Z = 2.0       # standard errors by which search must beat the prior's pick
+
+class Node:
+    # availability counts how often the action was legal when its parent was
+    # visited; with determinization it stands in for the parent's visit count
+    __slots__ = ("visits", "wins", "avail", "children")
+
+    def __init__(self):
+        self.visits = 0
+        self.wins = 0.0
+        self.avail = 0
+        self.children = {}
+
+def legal_actions(req):
+    """ Takes in a pending Decision, returns the actions the search considers for it"""
+    if req.kind == "act":
+        return ("hit", "stay")
+    return tuple(("target", i) for i in req.allowed)
+
+def rollout(sim, rollout_policy=threshold_policy):
+    """ Plays a game out with rollout_policy for every seat and random targets, returns the winner's index"""
+    while sim.pending is not None:
+        req = sim.pending
+        if req.kind == "target":
+            sim.apply(("target", default_target(sim)))
+        else:
+            sim.apply("hit" if rollout_policy(sim, req.seat) else "stay")
+    return sim.winner
+
+def search(state, seat, budget_s, seed=None, c=EXPLORATION, rollout_policy=threshold_policy):
+    """
+    Takes in a table waiting on seat's decision and a time budget in seconds, runs
+    determinized UCT until the budget is spent. Returns ({action: (visits, wins)} for
+    the root, number of rollouts).
+    """
+    deadline = time.perf_counter() + budget_s
+    rng = random.Random(seed)
+    root = Node()
+    state = state.copy()                 # search from our own copy (replayed once if mid-card)
+    rollouts = 0
+    while True:
+        sim = state.copy(rng=random.Random(rng.getrandbits(64)))
+        sim.searchable = False
+        sim.rng.shuffle(sim.deck.cards)  # determinize: we can't see the draw order
+        node = root
+        path = []
+        while sim.pending is not None:
+            req = sim.pending
+            if req.seat != seat:
+                if req.kind == "target":
+                    sim.apply(("target", default_target(sim)))
+                else:
+                    sim.apply("hit" if rollout_policy(sim, req.seat) else "stay")
+                continue
+            actions = legal_actions(req)
+            untried = [a for a in actions if a not in node.children]
+            for a in actions:
+                if a in node.children:
+                    node.children[a].avail += 1
+            if untried:
+                a = rng.choice(untried)
+                child = node.children[a] = Node()
+                child.avail = 1
+                sim.apply(a)
+                path.append(child)
+                break
+            best = None
+            best_ucb = -1.0
+            for a in actions:
+                ch = node.children[a]
+                ucb = ch.wins / ch.visits + c * math.sqrt(math.log(ch.avail) / ch.visits)
+                if ucb > best_ucb:
+                    best, best_ucb = a, ucb
+            sim.apply(best)
+            node = node.children[best]
+            path.append(node)
+        reward = 1.0 if rollout(sim, rollout_policy) == seat else 0.0
+        for n in path:
+            n.visits += 1
+            n.wins += reward
+        rollouts += 1
+        if time.perf_counter() >= deadline:
+            break
+    return {a: (ch.visits, ch.wins) for a, ch in root.children.items()}, rollouts
+
+class MCTSBot:
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS, workers=1, c=EXPLORATION, rollout_policy=threshold_policy,
+                 prior=None, seed=None):
+        """
+        Takes in the per-decision time budget in ms, the number of worker processes
+        (1 searches in this process), the UCB1 constant, the policy used for rollouts
+        and opponents, an optional prior hit/stay policy and an optional seed.
+        """
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.c = c
+        self.rollout_policy = rollout_policy
+        self.prior = prior
+        self.rng = random.Random(seed)
+        self.pool = None
+        self.decisions = 0
+        self.rollouts = 0
+        self.search_s = 0.0
+        self.last = {}            # root statistics of the last decision
+
+    def __call__(self, state, seat):
+        """ Hit/stay policy: takes in a game state and seat, returns True to hit"""
+        best = self.decide(state, seat)
+        if self.prior is None:
+            return best == "hit"
+        pick = "hit" if self.prior(state, seat) else "stay"
+        if best != pick and pick in self.last:
+            (v1, w1), (v0, w0) = self.last[best], self.last[pick]
+            r1, r0 = w1 / v1, w0 / v0
+            se = math.sqrt(r1 * (1 - r1) / v1 + r0 * (1 - r0) / v0)
+            if r1 - r0 > OVERRIDE_Z * se:
+                return best == "hit"
+        return pick == "hit"
+
+    def choose_target(self, state):
+        """ Takes in a game state waiting on one of our targets, returns the chosen index"""
+        if not state.can_copy():
+            return default_target(state)      # table wasn't searchable when the card was drawn
+        return self.decide(state, state.pending.seat)[1]
+
+    def decide(self, state, seat):
+        """ Takes in a game state and the deciding seat, searches for the budget and returns the most visited action"""
+        start = time.perf_counter()
+        budget_s = self.budget_ms / 1000
+        if self.workers == 1:
+            stats, n = search(state, seat, budget_s, self.rng.getrandbits(64), self.c, self.rollout_policy)
+        else:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            futures = [self.pool.submit(search, state, seat, budget_s, self.rng.getrandbits(64), self.c, self.rollout_policy)
+                       for _ in range(self.workers)]
+            stats, n = {}, 0
+            for fut in futures:
+                part, k = fut.result()
+                n += k
+                for a, (v, w) in part.items():
+                    v0, w0 = stats.get(a, (0, 0.0))
+                    stats[a] = (v0 + v, w0 + w)
+        self.decisions += 1
+        self.rollouts += n
+        self.search_s += time.perf_counter() - start
+        self.last = stats
+        return max(stats, key=lambda a: stats[a][0])
+
+    @property
+    def rollouts_per_s(self):
+        """ Rollouts per second of wall-clock search time so far"""
+        return self.rollouts / self.search_s if self.search_s else 0.0
+
+    def close(self):
+        """ Shuts down the worker pool"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point: plays games with one MCTS bot against threshold bots, reports rollouts/s"""
+    ap = argparse.ArgumentParser(description="Flip 7 MCTS bot benchmark")
+    ap.add_argument("--budget", type=int, default=DEFAULT_BUDGET_MS, help="ms per decision")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--games", type=int, default=1)
+    ap.add_argument("--decisions", type=int, default=0, help="stop after this many MCTS decisions (0 = play the games out)")
+    ap.add_argument("--prior", choices=("dp", "none"), default="dp", help="hit/stay prior the search has to beat")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    prior = None
+    if args.prior == "dp":
+        from bots import dp_policy
+        prior = dp_policy
+    bot = MCTSBot(args.budget, args.workers, prior=prior, seed=args.seed)
+    wins = games = 0
+    try:
+        for g in range(args.games):
+            players = [Player("MCTS" if i == 0 else f"Bot_{i+1}", is_bot=True) for i in range(args.players)]
+            state = GameState(players, rng=random.Random(f"mcts:{args.seed}:{g}"))
+            state.searchable = True
+            state.start()
+            while state.pending is not None:
+                if args.decisions and bot.decisions >= args.decisions:
+                    break
+                req = state.pending
+                if req.seat == 0 and req.kind == "target":
+                    state.apply(("target", bot.choose_target(state)))
+                elif req.seat == 0:
+                    state.apply("hit" if bot(state, 0) else "stay")
+                elif req.kind == "target":
+                    state.apply(("target", default_target(state)))
+                else:
+                    state.apply("hit" if threshold_policy(state, req.seat) else "stay")
+            if state.winner is not None:
+                games += 1
+                wins += state.winner == 0
+            if args.decisions and bot.decisions >= args.decisions:
+                break
+    finally:
+        bot.close()
+    per = bot.search_s / max(1, bot.decisions) * 1000
+    print(f"{bot.decisions} decisions, {bot.rollouts:,} rollouts, {bot.rollouts_per_s:,.0f} rollouts/s "
+          f"on {args.workers} worker(s), {per:.1f} ms/decision")
+    if games:
+        print(f"MCTS won {wins}/{games} games against {args.players - 1} threshold bots")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Frame profiler for the pygame front end.
+#
+# fun_game.tick() closes a frame; code inside a frame is split into named
+# phases with `with PROFILER.phase("draw_players"):` or the @profiled
+# decorator. Phase times are exclusive: a nested phase pauses its parent,
+# so a bust animation started from inside the engine step counts as drawing,
+# not engine time. A phase left open across a tick() is split between the
+# frames.
+#
+# "tick", "wait" and "idle" are time spent sleeping or waiting for input;
+# the rest of a frame is work. A frame whose work overruns the 1/FPS
+# budget counts as dropped.
+#
+# Disabled (the default), phase() hands back one shared no-op object and
+# end_frame() returns straight away, so the hooks cost a method call each.
+
+import json
+import time
+from collections import deque
+from functools import wraps
+
+SLEEP_PHASES = ("tick", "wait", "idle")
+HUD_WINDOW = 300        # frames the HUD statistics cover
+HUD_REFRESH_S = 0.25    # the HUD text is re-rendered this often, not every frame
+
+class _NullPhase:
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullPhase()
+
+class _Phase:
+    __slots__ = ("prof", "name")
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+    def __enter__(self):
+        self.prof._push(self.name)
+        return self
+    def __exit__(self, *exc):
+        self.prof._pop()
+        return False
+
+def percentile(values, q):
+    """ Takes in a list of numbers and a fraction q, returns the q-th percentile (nearest rank)"""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+class FrameProfiler:
+    def __init__(self, fps=60, window=HUD_WINDOW):
+        """ Takes in the target frame rate and how many recent frames the HUD statistics cover"""
+        self.enabled = False
+        self.budget_ms = 1000.0 / fps
+        self.recent = deque(maxlen=window)   # (interval ms, work ms, {phase: ms}) per frame
+        self.frames = 0
+        self.dropped = 0
+        self.trace = None                    # list of Chrome trace events while tracing
+        self._stack = []                     # open phases: [name, resumed at, entered at]
+        self._times = {}
+        self._frame_start = None
+        self._hud = None                     # (rendered box, built at)
+        self.counters = {}                   # HUD label -> callable returning a short status line
+
+    # ----- switching -----
+    def enable(self, on=True, trace=False):
+        """ Turns recording on/off; trace=True also keeps every phase span for dump_trace()"""
+        self.enabled = on
+        if trace and self.trace is None:
+            self.trace = []
+        self._stack = []
+        self._times = {}
+        self._frame_start = time.perf_counter() if on else None
+
+    def toggle(self):
+        """ Flips recording on/off (keeps tracing if it was on), returns the new state"""
+        self.enable(not self.enabled)
+        return self.enabled
+
+    # ----- recording -----
+    def phase(self, name):
+        """ Takes in a phase name, returns a context manager timing the block under it"""
+        if not self.enabled:
+            return _NULL
+        return _Phase(self, name)
+
+    def _push(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            top = self._stack[-1]
+            self._times[top[0]] = self._times.get(top[0], 0.0) + now - top[1]
+        self._stack.append([name, now, now])
+
+    def _pop(self):
+        now = time.perf_counter()
+        if not self._stack:
+            return
+        name, resumed, entered = self._stack.pop()
+        self._times[name] = self._times.get(name, 0.0) + now - resumed
+        if self._stack:
+            self._stack[-1][1] = now
+        if self.trace is not None:
+            self.trace.append({"name": name, "ph": "X", "ts": entered * 1e6, "dur": (now - entered) * 1e6,
+                               "pid": 0, "tid": 0})
+
+    def end_frame(self):
+        """ Closes the current frame and starts the next one"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._stack:
+            top = self._stack[-1]
+            self._times[top[0]] = self._times.get(top[0], 0.0) + now - top[1]
+            top[1] = now
+        interval = (now - self._frame_start) * 1000
+        times = {name: t * 1000 for name, t in self._times.items()}
+        work = interval - sum(times.get(name, 0.0) for name in SLEEP_PHASES)
+        self.recent.append((interval, work, times))
+        self.frames += 1
+        if work > self.budget_ms:
+            self.dropped += 1
+        if self.trace is not None:
+            self.trace.append({"name": "frame", "ph": "X", "ts": self._frame_start * 1e6, "dur": interval * 1000,
+                               "pid": 0, "tid": 1, "args": {"work_ms": round(work, 3)}})
+        self._times = {}
+        self._frame_start = now
+
+    # ----- reporting -----
+    def stats(self):
+        """ Returns FPS, p50/p99 work ms, dropped frames and mean ms per phase over the recent frames"""
+        if not self.recent:
+            return {"fps": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "dropped": self.dropped, "frames": self.frames, "phases": {}}
+        intervals = [f[0] for f in self.recent]
+        works = [f[1] for f in self.recent]
+        phases = {}
+        for _, _, times in self.recent:
+            for name, t in times.items():
+                phases[name] = phases.get(name, 0.0) + t
+        n = len(self.recent)
+        return {"fps": 1000 * n / sum(intervals) if sum(intervals) else 0.0,
+                "p50_ms": percentile(works, 0.5), "p99_ms": percentile(works, 0.99),
+                "dropped": self.dropped, "frames": self.frames,
+                "phases": {name: t / n for name, t in sorted(phases.items(), key=lambda kv: -kv[1])}}
+
+    def hud_lines(self):
+        """ Returns the HUD text lines"""
+        s = self.stats()
+        lines = [f"FPS {s['fps']:5.1f}  work p50 {s['p50_ms']:.1f} ms  p99 {s['p99_ms']:.1f} ms",
+                 f"dropped {s['dropped']}/{s['frames']} frames (> {self.budget_ms:.1f} ms)"]
+        for name, t in list(s["phases"].items())[:5]:
+            lines.append(f"  {name:<15}{t:6.2f} ms")
+        for name, counter in self.counters.items():
+            lines.append(f"{name}: {counter()}")
+        return lines
+
+    def draw_hud(self, surface, font, bottomleft=(8, -8)):
+        """ Takes in a surface and font, draws the HUD box with its bottom-left corner at bottomleft (negative y counts from the bottom), returns its rect"""
+        now = time.perf_counter()
+        if self._hud is None or now - self._hud[1] >= HUD_REFRESH_S:
+            self._hud = (self._render_hud(font), now)
+        box = self._hud[0]
+        x, y = bottomleft
+        if y < 0:
+            y += surface.get_height()
+        return surface.blit(box, (x, y - box.get_height()))
+
+    def _render_hud(self, font):
+        """ Takes in a font, returns the HUD box as a surface"""
+        import pygame
+        rendered = [font.render(line, True, (240, 240, 120)) for line in self.hud_lines()]
+        w = max(r.get_width() for r in rendered) + 12
+        h = sum(r.get_height() for r in rendered) + 8
+        box = pygame.Surface((w, h))
+        box.fill((0, 0, 0))
+        y = 4
+        for r in rendered:
+            box.blit(r, (6, y))
+            y += r.get_height()
+        return box
+
+    def dump_trace(self, path):
+        """ Writes the recorded spans as a Chrome/Perfetto trace (chrome://tracing, ui.perfetto.dev), returns the event count"""
+        events = self.trace or []
+        meta = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "phases"}},
+                {"name": "thread_name", "ph": "M", "pid": 0, "tid": 1, "args": {"name": "frames"}}]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms", "otherData": self.stats()}, f)
+        return len(events)
+
+def profiled(prof, name):
+    """ Decorator timing every call of the function under phase name of prof"""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            if not prof.enabled:
+                return fn(*args, **kwargs)
+            with _Phase(prof, name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
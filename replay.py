@@ -0,0 +1,328 @@
+# Compact binary replay logs.
+#
+# A log holds everything needed to play a game again: the seed its RNG
+# started from, the seats, and every card dealt or drawn and every decision
+# (hit, stay, target) in the order they happened. The engine writes it
+# through GameState.recorder, so any driver (the window, --headless, a
+# simulator) can record. The file is append-only: the header goes first,
+# records are appended as the game runs and an end record with the winner
+# and every score_total closes it. A log cut short (Return to menu, a crash)
+# still replays up to where it stops.
+#
+# Replaying starts a game from the seed, feeds it the recorded decisions and
+# checks every card the engine draws, every decision and the final scores
+# against the log:
+#
+#   python replay.py replays/*.f7r              (instantly, through the engine)
+#   python fun_game.py --replay FILE --speed 2  (watched, at any speed)
+#
+# Layout (little endian):
+#   header   magic b"F7RL", version, 64-bit seed, seat count,
+#            then per seat: bot flag, name length, UTF-8 name
+#   record   one byte op << 5 | seat, then for card and target ops one more
+#            byte: the card, or the target (255 = none)
+#   end      op END with the winner as its seat, then a 32-bit score_total per seat
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from engine import CARD_MOVES, GameState, Player, default_target
+
+MAGIC = b"F7RL"
+VERSION = 1
+HEADER = struct.Struct("<4sBQB")
+SCORE = struct.Struct("<I")
+MAX_SEATS = 31
+NO_TARGET = 255
+
+# ops (3 bits); the card moves come first, in CARD_MOVES order
+DEAL, HIT_CARD, FLIP3_CARD, HIT, STAY, TARGET, RANDOM_TARGET, END = range(8)
+CARD_OPS = dict(zip(CARD_MOVES, (DEAL, HIT_CARD, FLIP3_CARD)))
+OP_NAMES = ("deal", "hit card", "flip3 card", "hit", "stay", "target", "random target", "end")
+
+Header = namedtuple("Header", "seed seats")          # seats: [(name, is_bot)]
+Record = namedtuple("Record", "op seat arg")         # arg: card / target, None for hit and stay
+Replay = namedtuple("Replay", "header records end")  # end: (winner, [score_total]) or None if cut short
+
+def new_seed():
+    """ Returns a fresh 64-bit game seed"""
+    return random.SystemRandom().getrandbits(64)
+
+def action_record(req, action, random_pick=False):
+    """ Takes in a pending Decision, the action sent for it and whether default_target drew it, returns its Record"""
+    if req.kind == "target":
+        tgt = action[1]
+        return Record(RANDOM_TARGET if random_pick else TARGET, req.seat, NO_TARGET if tgt is None else tgt)
+    return Record(HIT if action == "hit" else STAY, req.seat, None)
+
+def describe(rec):
+    """ Takes in a Record, returns it as text"""
+    if rec.arg is None:
+        return f"seat {rec.seat} {OP_NAMES[rec.op]}"
+    arg = "none" if rec.op in (TARGET, RANDOM_TARGET) and rec.arg == NO_TARGET else rec.arg
+    return f"seat {rec.seat} {OP_NAMES[rec.op]} {arg}"
+
+# ---------- Writing ----------
+class ReplayLog:
+    """ Recorder appending a game to a replay file, set as GameState.recorder"""
+
+    def __init__(self, path, seed, players, flush=False):
+        """
+        Takes in the log path, the seed the game's RNG started from and its players.
+        flush=True writes the records out at every decision (for games a crash or Return
+        may cut short); otherwise the whole file is written when the game ends.
+        """
+        if len(players) > MAX_SEATS:
+            raise ValueError(f"a replay log holds at most {MAX_SEATS} seats")
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.players = players
+        self._random_pick = False
+        self._buf = bytearray(HEADER.pack(MAGIC, VERSION, seed, len(players)))
+        for p in players:
+            name = p.name.encode()[:255]
+            self._buf += bytes((int(p.is_bot), len(name))) + name
+        self.size = 0           # bytes written out so far
+        self._f = None
+        if flush:
+            self._f = open(path, "wb", buffering=0)
+            self._spill()
+
+    @classmethod
+    def resume(cls, path, players, size):
+        """
+        Takes in the path of a log written with flush=True, the game's players and the
+        log size at the position the game resumes from (see flush()). Cuts off anything
+        recorded after that and returns a log appending from there.
+        """
+        log = cls.__new__(cls)
+        log.path = path
+        log.players = players
+        log._random_pick = False
+        log._buf = bytearray()
+        log._f = open(path, "r+b", buffering=0)
+        log._f.truncate(size)
+        log._f.seek(size)
+        log.size = size
+        return log
+
+    def _spill(self):
+        """ Writes out the records buffered so far"""
+        self._f.write(self._buf)
+        self.size += len(self._buf)
+        self._buf.clear()
+
+    def flush(self):
+        """ Writes out the records buffered so far (flush=True logs only), returns the log's size in bytes"""
+        self._spill()
+        return self.size
+
+    def event(self, ev):
+        """ Takes in an engine event, records card moves and closes the log at game over"""
+        op = CARD_OPS.get(ev.kind)
+        if op is not None:
+            self._buf += bytes((op << 5 | ev.seat, ev.card))
+        elif ev.kind == "game_over":
+            self._buf.append(END << 5 | ev.seat)
+            for p in self.players:
+                self._buf += SCORE.pack(p.score_total)
+            self.close()
+
+    def random_pick(self):
+        """ Marks the next target as drawn by default_target from the game's RNG"""
+        self._random_pick = True
+
+    def action(self, req, action):
+        """ Takes in a pending Decision and the action sent for it, records it"""
+        rec = action_record(req, action, self._random_pick)
+        self._random_pick = False
+        self._buf.append(rec.op << 5 | rec.seat)
+        if rec.arg is not None:
+            self._buf.append(rec.arg)
+        if self._f is not None:
+            self._spill()
+
+    def close(self):
+        """ Writes out what is left and closes the file (a log closed before game over replays as cut short)"""
+        if self._f is None:
+            self._f = open(self.path, "wb")
+        if not self._f.closed:
+            self._spill()
+            self._f.close()
+
+# ---------- Reading ----------
+def read(path):
+    """ Takes in a log path, returns its Replay (a record cut off mid-write is dropped)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path}: not a replay log")
+    magic, version, seed, n = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a version {VERSION} replay log")
+    pos = HEADER.size
+    seats = []
+    for _ in range(n):
+        is_bot, size = data[pos], data[pos + 1]
+        seats.append((data[pos + 2:pos + 2 + size].decode(errors="replace"), bool(is_bot)))
+        pos += 2 + size
+    records = []
+    end = None
+    while pos < len(data):
+        op, seat = data[pos] >> 5, data[pos] & 31
+        if op == END:
+            if pos + 1 + SCORE.size * n > len(data):
+                break
+            end = (seat, [SCORE.unpack_from(data, pos + 1 + SCORE.size * i)[0] for i in range(n)])
+            break
+        if op in (HIT, STAY):
+            records.append(Record(op, seat, None))
+            pos += 1
+            continue
+        if pos + 1 >= len(data):
+            break
+        records.append(Record(op, seat, data[pos + 1]))
+        pos += 2
+    return Replay(Header(seed, seats), records, end)
+
+def new_game(header):
+    """ Takes in a log Header, returns the game it recorded, before start()"""
+    players = [Player(name, is_bot=is_bot) for name, is_bot in header.seats]
+    return GameState(players, rng=random.Random(header.seed))
+
+# ---------- Replaying ----------
+class ReplayMismatch(Exception):
+    pass
+
+class Replayer:
+    """
+    Plays a log back: next_action() hands out the recorded decisions, and set as
+    GameState.recorder it checks every card, decision and the final scores the
+    engine produces against the log, raising ReplayMismatch at the first difference.
+    """
+
+    def __init__(self, log):
+        """ Takes in a Replay (from read())"""
+        self.log = log
+        self.pos = 0
+        self._players = None
+        self.finished = False        # the engine reached game over, and it matched the log's end
+        self.cut_short = False       # the engine got past the end of a log without an end record
+        self._random_pick = False
+
+    def _check(self, got):
+        recs = self.log.records
+        if self.pos >= len(recs):
+            if self.log.end is None:
+                self.cut_short = True
+                return
+            raise ReplayMismatch(f"record {self.pos}: the log ends, the engine did {describe(got)}")
+        rec = recs[self.pos]
+        if rec != got:
+            raise ReplayMismatch(f"record {self.pos}: the log has {describe(rec)}, the engine did {describe(got)}")
+        self.pos += 1
+
+    def event(self, ev):
+        """ Takes in an engine event, checks card moves and the end of the game against the log"""
+        if ev.kind in CARD_OPS:
+            self._check(Record(CARD_OPS[ev.kind], ev.seat, ev.card))
+        elif ev.kind == "game_over":
+            end = self.log.end
+            if end is None:
+                self.cut_short = True       # the end record itself was cut off
+                return
+            if self.pos != len(self.log.records):
+                raise ReplayMismatch(f"the game ends at record {self.pos}, the log has {len(self.log.records)}")
+            scores = [p.score_total for p in self._players]
+            if (ev.seat, scores) != tuple(end):
+                raise ReplayMismatch(f"final scores {scores} (winner seat {ev.seat}), "
+                                     f"the log has {end[1]} (winner seat {end[0]})")
+            self.finished = True
+
+    def random_pick(self):
+        """ Marks the next target as drawn by default_target"""
+        self._random_pick = True
+
+    def action(self, req, action):
+        """ Takes in a pending Decision and the action sent for it, checks it against the log"""
+        self._check(action_record(req, action, self._random_pick))
+        self._random_pick = False
+
+    def attach(self, state):
+        """ Takes in the game from new_game(), makes this its recorder"""
+        self._players = state.players
+        state.recorder = self
+
+    def next_action(self, state):
+        """ Takes in the game, returns the logged action for its pending decision (None once the log runs out)"""
+        if self.cut_short or self.pos >= len(self.log.records):
+            return None
+        rec = self.log.records[self.pos]
+        req = state.pending
+        if rec.op == HIT:
+            return "hit"
+        if rec.op == STAY:
+            return "stay"
+        if rec.op == TARGET:
+            return ("target", None if rec.arg == NO_TARGET else rec.arg)
+        if rec.op == RANDOM_TARGET:
+            # draws from the game's RNG exactly as the recorded pick did; action() checks it
+            return ("target", default_target(state))
+        raise ReplayMismatch(f"record {self.pos}: the log has {describe(rec)}, "
+                             f"the engine waits on a {req.kind} decision from seat {req.seat}")
+
+def replay(path):
+    """ Takes in a log path, re-plays the game instantly through the engine and returns (game, Replayer); raises ReplayMismatch if they differ"""
+    log = read(path)
+    state = new_game(log.header)
+    player = Replayer(log)
+    player.attach(state)
+    state.start()
+    while state.pending is not None:
+        action = player.next_action(state)
+        if action is None:
+            if log.end is not None:
+                raise ReplayMismatch(f"the log ends at record {player.pos}, the game goes on")
+            break           # cut short: everything up to here matched
+        state.apply(action)
+    return state, player
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point: replays logs and reports whether each matches"""
+    ap = argparse.ArgumentParser(description="Replay and verify Flip 7 replay logs")
+    ap.add_argument("logs", nargs="+")
+    ap.add_argument("--dump", action="store_true", help="also print every record")
+    args = ap.parse_args(argv)
+
+    failed = 0
+    for path in args.logs:
+        try:
+            start = time.perf_counter()
+            state, player = replay(path)
+            ms = (time.perf_counter() - start) * 1000
+        except (ReplayMismatch, ValueError, OSError) as e:
+            failed += 1
+            print(f"MISMATCH {path}: {e}")
+            continue
+        log = player.log
+        if args.dump:
+            for i, rec in enumerate(log.records):
+                print(f"  {i:5d} {describe(rec)}")
+        size = os.path.getsize(path)
+        events = len(log.records) + (log.end is not None)
+        scores = "/".join(str(p.score_total) for p in state.players)
+        status = "OK" if player.finished else "OK (cut short)"
+        print(f"{status} {path}: seed {log.header.seed}, {len(log.header.seats)} seats, {events} events in "
+              f"{size} bytes ({size / max(1, events):.1f} B/event), scores {scores}, replayed in {ms:.1f} ms")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
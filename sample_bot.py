@@ -0,0 +1,60 @@
+# A complete external bot for extbot.py's protocol, to copy and build on.
+#
+# It plays like the built-in threshold bot: it hits while its round score is
+# under --threshold. FREEZE and FLIP3 go to the opponent with the highest
+# total, and SECOND to the one with the lowest. --think makes it wait before
+# every answer, so you can watch the deadlines at work.
+#
+#   python tournament.py --bot sample="python sample_bot.py --threshold 18" --entrants threshold:16,sample
+
+import argparse
+import json
+import sys
+import time
+
+def choose_target(pos, card, allowed):
+    """ Takes in the position, the card being played and the seats it may go to, returns the seat"""
+    me = pos["seat"]
+    others = [s for s in allowed if s != me] or allowed
+    totals = [p["total"] for p in pos["players"]]
+    if card == "second":
+        return min(others, key=totals.__getitem__)
+    return max(others, key=totals.__getitem__)
+
+def answer(pos, args, threshold):
+    """ Takes in the position and the go command's words, returns the bestmove"""
+    if args[0] == "act":
+        return "hit" if pos["players"][pos["seat"]]["round_score"] < threshold else "stay"
+    seats = [int(a) for a in args[2:args.index("movetime")]]
+    return str(choose_target(pos, args[1], seats))
+
+def main(argv=None):
+    """ Command line entry point: speaks the protocol on stdin / stdout until quit"""
+    ap = argparse.ArgumentParser(description="Sample Flip 7 external bot")
+    ap.add_argument("--threshold", type=int, default=16, help="hit while the round score is under this")
+    ap.add_argument("--think", type=float, default=0.0, help="ms to wait before every answer")
+    opts = ap.parse_args(argv)
+
+    pos = None
+    for line in sys.stdin:
+        cmd, _, rest = line.strip().partition(" ")
+        if cmd == "f7":
+            print(f"id name sample {opts.threshold}")
+            print("f7ok")
+        elif cmd == "isready":
+            print("readyok")
+        elif cmd == "position":
+            pos = json.loads(rest)
+        elif cmd == "go":
+            time.sleep(opts.think / 1000)
+            print("bestmove " + answer(pos, rest.split(), opts.threshold))
+        elif cmd == "quit":
+            break
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        sys.stdout = None           # the engine has gone; nothing left to flush to
+
@@ -0,0 +1,473 @@
+# Flip 7 game server: many tables at once in one asyncio process.
+#
+# Players connect over TCP and speak line-delimited JSON, one object per
+# line each way. The server runs the rules engine for every table (clients
+# only ever send decisions), plays the bot seats itself, and decides for a
+# player who takes longer than --timeout: a pending hit / stay becomes a
+# stay and a pending target a random pick, as a bot would make it.
+#
+#   python server.py --port 7777 --timeout 20
+#
+# Client -> server
+#   {"op": "join", "name": "Ann", "seats": 4, "bots": 2}
+#                   sit at the next table of 4 seats with 2 bots, which starts once
+#                   its other human seat fills; "table": "name" sits at that table
+#                   instead (made by whoever joins it first)
+#   {"op": "hit"}, {"op": "stay"}, {"op": "target", "seat": 2}     (seat null cancels)
+#   {"op": "leave"}                                    the seat goes to a server bot
+#   {"op": "tables"}                                   list the tables
+#   {"op": "watch", "table": "#1"}, {"op": "unwatch"}  spectate a table (not while seated)
+#
+# Server -> client (everything about a table goes to everyone seated at it)
+#   {"op": "seated", "table": "#1", "seat": 0}
+#   {"op": "start", "players": [["Ann", false], ["Bot_1", true], ...], "timeout": 20.0}
+#   {"op": "event", "kind": "hit", "seat": 0, "target": null, "card": 7}    every engine event
+#   {"op": "decide", "kind": "act", "seat": 0, "hand": [7, 3], "score": 10}
+#   {"op": "decide", "kind": "target", "seat": 0, "prompt": "...", "allowed": [0, 2]}
+#   {"op": "timeout", "seat": 0}                       the server decided for seat 0
+#   {"op": "left", "seat": 1}
+#   {"op": "over", "winner": 1, "scores": [120, 204, 98, 57]}      then join again to play on
+#   {"op": "tables", "tables": [["#1", 4, 2, true], ...]}       name, seats, bots, started
+#   {"op": "error", "message": "..."}
+#
+# Spectators get {"op": "watching", "table": "#1"}, then the table as delta.py
+# keyframe and delta messages from the game's start or, mid-game, from its
+# latest keyframe; then "over" (or {"op": "closed"} if everyone left).
+#
+# The events and decision one action leads to (the bots' moves included) go
+# out as a single write, encoded once per table however many are seated or
+# watching. A table only runs a delta encoder while someone watches it, and
+# sends to its spectators at most every SPECTATOR_TICK, so a fast table costs
+# each spectator one write per tick rather than one per action. A spectator
+# more than SPECTATOR_BACKLOG behind is skipped until it has read everything
+# queued, then caught up from the latest keyframe, so a slow one costs
+# neither memory nor the table's time.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from functools import lru_cache
+
+import replay
+from bots import POLICIES
+from delta import DeltaEncoder, encode
+from engine import GameState, Player, default_target
+
+MAX_SEATS = 8
+NAME_LEN = 32
+MAX_LINE = 4096             # longest request line a client may send
+MAX_BACKLOG = 1 << 20       # bytes queued for a client that isn't reading before it is dropped
+SPECTATOR_BACKLOG = 1 << 16 # bytes queued for a spectator before it is skipped (and later caught up)
+SPECTATOR_TICK = 0.05       # seconds between sends to spectators (the deltas in between go out together)
+
+@lru_cache(maxsize=1 << 14)
+def event_line(ev):
+    """ Takes in an engine Event, returns its protocol line (events are a few small ints, so lines are cached)"""
+    return encode({"op": "event", "kind": ev.kind, "seat": ev.seat, "target": ev.target, "card": ev.card})
+
+# ---------- Connections ----------
+class Client:
+    """ One connected player or spectator"""
+    __slots__ = ("writer", "table", "seat", "watching", "behind")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.table = None
+        self.seat = None
+        self.watching = None        # the Table it spectates
+        self.behind = False         # skipped as a spectator until its backlog drains
+
+    def send(self, data):
+        """ Takes in encoded lines, queues them to the client (dropping it if it stopped reading)"""
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BACKLOG:
+            transport.abort()
+            return
+        transport.write(data)
+
+    def error(self, message):
+        self.send(encode({"op": "error", "message": message}))
+
+# ---------- Tables ----------
+class Table:
+    """ One game: its seats (a Client, or None for a bot), the engine and the decision timer"""
+
+    def __init__(self, server, name, size, bots):
+        self.server = server
+        self.name = name
+        self.size = size
+        self.bots = bots
+        self.seats = []             # human seats fill first, in join order; bots get the rest
+        self.names = []
+        self.state = None
+        self.timer = None
+        self.spectators = set()
+        self.delta = None           # DeltaEncoder, while anyone watches
+        self.outbox = []            # delta lines for the spectators' next tick
+        self.tick = None
+
+    def humans(self):
+        return self.size - self.bots
+
+    def sit(self, client, name):
+        """ Takes in a client and its name, gives it the next seat (starting the game once every human seat is taken)"""
+        client.table, client.seat = self, len(self.seats)
+        self.seats.append(client)
+        self.names.append(name)
+        client.send(encode({"op": "seated", "table": self.name, "seat": client.seat}))
+        if len(self.seats) == self.humans():
+            self.start()
+
+    def start(self):
+        """ Seats the bots, deals and plays up to the first human decision"""
+        server = self.server
+        players = [Player(name) for name in self.names]
+        players += [Player(f"Bot_{i+1}", is_bot=True) for i in range(self.bots)]
+        self.seats += [None] * self.bots
+        seed = replay.new_seed()
+        self.state = GameState(players, rng=random.Random(seed))
+        if server.replay_dir:
+            name = self.name.strip("#") + f"-{time.strftime('%Y%m%d-%H%M%S')}-{seed}.f7r"
+            self.state.recorder = replay.ReplayLog(os.path.join(server.replay_dir, name), seed, players)
+        if self.spectators:
+            self.stream()
+            for client in self.spectators:
+                client.send(self.delta.catchup())
+        head = encode({"op": "start", "players": [[p.name, p.is_bot] for p in players], "timeout": server.timeout})
+        self.play(self.state.start(), head)
+
+    def play(self, events, head=b""):
+        """
+        Takes in the events the last action caused, plays bot (and vacated) seats until a
+        connected player has to decide or the game is over, and sends the whole lot at once
+        """
+        state = self.state
+        out = [head]
+        out += map(event_line, events)
+        while state.pending is not None and self.seats[state.pending.seat] is None:
+            req = state.pending
+            if req.kind == "target":
+                action = ("target", default_target(state))
+            else:
+                action = "hit" if self.server.policy(state, req.seat) else "stay"
+            out += map(event_line, state.apply(action))
+        req = state.pending
+        if req is None:
+            self.server.games += 1
+            out.append(encode({"op": "over", "winner": state.winner,
+                               "scores": [p.score_total for p in state.players]}))
+        elif req.kind == "act":
+            p = state.players[req.seat]
+            out.append(encode({"op": "decide", "kind": "act", "seat": req.seat,
+                               "hand": list(p.hand), "score": p.score_current}))
+        else:
+            out.append(encode({"op": "decide", "kind": "target", "seat": req.seat,
+                               "prompt": req.prompt, "allowed": list(req.allowed)}))
+        self.broadcast(b"".join(out))
+        if self.delta is not None:
+            self.outbox.append(self.delta.flush())
+            if req is None:
+                self.fan_out(out[-1])
+            elif self.tick is None:
+                self.tick = self.server.loop.call_later(SPECTATOR_TICK, self.fan_out)
+        if req is None:
+            self.close()
+        else:
+            self.timer = self.server.loop.call_later(self.server.timeout, self.expire)
+
+    def act(self, client, action):
+        """ Takes in a client and its action, applies it if that client's seat is the one deciding"""
+        state = self.state
+        if state is None or state.pending is None or state.pending.seat != client.seat:
+            client.error("not your decision")
+            return
+        try:
+            events = state.apply(action)
+        except ValueError as e:
+            client.error(str(e))
+            return
+        self.timer.cancel()
+        self.server.actions += 1
+        self.play(events)
+
+    def expire(self):
+        """ Decides for a player who ran out of time: stay, or a random target"""
+        state = self.state
+        req = state.pending
+        self.server.timeouts += 1
+        head = encode({"op": "timeout", "seat": req.seat})
+        if req.kind == "target":
+            self.play(state.apply(("target", default_target(state))), head)
+        else:
+            self.play(state.apply("stay"), head)
+
+    def leave(self, client):
+        """ Takes in a seated client, hands its seat to a bot (or drops the table if nobody is left)"""
+        seat = client.seat
+        self.seats[seat] = None
+        client.table = client.seat = None
+        if self.state is None:
+            # not started: close the gap so the seats stay in join order
+            del self.seats[seat], self.names[seat]
+            for i, other in enumerate(self.seats):
+                other.seat = i
+                other.send(encode({"op": "seated", "table": self.name, "seat": i}))
+            if not self.seats:
+                self.abandon()
+            return
+        if not any(self.seats):
+            self.abandon()
+            return
+        self.broadcast(encode({"op": "left", "seat": seat}))
+        if self.state.pending is not None and self.state.pending.seat == seat:
+            self.timer.cancel()
+            self.play([])
+
+    def broadcast(self, data):
+        for client in self.seats:
+            if client is not None:
+                client.send(data)
+
+    # ----- spectators -----
+    def stream(self):
+        """ Starts the delta stream: from here on every event goes through the encoder"""
+        self.delta = DeltaEncoder(self.state)
+        self.state.listener = self.delta
+
+    def watch(self, client):
+        """ Takes in a client, adds it as a spectator and catches it up"""
+        self.spectators.add(client)
+        client.watching, client.behind = self, False
+        client.send(encode({"op": "watching", "table": self.name}))
+        if self.state is not None:
+            if self.delta is None:
+                self.stream()       # between actions, so its first keyframe is exact
+            client.send(self.delta.catchup())
+
+    def unwatch(self, client):
+        """ Takes in a spectator, stops sending it the table (and stops encoding once nobody watches)"""
+        self.spectators.discard(client)
+        client.watching = None
+        if not self.spectators and self.delta is not None:
+            if self.tick is not None:
+                self.tick.cancel()
+                self.tick = None
+            self.outbox.clear()
+            self.state.listener = None
+            self.delta = None
+
+    def fan_out(self, tail=b""):
+        """ Sends the deltas since the last tick (and tail after them) to every spectator keeping up"""
+        if self.tick is not None:
+            self.tick.cancel()
+            self.tick = None
+        data = b"".join(self.outbox) + tail
+        self.outbox.clear()
+        for client in self.spectators:
+            transport = client.writer.transport
+            if transport.is_closing():
+                continue
+            if client.behind:
+                if transport.get_write_buffer_size():
+                    continue
+                # drained: the latest keyframe and the deltas since cover what it missed
+                client.behind = False
+                transport.write(self.delta.catchup() + tail)
+            elif transport.get_write_buffer_size() > SPECTATOR_BACKLOG:
+                client.behind = True
+            else:
+                transport.write(data)
+
+    def abandon(self):
+        """ Closes a table everyone has left, telling its spectators"""
+        closed = encode({"op": "closed", "table": self.name})
+        if self.delta is not None:
+            self.fan_out(closed)
+        else:
+            for client in self.spectators:
+                client.send(closed)
+        self.close()
+
+    def close(self):
+        """ Takes the table down, leaving its players free to join another"""
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.tick is not None:
+            self.tick.cancel()
+        if self.state is not None and self.state.recorder is not None:
+            self.state.recorder.close()
+        for client in self.seats:
+            if client is not None:
+                client.table = client.seat = None
+        for client in self.spectators:
+            client.watching = None
+        self.spectators.clear()
+        self.server.drop(self)
+
+# ---------- Server ----------
+class Server:
+    """ Every table, matchmaking and the connection handler"""
+
+    def __init__(self, timeout=20.0, policy="threshold", replay_dir=None):
+        self.timeout = timeout
+        self.policy = POLICIES[policy]
+        self.replay_dir = replay_dir
+        self.loop = None
+        self.tables = {}            # name -> Table
+        self.waiting = {}           # (seats, bots) -> the unnamed table filling up for that setup
+        self.clients = 0
+        self.next_id = 1
+        self.actions = 0            # decisions sent by players
+        self.timeouts = 0           # decisions the server made for them
+        self.games = 0
+
+    def join(self, client, msg):
+        """ Takes in a client and its join request, seats it"""
+        if client.table is not None:
+            client.error("already at a table")
+            return
+        seats, bots, name = msg.get("seats", 4), msg.get("bots", 0), msg.get("name", "Player")
+        if not (isinstance(seats, int) and isinstance(bots, int) and 2 <= seats <= MAX_SEATS and 0 <= bots < seats):
+            client.error(f"seats must be 2-{MAX_SEATS} and bots 0 to seats - 1")
+            return
+        name = str(name)[:NAME_LEN] or "Player"
+        table_name = msg.get("table")
+        if table_name is not None:
+            table_name = str(table_name)[:NAME_LEN]
+            table = self.tables.get(table_name)
+            if table is None and not table_name.startswith("#"):
+                table = self.tables[table_name] = Table(self, table_name, seats, bots)
+            elif table is None or table.state is not None:
+                client.error(f"table {table_name} is not open")
+                return
+        else:
+            table = self.waiting.get((seats, bots))
+            if table is None:
+                table = Table(self, f"#{self.next_id}", seats, bots)
+                self.next_id += 1
+                self.tables[table.name] = self.waiting[seats, bots] = table
+        if len(table.seats) + 1 == table.humans() and self.waiting.get((seats, bots)) is table:
+            del self.waiting[seats, bots]
+        table.sit(client, name)
+
+    def drop(self, table):
+        self.tables.pop(table.name, None)
+        if self.waiting.get((table.size, table.bots)) is table:
+            del self.waiting[table.size, table.bots]
+
+    def watch(self, client, msg):
+        """ Takes in a client and its watch request, makes it a spectator of that table"""
+        name = msg.get("table")
+        table = self.tables.get(name) if isinstance(name, str) else None
+        if client.table is not None:
+            client.error("already at a table")
+        elif table is None:
+            client.error(f"no table {str(name)[:NAME_LEN]}")
+        else:
+            if client.watching is not None:
+                client.watching.unwatch(client)
+            table.watch(client)
+
+    def handle(self, client, msg):
+        """ Takes in a client and one decoded request, carries it out"""
+        op = msg.get("op")
+        if op == "join":
+            if client.watching is not None:
+                client.watching.unwatch(client)
+            self.join(client, msg)
+        elif op == "watch":
+            self.watch(client, msg)
+        elif op == "unwatch":
+            if client.watching is not None:
+                client.watching.unwatch(client)
+        elif op == "tables":
+            client.send(encode({"op": "tables", "tables": [[t.name, t.size, t.bots, t.state is not None]
+                                                           for t in self.tables.values()]}))
+        elif client.table is None:
+            client.error("join a table first")
+        elif op in ("hit", "stay"):
+            client.table.act(client, op)
+        elif op == "target":
+            seat = msg.get("seat")
+            client.table.act(client, ("target", seat if type(seat) is int else None))
+        elif op == "leave":
+            client.table.leave(client)
+        else:
+            client.error(f"unknown op {op!r}")
+
+    async def connection(self, reader, writer):
+        """ Serves one connection until it closes"""
+        client = Client(writer)
+        self.clients += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    client.error("bad JSON")
+                    continue
+                if not isinstance(msg, dict):
+                    client.error("expected a JSON object")
+                    continue
+                self.handle(client, msg)
+        except (ConnectionError, ValueError):       # ValueError: a line over MAX_LINE
+            pass
+        finally:
+            self.clients -= 1
+            if client.table is not None:
+                client.table.leave(client)
+            if client.watching is not None:
+                client.watching.unwatch(client)
+            writer.close()
+
+    async def report(self, every):
+        """ Prints a status line every `every` seconds"""
+        last, then = self.actions, time.perf_counter()
+        while True:
+            await asyncio.sleep(every)
+            now = time.perf_counter()
+            print(f"{len(self.tables)} tables, {self.clients} players, {self.games} games, "
+                  f"{(self.actions - last) / (now - then):.0f} actions/s, {self.timeouts} timeouts", flush=True)
+            last, then = self.actions, now
+
+    async def serve(self, host, port, stats=0):
+        """ Listens on host:port until cancelled"""
+        self.loop = asyncio.get_running_loop()
+        listener = await asyncio.start_server(self.connection, host, port, limit=MAX_LINE)
+        host, port = listener.sockets[0].getsockname()[:2]
+        print(f"listening on {host}:{port}", flush=True)
+        if stats:
+            asyncio.create_task(self.report(stats))
+        async with listener:
+            await listener.serve_forever()
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Flip 7 multi-table game server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=7777, help="0 picks a free port (printed at startup)")
+    ap.add_argument("--timeout", type=float, default=20.0, help="seconds a player gets per decision")
+    ap.add_argument("--bot", choices=list(POLICIES), default="threshold",
+                    help="policy for bot seats (mcts searches on the server's thread, stalling every table)")
+    ap.add_argument("--replay-dir", default=None, help="record every game to a replay log in this folder")
+    ap.add_argument("--stats", type=float, default=0, help="print a status line every N seconds")
+    args = ap.parse_args(argv)
+
+    server = Server(args.timeout, args.bot, args.replay_dir)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.stats))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Monte Carlo simulator for tuning bot aggression (Player.bot_aggr).
+#
+# Plays full headless games (to the 200 point final round, including tie
+# continuations) across a process pool and merges the results.
+#
+#   python simulate.py --games 1000000 --aggr 12,16,20 --seed 1
+#   python simulate.py --games 100000 --policy ev,threshold,threshold
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bots import POLICIES, TABLE_POLICIES, build_stop_table
+from engine import BOT_HIT_THRESHOLD, GameState, Player, play_headless
+
+CHUNK_GAMES = 500   # games per worker task; also the progress granularity
+
+# ---------- Results ----------
+class SimStats:
+    def __init__(self, seats):
+        """ Takes in the number of seats, creates empty win/score/length totals"""
+        self.games = 0
+        self.wins = [0] * seats
+        self.score_sum = [0] * seats
+        self.rounds_sum = 0
+        self.turns_sum = 0
+
+    def add_game(self, state):
+        """ Takes in a finished GameState and adds it to the totals"""
+        self.games += 1
+        self.wins[state.winner] += 1
+        for i, p in enumerate(state.players):
+            self.score_sum[i] += p.score_total
+        self.rounds_sum += state.round_no
+        self.turns_sum += state.turns
+
+    def merge(self, other):
+        """ Takes in another SimStats and adds its totals to this one"""
+        self.games += other.games
+        for i in range(len(self.wins)):
+            self.wins[i] += other.wins[i]
+            self.score_sum[i] += other.score_sum[i]
+        self.rounds_sum += other.rounds_sum
+        self.turns_sum += other.turns_sum
+
+    def report(self, labels):
+        """ Takes in a label per seat (e.g. 'aggr 16'), returns a printable summary"""
+        g = max(1, self.games)
+        lines = [f"games: {self.games}   avg rounds: {self.rounds_sum / g:.2f}   avg turns: {self.turns_sum / g:.1f}"]
+        for i, label in enumerate(labels):
+            lines.append(f"  seat {i+1} ({label}): win {100 * self.wins[i] / g:6.2f}%   avg score {self.score_sum[i] / g:6.1f}")
+        return "\n".join(lines)
+
+# ---------- Workers ----------
+def chunk_rng(seed, chunk_idx):
+    """ Takes in the base seed and a chunk index, returns that chunk's independent random.Random"""
+    # string seeds are hashed (sha512), so neighbouring chunks get unrelated streams
+    return random.Random(f"flip7:{seed}:{chunk_idx}")
+
+def play_one(aggrs, rng, policies=None):
+    """ Takes in per-seat aggression values, a random.Random and optional per-seat policy names, plays one bot-only game and returns the finished state"""
+    players = [Player(f"Bot_{i+1}", is_bot=True, bot_aggr=a) for i, a in enumerate(aggrs)]
+    state = GameState(players, rng=rng)
+    play_headless(state, [POLICIES[name] for name in policies or ["threshold"] * len(aggrs)])
+    return state
+
+def run_chunk(aggrs, seed, chunk_idx, games, policies=None):
+    """ Plays `games` games with the chunk's own RNG stream, returns a SimStats"""
+    rng = chunk_rng(seed, chunk_idx)
+    stats = SimStats(len(aggrs))
+    for _ in range(games):
+        stats.add_game(play_one(aggrs, rng, policies))
+    return stats
+
+def simulate(aggrs, games, workers=None, seed=0, chunk=CHUNK_GAMES, progress=None, policies=None):
+    """
+    Takes in per-seat aggression values and the number of games to play, and
+    optionally per-seat policy names from bots.POLICIES (default: threshold).
+    Games are split into chunks that each own a seeded RNG stream, so the
+    result for a given seed does not depend on the worker count.
+    progress (optional) is called as progress(done_games, total_games, elapsed_s).
+    Returns a SimStats.
+    """
+    aggrs = list(aggrs)
+    total = SimStats(len(aggrs))
+    chunks = [(i, min(chunk, games - i * chunk)) for i in range((games + chunk - 1) // chunk)]
+    start = time.perf_counter()
+    if workers == 1:
+        for idx, n in chunks:
+            total.merge(run_chunk(aggrs, seed, idx, n, policies))
+            if progress: progress(total.games, games, time.perf_counter() - start)
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_chunk, aggrs, seed, idx, n, policies) for idx, n in chunks]
+        for fut in as_completed(futures):
+            total.merge(fut.result())
+            if progress: progress(total.games, games, time.perf_counter() - start)
+    return total
+
+def print_progress(done, total, elapsed):
+    """ Progress callback that writes games done and games/s to stderr"""
+    rate = done / elapsed if elapsed > 0 else 0.0
+    sys.stderr.write(f"\r{done}/{total} games  {rate:,.0f} games/s  {elapsed:.1f}s")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Monte Carlo Flip 7 bot simulator")
+    ap.add_argument("--games", type=int, default=10000)
+    ap.add_argument("--aggr", default=None,
+                    help=f"comma separated bot_aggr per seat, e.g. 12,16,20 (default: {BOT_HIT_THRESHOLD} for every seat)")
+    ap.add_argument("--policy", default=None,
+                    help=f"comma separated policy per seat, one of {', '.join(POLICIES)} (default: threshold)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--chunk", type=int, default=CHUNK_GAMES)
+    ap.add_argument("--quiet", action="store_true", help="no progress readout")
+    args = ap.parse_args(argv)
+
+    if args.aggr is None:
+        policies = args.policy.split(",") if args.policy else ["threshold"] * 2
+        aggrs = [BOT_HIT_THRESHOLD] * len(policies)
+    else:
+        aggrs = [int(a) for a in args.aggr.split(",")]
+        policies = args.policy.split(",") if args.policy else ["threshold"] * len(aggrs)
+    if len(aggrs) == 1:
+        aggrs = aggrs * len(policies)
+    if len(policies) != len(aggrs):
+        ap.error("--aggr and --policy need one entry per seat")
+    for name in policies:
+        if name not in POLICIES:
+            ap.error(f"unknown policy {name!r}")
+    if any(name in TABLE_POLICIES for name in policies):
+        build_stop_table()
+    start = time.perf_counter()
+    stats = simulate(aggrs, args.games, workers=args.workers, seed=args.seed, chunk=args.chunk,
+                     progress=None if args.quiet else print_progress, policies=policies)
+    elapsed = time.perf_counter() - start
+    labels = [f"aggr {a}" if name == "threshold" else name for name, a in zip(policies, aggrs)]
+    print(stats.report(labels))
+    print(f"{stats.games / elapsed:,.0f} games/s on {args.workers} worker(s)")
+
+if __name__ == "__main__":
+    main()
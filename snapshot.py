@@ -0,0 +1,154 @@
+# Snapshots of a game in progress, so it can be resumed after the window is
+# closed or the process dies.
+#
+# fun_game writes one at every turn boundary (a hit / stay decision pending,
+# no card being resolved) and "Resume" in the menu loads it. A snapshot holds
+# the whole table: seats, hands, scores, the draw and discard piles, the
+# round and final-round bookkeeping and the RNG state, so the game carries on
+# exactly as it would have. It can also hold where the game's replay log
+# (replay.py) stood, so recording picks up from the same spot.
+#
+# save() writes a temp file and renames it over the old snapshot, so a crash
+# mid-write leaves the previous one intact.
+#
+# Layout (little endian):
+#   header   magic b"F7SS", version, seat count, flags, phase, dealer, current seat,
+#            triggerer, winner, pending seat (255 = none), step, round_no, turns
+#   seats    per seat: flags, bot_aggr, score_total, score_current, name length,
+#            hand length, then the name (UTF-8), hand and face-up flags
+#   piles    final_players_list, draw pile, discard pile, each a 16-bit length + bytes
+#   rng      Mersenne Twister state: 625 32-bit words, gauss flag + double
+#   log      16-bit path length (0 = none), UTF-8 path, 64-bit log size
+
+import os
+import random
+import struct
+from array import array
+
+from engine import Decision, GameState, Player
+
+MAGIC = b"F7SS"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBBbBBBHII")
+SEAT = struct.Struct("<BhIiBB")
+LENGTH = struct.Struct("<H")
+GAUSS = struct.Struct("<Bd")
+LOG_SIZE = struct.Struct("<Q")
+MT_WORDS = 625
+NONE = 255
+
+PHASES = ("deal", "play", "final", "over")
+# header flags
+FINAL_TRIGGER, ROUND_SHOULD_END = 1, 2
+# seat flags
+BOT, HAS_SECOND, STAYED, BUSTED = 1, 2, 4, 8
+
+def _opt(value):
+    return NONE if value is None else value
+
+def dumps(state, log=None):
+    """ Takes in a game at a turn boundary and optionally its replay log's (path, size), returns the snapshot bytes"""
+    if state._resolving is not None or (state.pending is not None and state.pending.kind != "act"):
+        raise ValueError("snapshots are taken between turns, not while a card is being resolved")
+    players = state.players
+    flags = (FINAL_TRIGGER if state.final_trigger else 0) | (ROUND_SHOULD_END if state.round_should_end else 0)
+    out = [HEADER.pack(MAGIC, VERSION, len(players), flags, PHASES.index(state.phase), state.dealer_idx,
+                       state.current_idx, _opt(state.triggerer_idx), _opt(state.winner),
+                       NONE if state.pending is None else state.pending.seat,
+                       state.step, state.round_no, state.turns)]
+    for p in players:
+        name = p.name.encode()[:255]
+        pflags = (BOT if p.is_bot else 0) | (HAS_SECOND if p.has_second else 0) | \
+                 (STAYED if p.stayed else 0) | (BUSTED if p.busted else 0)
+        out.append(SEAT.pack(pflags, p.bot_aggr, p.score_total, p.score_current, len(name), len(p.hand)))
+        out += (name, p.hand.tobytes(), p.hand_face.tobytes())
+    for pile in (bytes(state.final_players_list), state.deck.cards.tobytes(), state.deck.discard.tobytes()):
+        out += (LENGTH.pack(len(pile)), pile)
+    _, words, gauss = state.rng.getstate()
+    out += (array('I', words).tobytes(), GAUSS.pack(gauss is not None, gauss or 0.0))
+    path = log[0].encode() if log else b""
+    out += (LENGTH.pack(len(path)), path, LOG_SIZE.pack(log[1] if log else 0))
+    return b"".join(out)
+
+def loads(data):
+    """ Takes in snapshot bytes, returns (the game, its replay log's (path, size) or None); raises ValueError if they are damaged"""
+    try:
+        return _parse(data)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"damaged snapshot ({e})") from None
+
+def _parse(data):
+    if len(data) < HEADER.size:
+        raise ValueError("not a snapshot")
+    (magic, version, n, flags, phase, dealer, current, triggerer, winner, pending,
+     step, round_no, turns) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} snapshot")
+    pos = HEADER.size
+    players = []
+    for _ in range(n):
+        pflags, aggr, total, current_score, name_len, hand_len = SEAT.unpack_from(data, pos)
+        pos += SEAT.size
+        p = Player(data[pos:pos + name_len].decode(errors="replace"), is_bot=bool(pflags & BOT), bot_aggr=aggr)
+        pos += name_len
+        p.hand = array('b', data[pos:pos + hand_len])
+        p.hand_face = array('b', data[pos + hand_len:pos + 2 * hand_len])
+        pos += 2 * hand_len
+        p.has_second = bool(pflags & HAS_SECOND)
+        p.stayed = bool(pflags & STAYED)
+        p.busted = bool(pflags & BUSTED)
+        p.score_total = total
+        p.score_current = current_score
+        players.append(p)
+    piles = []
+    for _ in range(3):
+        (size,) = LENGTH.unpack_from(data, pos)
+        piles.append(data[pos + LENGTH.size:pos + LENGTH.size + size])
+        pos += LENGTH.size + size
+    words = array('I')
+    words.frombytes(data[pos:pos + 4 * MT_WORDS])
+    pos += 4 * MT_WORDS
+    has_gauss, gauss = GAUSS.unpack_from(data, pos)
+    pos += GAUSS.size
+    (path_len,) = LENGTH.unpack_from(data, pos)
+    path = data[pos + LENGTH.size:pos + LENGTH.size + path_len].decode()
+    pos += LENGTH.size + path_len
+    (log_size,) = LOG_SIZE.unpack_from(data, pos)
+
+    rng = random.Random(0)      # (seeding from the OS is slow, and setstate replaces it anyway)
+    rng.setstate((3, tuple(words), gauss if has_gauss else None))
+    state = GameState(players, rng=rng, deck=piles[1])
+    state.deck.discard_cards(array('b', piles[2]))
+    state.final_players_list = list(piles[0])
+    state.final_trigger = bool(flags & FINAL_TRIGGER)
+    state.round_should_end = bool(flags & ROUND_SHOULD_END)
+    state.phase = PHASES[phase]
+    state.dealer_idx = dealer
+    state.current_idx = current
+    state.triggerer_idx = None if triggerer == NONE else triggerer
+    state.winner = None if winner == NONE else winner
+    state.pending = None if pending == NONE else Decision("act", pending)
+    state.step = step
+    state.round_no = round_no
+    state.turns = turns
+    return state, ((path, log_size) if path else None)
+
+def save(state, path, log=None):
+    """ Takes in a game at a turn boundary, a file path and optionally its replay log's (path, size), writes the snapshot atomically"""
+    data = dumps(state, log)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load(path):
+    """ Takes in a snapshot file path, returns (the game, its replay log's (path, size) or None)"""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def remove(path):
+    """ Deletes the snapshot at path, if any (the game it held is over)"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,40 @@
+# The NumPy round simulator against the rules engine: solo rounds played
+# through GameState and through RoundBatch should score the same.
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import batch_sim  # noqa: E402
+from engine import GameState, Player, bot_should_hit, make_deck  # noqa: E402
+
+FULL = make_deck(random.Random(0))
+# numbers, modifiers and X2, with FLIP3 common enough that cascades are too
+FLIP3_HEAVY = [v for v in range(13) for _ in range(max(v, 1))] + list(range(13, 19)) + [20] * 40 + [21] * 6
+
+def solo_round(cards, aggr, rng):
+    """ Takes in the cards, a bot_aggr and a random.Random, plays one solo round on the engine, returns (score, busted, flip7)"""
+    p = Player("P", is_bot=True, bot_aggr=aggr)
+    deck = list(cards)
+    rng.shuffle(deck)
+    state = GameState([p], rng=rng, deck=deck)
+    seen = []
+    state.listener = lambda ev: seen.append((ev.kind, p.score_total))
+    state.start()
+    while state.round_no == 1:
+        state.apply("hit" if bot_should_hit(p) else "stay")
+    # the action that ends the round also deals the next one
+    end = next(i for i, (kind, _) in enumerate(seen) if i and kind == "round_start")
+    kinds = [kind for kind, _ in seen[:end]]
+    return seen[end][1], "bust" in kinds, "flip7" in kinds
+
+@pytest.mark.parametrize("cards", [FULL, FLIP3_HEAVY], ids=["full", "flip3-heavy"])
+def test_batch_matches_engine_solo_rounds(cards):
+    rng = random.Random(1)
+    engine = np.array([solo_round(cards, 16, rng) for _ in range(10000)], dtype=float).mean(axis=0)
+    batch = batch_sim.simulate_rounds(200000, batch_sim.threshold_policy(16), batch_sim.deck_counts(cards), seed=1)
+    assert batch.score.mean() == pytest.approx(engine[0], abs=0.5)
+    assert batch.busted.mean() == pytest.approx(engine[1], abs=0.015)
+    assert batch.flip7.mean() == pytest.approx(engine[2], abs=0.0015)
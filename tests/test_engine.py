@@ -0,0 +1,186 @@
+# Rules engine: whole seeded games, card resolution, the deck and copying a
+# game mid-card.
+
+import pickle
+import random
+from array import array
+from collections import Counter
+
+import pytest
+
+from engine import (Decision, Deck, FLIP7_BONUS, GameState, N_CARD_VALUES, Player, default_target, make_deck,
+                    play_headless, threshold_policy)
+
+def table(hands, deck):
+    """ Takes in a hand per seat and the draw pile (top card last), returns a game in play with seat 0 to act"""
+    players = [Player(f"P{i}") for i in range(len(hands))]
+    state = GameState(players, rng=random.Random(0), deck=deck)
+    state.phase = "play"
+    state.current_idx = 0
+    for p, hand in zip(players, hands):
+        p.hand = hand
+        p.hand_face = array('b', [1] * len(hand))
+        p.has_second = 21 in hand
+        p.compute_current_score()
+    state.pending = Decision("act", 0)
+    return state
+
+def kinds(events):
+    return [ev.kind for ev in events]
+
+# ---------- Seeded games ----------
+@pytest.mark.parametrize("seed, aggrs, winner, scores, rounds, turns", [
+    (1, [16, 16], 1, [192, 221], 16, 54),
+    (7, [12, 16, 20], 2, [193, 87, 210], 13, 58),
+    (42, [10, 14, 18, 22, 26], 1, [114, 216, 215, 143, 107], 12, 116),
+])
+def test_seeded_game(seed, aggrs, winner, scores, rounds, turns):
+    players = [Player(f"P{i}", is_bot=True, bot_aggr=a) for i, a in enumerate(aggrs)]
+    state = GameState(players, rng=random.Random(seed))
+    assert play_headless(state) == winner
+    assert [p.score_total for p in players] == scores
+    assert (state.round_no, state.turns, state.phase) == (rounds, turns, "over")
+
+def test_apply_rejects_bad_actions():
+    state = table([[3], [4]], [19])
+    with pytest.raises(ValueError):
+        state.apply(("target", 1))
+    state.apply("hit")
+    with pytest.raises(ValueError):
+        state.apply("stay")
+    with pytest.raises(ValueError):
+        state.apply(("target", 5))
+
+# ---------- Card resolution ----------
+def test_duplicate_busts():
+    state = table([[5, 13], [1]], [9, 5])
+    events = state.apply("hit")
+    p = state.players[0]
+    assert "bust" in kinds(events)
+    assert p.busted and list(p.hand) == [] and p.score_current == 0
+    assert sorted(state.deck.discard) == [5, 5, 13]
+    assert state.pending == Decision("act", 1)
+
+def test_second_chance_absorbs_duplicate():
+    state = table([[5, 21], [1]], [5])
+    events = state.apply("hit")
+    p = state.players[0]
+    assert "second_consumed" in kinds(events)
+    assert not p.busted and not p.has_second
+    assert list(p.hand) == [5] and p.score_current == 5
+
+def test_second_second_chance_goes_to_an_opponent():
+    state = table([[21], [1], [2]], [21])
+    state.apply("hit")
+    req = state.pending
+    assert (req.kind, req.seat, req.allowed, req.card) == ("target", 0, [1, 2], 21)
+    state.apply(("target", 2))
+    assert state.players[2].has_second and 21 in state.players[2].hand
+    assert not state.players[1].has_second
+
+def test_second_chance_cancelled_is_discarded():
+    state = table([[21], [1]], [9, 21])
+    state.apply("hit")
+    state.apply(("target", None))
+    assert not state.players[1].has_second
+    assert list(state.deck.discard) == [21]
+
+def test_freeze_banks_the_target():
+    state = table([[3], [4, 14]], [19])
+    state.apply("hit")
+    req = state.pending
+    assert (req.kind, req.allowed, req.card) == ("target", [0, 1], 19)
+    events = state.apply(("target", 1))
+    frozen = state.players[1]
+    assert "freeze" in kinds(events)
+    assert frozen.stayed and frozen.score_total == 8 and list(frozen.hand) == []
+
+def test_flip3_cascades_only_from_the_first_three_flips():
+    # seat 1 gets 3, FLIP3, 4 (the FLIP3 cascades: 5, FLIP3, 6), and that second FLIP3 doesn't
+    state = table([[1], [2]], [8, 7, 6, 20, 5, 4, 20, 3, 20])
+    state.apply("hit")
+    assert state.pending.card == 20
+    events = state.apply(("target", 1))
+    target = state.players[1]
+    assert kinds(events).count("flip3_draw") == 6
+    assert sorted(c for c in target.hand if c < 13) == [2, 3, 4, 5, 6]
+    assert list(target.hand).count(20) == 1
+    assert list(state.deck.cards) == [8, 7]
+
+def test_flip3_duplicate_after_seventh_number_busts():
+    state = table([[1], [1, 2, 3, 4, 5]], [6, 7, 6, 20])
+    state.apply("hit")
+    events = state.apply(("target", 1))
+    assert "bust" in kinds(events) and "flip7" not in kinds(events)
+    assert state.players[1].busted and state.players[1].score_total == 0
+
+def test_flip3_flip7_is_scored_after_the_flips():
+    state = table([[1], [1, 2, 3, 4, 5]], [13, 7, 6, 20])
+    state.apply("hit")
+    events = state.apply(("target", 1))
+    assert "flip7" in kinds(events)
+    assert state.players[1].score_total == 1 + 2 + 3 + 4 + 5 + 6 + 7 + 2 + FLIP7_BONUS
+
+def test_seventh_number_on_a_hit_is_flip7():
+    state = table([[1, 2, 3, 4, 5, 6, 18], [9]], [7])
+    events = state.apply("hit")
+    assert "flip7" in kinds(events)
+    assert state.players[0].score_total == 28 * 2 + FLIP7_BONUS
+
+# ---------- Deck ----------
+def test_fresh_deck_counts():
+    cards = make_deck(random.Random(3))
+    deck = Deck(cards)
+    assert list(deck.counts) == [Counter(cards)[v] for v in range(N_CARD_VALUES)]
+    assert deck.next_counts() == (deck.counts, len(cards))
+    assert deck.counts[12] == 12 and deck.counts[0] == 1 and deck.counts[21] == 30
+
+def test_deck_counts_follow_draws_discards_and_recycling():
+    deck = Deck([1, 2, 2, 3])
+    drawn = [deck.pop() for _ in range(4)]
+    assert drawn == [3, 2, 2, 1] and not any(deck.counts)
+    deck.discard_cards(drawn)
+    counts, total = deck.next_counts()
+    assert total == 4 and counts[2] == 2
+    assert deck.p_value(2) == 0.5
+    assert deck.p_duplicate(1 << 2 | 1 << 3) == 0.75
+    deck.recycle(random.Random(0))
+    assert sorted(deck.cards) == [1, 2, 2, 3] and len(deck.discard) == 0
+    assert deck.counts[2] == 2 and not any(deck.discard_counts)
+
+def test_player_masks_follow_the_hand():
+    p = Player("P")
+    for c in (4, 13, 4, 18):
+        p.add_card(c)
+    assert p.num_mask == 1 << 4 and p.dup_mask == 1 << 4 and p.has_duplicate_number()
+    assert p.remove_card_value(4) and not p.has_duplicate_number()
+    assert p.compute_current_score() == 4 * 2 + 2
+    assert p.pop_last() == 18 and p.compute_current_score() == 6
+
+# ---------- Copying mid-card ----------
+def finish(state):
+    """ Plays a game out with threshold bots and random targets, returns the scores"""
+    while state.pending is not None:
+        if state.pending.kind == "target":
+            state.apply(("target", default_target(state)))
+        else:
+            state.apply("hit" if threshold_policy(state, state.pending.seat) else "stay")
+    return [p.score_total for p in state.players]
+
+def test_copy_and_pickle_while_a_target_is_pending():
+    state = GameState([Player(f"P{i}", is_bot=True) for i in range(4)], rng=random.Random(11))
+    state.searchable = True
+    state.start()
+    while state.pending.kind != "target":
+        state.apply("hit" if threshold_policy(state, state.pending.seat) else "stay")
+    copied = state.copy()
+    pickled = pickle.loads(pickle.dumps(state))
+    assert copied.pending == state.pending == pickled.pending
+    assert finish(copied) == finish(pickled) == finish(state)
+
+def test_copy_mid_card_needs_searchable():
+    state = table([[3], [4]], [19])
+    state.apply("hit")
+    assert not state.can_copy()
+    with pytest.raises(ValueError):
+        state.copy()
@@ -0,0 +1,122 @@
+# Round trips through the on-disk and on-the-wire formats: replay logs
+# (F7RL), snapshots (F7SS) and spectator deltas.
+
+import json
+import random
+
+import pytest
+
+import replay
+import snapshot
+from delta import DeltaEncoder, TableView, picture
+from engine import GameState, Player, default_target, threshold_policy
+
+def new_game(seed, n=3):
+    players = [Player(f"P{i}", is_bot=True, bot_aggr=12 + 4 * i) for i in range(n)]
+    return GameState(players, rng=random.Random(seed))
+
+def step(state):
+    """ Answers the pending decision the way the built-in bots do, returns the events"""
+    if state.pending.kind == "target":
+        return state.apply(("target", default_target(state)))
+    return state.apply("hit" if threshold_policy(state, state.pending.seat) else "stay")
+
+def finish(state):
+    while state.pending is not None:
+        step(state)
+    return [p.score_total for p in state.players]
+
+# ---------- Replay logs ----------
+def recorded_game(path, seed=5, flush=False):
+    state = new_game(seed)
+    state.recorder = replay.ReplayLog(str(path), seed, state.players, flush=flush)
+    state.start()
+    return state, finish(state)
+
+@pytest.mark.parametrize("flush", [False, True])
+def test_replay_round_trip(tmp_path, flush):
+    path = tmp_path / "game.f7r"
+    state, scores = recorded_game(path, flush=flush)
+    log = replay.read(str(path))
+    assert log.header.seed == 5 and [name for name, _ in log.header.seats] == ["P0", "P1", "P2"]
+    assert log.end == (state.winner, scores)
+    again, player = replay.replay(str(path))
+    assert player.finished and [p.score_total for p in again.players] == scores
+
+def test_replay_cut_short(tmp_path):
+    path = tmp_path / "game.f7r"
+    recorded_game(path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    state, player = replay.replay(str(path))
+    assert replay.read(str(path)).end is None
+    assert state.pending is not None and not player.finished
+
+def test_replay_detects_a_different_game(tmp_path):
+    path = tmp_path / "game.f7r"
+    recorded_game(path)
+    data = bytearray(path.read_bytes())
+    data[5] ^= 1                # the seed
+    path.write_bytes(bytes(data))
+    with pytest.raises(replay.ReplayMismatch):
+        replay.replay(str(path))
+
+# ---------- Snapshots ----------
+def test_snapshot_round_trip_plays_on_identically():
+    state = new_game(9)
+    state.start()
+    for _ in range(40):
+        step(state)
+        while state.pending.kind != "act":
+            step(state)
+    data = snapshot.dumps(state, ("replays/x.f7r", 123))
+    loaded, log = snapshot.loads(data)
+    assert log == ("replays/x.f7r", 123)
+    assert snapshot.dumps(loaded, log) == data
+    assert finish(loaded) == finish(state)
+
+def test_snapshot_refuses_mid_card_and_damage():
+    state = new_game(2)
+    state.start()
+    while state.pending.kind != "target":
+        step(state)
+    with pytest.raises(ValueError):
+        snapshot.dumps(state)
+    with pytest.raises(ValueError):
+        snapshot.loads(b"F7SS\x01")
+
+# ---------- Spectator deltas ----------
+def test_delta_stream_rebuilds_the_table():
+    state = new_game(4, n=4)
+    encoder = DeltaEncoder(state)
+    state.listener = encoder
+    view = TableView()
+    view.apply(json.loads(encoder.catchup()))
+    state.start()
+    late = None
+    actions = 0
+    while True:
+        line = encoder.flush()
+        if line:
+            view.apply(json.loads(line))
+        seats, table = picture(state)
+        assert (view.seats, view.table) == (seats, table)
+        if actions == 50:
+            # a spectator joining mid-game catches up from the latest keyframe
+            late = TableView()
+            for msg in encoder.catchup().splitlines():
+                late.apply(json.loads(msg))
+            assert (late.seats, late.table) == (seats, table)
+        if state.pending is None:
+            break
+        step(state)
+        actions += 1
+    assert late is not None and view.table[-1] == state.winner
+    assert view.events > 0
+
+def test_delta_gap_is_an_error():
+    view = TableView()
+    view.apply({"op": "keyframe", "seq": 3, "players": [], "seats": [], "table": []})
+    view.apply({"op": "delta", "seq": 2, "frames": []})       # already in the keyframe
+    with pytest.raises(ValueError):
+        view.apply({"op": "delta", "seq": 5, "frames": []})
@@ -0,0 +1,75 @@
+# Timeline of timed steps (tweens, messages, pauses) played frame by frame.
+#
+# A step runs for a duration: start() is called when it becomes current,
+# update(t) on every frame with t going from just above 0 to 1, and done()
+# when it finishes. The owner's frame loop calls update(dt_ms) once per
+# frame, so input keeps being handled while the steps play. skip() drops
+# whatever is queued (only running done()), and keeps dropping new steps
+# until resume(), so a whole chain of animations can be skipped at once.
+
+from collections import deque
+
+class Step:
+    __slots__ = ("duration", "start", "update", "done", "elapsed", "started")
+
+    def __init__(self, duration, start=None, update=None, done=None):
+        self.duration = duration
+        self.start = start
+        self.update = update
+        self.done = done
+        self.elapsed = 0.0
+        self.started = False
+
+class Timeline:
+    def __init__(self):
+        self.steps = deque()
+        self.skipping = False
+
+    def add(self, duration_ms, start=None, update=None, done=None):
+        """ Takes in a duration in ms and optional start() / update(t) / done() callbacks, queues the step"""
+        if self.skipping:
+            if done:
+                done()
+            return
+        self.steps.append(Step(max(0.0, duration_ms), start, update, done))
+
+    def pause(self, ms):
+        """ Queues ms of nothing"""
+        self.add(ms)
+
+    @property
+    def busy(self):
+        """ True while steps are queued"""
+        return bool(self.steps)
+
+    def update(self, dt_ms):
+        """ Takes in the ms since the last frame, advances the steps (time left over from a finished step carries into the next)"""
+        while self.steps:
+            step = self.steps[0]
+            if not step.started:
+                step.started = True
+                if step.start:
+                    step.start()
+            step.elapsed += dt_ms
+            if step.update:
+                step.update(min(1.0, step.elapsed / step.duration) if step.duration else 1.0)
+            if step.elapsed < step.duration:
+                return
+            self.steps.popleft()
+            dt_ms = step.elapsed - step.duration
+            if step.done:
+                step.done()
+            if dt_ms <= 0 and self.steps and self.steps[0].duration:
+                return
+
+    def skip(self):
+        """ Finishes everything queued at once (done() only) and skips new steps until resume()"""
+        self.skipping = True
+        while self.steps:
+            step = self.steps.popleft()
+            if step.done:
+                step.done()
+
+    def resume(self):
+        """ Stops skipping new steps"""
+        self.skipping = False
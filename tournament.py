@@ -0,0 +1,326 @@
+# Round-robin bot tournament with Elo ratings.
+#
+# Entrants are bot policies from bots.POLICIES, written name[:bot_aggr]
+# (e.g. threshold:12). For every player count, every lineup of entrants is
+# played in every seat order (all permutations up to 4 players, the
+# rotations beyond that) for --games games each. Each finished game is
+# appended to the results file (.jsonl or .csv) as soon as it arrives, so
+# an interrupted run picks up where it stopped when started again with the
+# same arguments. Elo ratings are updated as results come in.
+#
+# External bots (any program speaking extbot.py's protocol) enter under a
+# name given with --bot NAME=COMMAND. Each worker starts a bot's program
+# once and keeps it for all its games; every decision has --movetime ms, and
+# the bots' decision times, timeouts and crashes are reported at the end.
+#
+#   python tournament.py --entrants threshold:12,threshold:16,threshold:20,ev,dp --players 2-8 --games 20
+#   python tournament.py --bot sample="python sample_bot.py" --entrants threshold:16,ev,sample --players 2-4
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations, combinations_with_replacement, permutations
+
+from bots import POLICIES, TABLE_POLICIES, build_stop_table
+from engine import BOT_HIT_THRESHOLD, GameState, Player, play_headless
+from extbot import DEFAULT_MOVETIME_MS, BotError, LatencyStats, external_policy
+
+DEFAULT_ENTRANTS = "threshold:12,threshold:16,threshold:20,ev,dp"
+ELO_START = 1500.0
+ELO_K = 16.0
+CSV_FIELDS = ["key", "players", "seats", "winner", "scores", "rounds", "turns"]
+
+# ---------- Entrants ----------
+def parse_entrant(spec, externals=()):
+    """ Takes in 'name' or 'name:aggr' and the external bot names, returns (label, policy name, bot_aggr)"""
+    name, _, aggr = spec.partition(":")
+    if name not in POLICIES and name not in externals:
+        raise ValueError(f"unknown policy {name!r} (one of {', '.join([*POLICIES, *externals])})")
+    return spec, name, int(aggr) if aggr else BOT_HIT_THRESHOLD
+
+def parse_bot(text):
+    """ Takes in 'NAME=COMMAND', returns (name, command)"""
+    name, _, command = text.partition("=")
+    if not name or not command or ":" in name or "," in name:
+        raise ValueError(f"bad --bot {text!r} (NAME=COMMAND)")
+    if name in POLICIES:
+        raise ValueError(f"--bot name {name!r} is taken by a built-in policy")
+    return name, command
+
+def parse_counts(text):
+    """ Takes in '2-8' or '2,4,6', returns the list of player counts"""
+    if "-" in text:
+        lo, hi = text.split("-")
+        return list(range(int(lo), int(hi) + 1))
+    return [int(n) for n in text.split(",")]
+
+def lineups(labels, n):
+    """ Takes in the entrant labels and a player count, returns every lineup (sorted tuple of labels) for that count"""
+    if n <= len(labels):
+        return list(combinations(labels, n))
+    # more seats than entrants: everyone plays, the extra seats go to every multiset of entrants
+    return [tuple(sorted(labels + list(extra), key=labels.index))
+            for extra in combinations_with_replacement(labels, n - len(labels))]
+
+def seat_orders(lineup, orders="auto"):
+    """ Takes in a lineup and 'all', 'rotations' or 'auto' (all up to 4 seats), returns its distinct seat orders"""
+    if orders == "all" or (orders == "auto" and len(lineup) <= 4):
+        return sorted(set(permutations(lineup)))
+    return sorted(set(lineup[i:] + lineup[:i] for i in range(len(lineup))))
+
+def schedule(labels, counts, games, orders="auto"):
+    """ Takes in the entrant labels, player counts and games per seat order, returns the list of game keys"""
+    keys = []
+    for n in counts:
+        for lineup in lineups(labels, n):
+            for order in seat_orders(lineup, orders):
+                for rep in range(games):
+                    keys.append(f"{'|'.join(order)}#{rep}")
+    return keys
+
+# ---------- Games ----------
+def policy_for(name, externals):
+    """ Takes in a policy name and {name: (command, movetime_ms)}, returns the policy (external bots are this process's, kept between games)"""
+    if name in externals:
+        return external_policy(*externals[name])
+    return POLICIES[name]
+
+def play_game(key, entrants, seed, externals=None):
+    """ Takes in a game key, {label: (policy name, bot_aggr)}, the base seed and the external bots, plays the game and returns its result record"""
+    seats = key.split("#")[0].split("|")
+    players = [Player(f"{label} ({i+1})", is_bot=True, bot_aggr=entrants[label][1]) for i, label in enumerate(seats)]
+    state = GameState(players, rng=random.Random(f"tournament:{seed}:{key}"))
+    play_headless(state, [policy_for(entrants[label][0], externals or {}) for label in seats])
+    return {"key": key, "players": len(seats), "seats": seats, "winner": state.winner,
+            "scores": [p.score_total for p in players], "rounds": state.round_no, "turns": state.turns}
+
+def play_games(keys, entrants, seed, externals=None):
+    """ Plays a batch of games in a worker, returns (result records, {external bot name: LatencyStats} for the batch)"""
+    externals = externals or {}
+    recs = [play_game(key, entrants, seed, externals) for key in keys]
+    used = {entrants[label][0] for rec in recs for label in rec["seats"]}
+    return recs, {name: external_policy(*bot).take_stats() for name, bot in externals.items() if name in used}
+
+# ---------- Results file ----------
+def read_results(path):
+    """ Takes in a results file path (.jsonl or .csv), returns the records already in it (empty if it doesn't exist)"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            data = f.read()
+            data = data[:data.rfind("\n") + 1]     # a half-written last row could still parse (a cut-off number)
+            for row in csv.DictReader(data.splitlines()):
+                try:
+                    records.append({"key": row["key"], "players": int(row["players"]), "seats": row["seats"].split("|"),
+                                    "winner": int(row["winner"]), "scores": [int(s) for s in row["scores"].split("|")],
+                                    "rounds": int(row["rounds"]), "turns": int(row["turns"])})
+                except (ValueError, TypeError, AttributeError):
+                    break       # malformed or short row from an interrupted run
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break       # half-written last line from an interrupted run
+    return records
+
+class ResultWriter:
+    def __init__(self, path):
+        """ Takes in a results file path, opens it for appending (.csv gets a header when new)"""
+        self.csv = path.endswith(".csv")
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new:
+            self._trim_partial_line(path)
+        self.f = open(path, "a", newline="")
+        if self.csv:
+            self.writer = csv.DictWriter(self.f, CSV_FIELDS)
+            if new:
+                self.writer.writeheader()
+
+    @staticmethod
+    def _trim_partial_line(path):
+        """ Cuts a half-written last line left by an interrupted run"""
+        with open(path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def write(self, rec):
+        """ Appends one result record and flushes it to disk"""
+        if self.csv:
+            row = dict(rec, seats="|".join(rec["seats"]), scores="|".join(str(s) for s in rec["scores"]))
+            self.writer.writerow(row)
+        else:
+            self.f.write(json.dumps(rec) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+# ---------- Ratings ----------
+class Elo:
+    def __init__(self, labels, k=ELO_K):
+        """ Takes in the entrant labels and the K factor, starts everyone at ELO_START"""
+        self.k = k
+        self.rating = {label: ELO_START for label in labels}
+        self.games = {label: 0 for label in labels}
+        self.wins = {label: 0 for label in labels}
+
+    def add(self, rec):
+        """
+        Takes in a game result and updates the ratings. A multi-player game counts as
+        every pair of seats playing each other: the winner beats everyone, the rest
+        are ordered by total score. K is split over the n-1 opponents.
+        """
+        seats = rec["seats"]
+        n = len(seats)
+        rank = [(i == rec["winner"], rec["scores"][i]) for i in range(n)]
+        delta = {label: 0.0 for label in seats}
+        k = self.k / (n - 1)
+        for i in range(n):
+            for j in range(i + 1, n):
+                a, b = seats[i], seats[j]
+                if a == b:
+                    continue
+                s = 1.0 if rank[i] > rank[j] else 0.0 if rank[i] < rank[j] else 0.5
+                expected = 1 / (1 + 10 ** ((self.rating[b] - self.rating[a]) / 400))
+                delta[a] += k * (s - expected)
+                delta[b] -= k * (s - expected)
+        for label in delta:         # each entrant once, however many seats it had
+            self.rating[label] += delta[label]
+            self.games[label] += 1
+        self.wins[seats[rec["winner"]]] += 1
+
+    def report(self):
+        """ Returns the leaderboard as printable text"""
+        lines = ["  rating   games    wins  entrant"]
+        for label in sorted(self.rating, key=self.rating.get, reverse=True):
+            lines.append(f"  {self.rating[label]:6.0f}  {self.games[label]:6}  {self.wins[label]:6}  {label}")
+        return "\n".join(lines)
+
+# ---------- Runner ----------
+def run(entrant_specs, counts, games, path, workers=None, seed=0, orders="auto", batch=20, k=ELO_K, progress=None,
+        bots=None, movetime_ms=DEFAULT_MOVETIME_MS, bot_stats=None):
+    """
+    Takes in entrant specs, player counts, games per seat order and a results path.
+    Plays every scheduled game not already in the results file, appending each as it
+    finishes, and returns the Elo ratings over all results (old and new).
+    progress (optional) is called as progress(done_games, total_games, elapsed_s).
+    bots maps external bot names to their commands; bot_stats (optional) is a dict
+    filled with each one's LatencyStats for the games played.
+    """
+    bots = bots or {}
+    externals = {name: (command, movetime_ms) for name, command in bots.items()}
+    stats = {} if bot_stats is None else bot_stats
+    for name in bots:
+        stats.setdefault(name, LatencyStats())
+    entrants = {}
+    for spec in entrant_specs:
+        label, name, aggr = parse_entrant(spec, bots)
+        entrants[label] = (name, aggr)
+    labels = list(entrants)
+    keys = schedule(labels, counts, games, orders)
+
+    elo = Elo(labels, k)
+    scheduled = set(keys)
+    done = set()
+    for rec in read_results(path):
+        if rec["key"] in scheduled and rec["key"] not in done:
+            done.add(rec["key"])
+            elo.add(rec)
+    todo = [key for key in keys if key not in done]
+    batches = [todo[i:i + batch] for i in range(0, len(todo), batch)]
+
+    out = ResultWriter(path)
+    start = time.perf_counter()
+    finished = len(done)
+    try:
+        if workers == 1:
+            results = (play_games(b, entrants, seed, externals) for b in batches)
+            for recs, batch_stats in results:
+                for name, s in batch_stats.items():
+                    stats[name].merge(s)
+                for rec in recs:
+                    out.write(rec)
+                    elo.add(rec)
+                finished += len(recs)
+                if progress: progress(finished, len(keys), time.perf_counter() - start)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(play_games, b, entrants, seed, externals) for b in batches]
+                for fut in as_completed(futures):
+                    recs, batch_stats = fut.result()
+                    for name, s in batch_stats.items():
+                        stats[name].merge(s)
+                    for rec in recs:
+                        out.write(rec)
+                        elo.add(rec)
+                    finished += len(recs)
+                    if progress: progress(finished, len(keys), time.perf_counter() - start)
+    finally:
+        out.close()
+    return elo
+
+def print_progress(done, total, elapsed):
+    """ Progress callback that writes games done and games/s to stderr"""
+    sys.stderr.write(f"\r{done}/{total} games  {elapsed:.1f}s")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+# ---------- CLI ----------
+def main(argv=None):
+    """ Command line entry point"""
+    ap = argparse.ArgumentParser(description="Round-robin Flip 7 bot tournament")
+    ap.add_argument("--entrants", default=DEFAULT_ENTRANTS,
+                    help=f"comma separated name[:bot_aggr], names from {', '.join(POLICIES)} or --bot")
+    ap.add_argument("--bot", action="append", default=[], metavar="NAME=COMMAND",
+                    help="an external bot program (extbot.py protocol) to enter as NAME; repeatable")
+    ap.add_argument("--movetime", type=int, default=DEFAULT_MOVETIME_MS, help="ms an external bot gets per decision")
+    ap.add_argument("--players", default="2-8", help="player counts: 2-8 or 2,3,4")
+    ap.add_argument("--games", type=int, default=10, help="games per seat order")
+    ap.add_argument("--orders", choices=("auto", "all", "rotations"), default="auto",
+                    help="seat orders per lineup (auto: all up to 4 players, rotations above)")
+    ap.add_argument("--out", default="tournament.jsonl", help="results file, .jsonl or .csv (appended; reruns resume)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--batch", type=int, default=20, help="games per worker task")
+    ap.add_argument("--k", type=float, default=ELO_K, help="Elo K factor")
+    ap.add_argument("--quiet", action="store_true", help="no progress readout")
+    args = ap.parse_args(argv)
+
+    try:
+        bots = dict(parse_bot(text) for text in args.bot)
+        specs = args.entrants.split(",")
+        names = [parse_entrant(spec, bots)[1] for spec in specs]
+    except ValueError as e:
+        ap.error(str(e))
+    if any(name in TABLE_POLICIES for name in names):
+        build_stop_table()
+    start = time.perf_counter()
+    bot_stats = {}
+    try:
+        elo = run(specs, parse_counts(args.players), args.games, args.out, workers=args.workers, seed=args.seed,
+                  orders=args.orders, batch=args.batch, k=args.k, progress=None if args.quiet else print_progress,
+                  bots=bots, movetime_ms=args.movetime, bot_stats=bot_stats)
+    except BotError as e:
+        sys.exit(f"error: {e}")
+    elapsed = time.perf_counter() - start
+    print(elo.report())
+    for name, stats in bot_stats.items():
+        print(f"{name}: {stats.summary()}")
+    print(f"{sum(elo.wins.values()):,} games in {args.out} ({elapsed:.1f}s this run)")
+
+if __name__ == "__main__":
+    main()